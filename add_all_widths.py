@@ -7,13 +7,17 @@ Can be run standalone or imported as a module.
 
 import sqlite3
 
+from catalog import bump_catalog_version
+from volume_discounts import normalize_tiers
+
 DATABASE_PATH = "data/crm.db"
 SUPPORTED_WIDTHS = ["2.5\"", "3.5\"", "4\"", "5\"", "6\"", "7\"", "8\"", "10\"", "11\"", "12\"", "13\"", "14\""]
 
 def ensure_all_widths(db):
     """
     Ensure all supported widths exist for each product.
-    Can be called with a Database instance.
+    Can be called with a Database instance. This runs on every app rerun, so it only
+    takes the write connection when some product is actually missing a width.
     
     Args:
         db: Database instance
@@ -23,60 +27,79 @@ def ensure_all_widths(db):
     """
     try:
         conn = db.get_connection()
-        c = conn.cursor()
-        
-        # Get all unique products (by name)
-        c.execute("SELECT DISTINCT name FROM products ORDER BY name")
-        products = [row['name'] for row in c.fetchall()]
-        
-        if not products:
+        try:
+            c = conn.cursor()
+            c.execute(f"""SELECT COUNT(*) FROM
+                          (SELECT name FROM products GROUP BY name
+                           HAVING SUM(width IN ({', '.join('?' * len(SUPPORTED_WIDTHS))})) < ?)""",
+                      (*SUPPORTED_WIDTHS, len(SUPPORTED_WIDTHS)))
+            incomplete = c.fetchone()[0]
+        finally:
             conn.close()
+        if not incomplete:
             return 0
         
-        added_count = 0
-        
-        for product_name in products:
-            # Get a template product to copy attributes from
-            c.execute("""SELECT * FROM products WHERE name = ? LIMIT 1""", (product_name,))
-            template_row = c.fetchone()
-            if not template_row:
-                continue
-            template = dict(template_row)
+        conn = db.get_connection(write=True)
+        try:
+            c = conn.cursor()
             
-            for width in SUPPORTED_WIDTHS:
-                # Check if this product-width combination exists
-                c.execute("SELECT id FROM products WHERE name = ? AND width = ?", (product_name, width))
-                if c.fetchone() is None:
-                    # Add this width for this product
-                    c.execute("""
-                        INSERT INTO products (
-                            name, width, description, category, cost_price, standard_price,
-                            min_qty_discount, discount_percentage, discount_type,
-                            promotion_name, promotion_start_date, promotion_end_date,
-                            volume_discounts, supplier_id
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        product_name,
-                        width,
-                        template.get('description', f"{product_name} flooring - {width} width"),
-                        template.get('category', 'Hardwood'),
-                        template.get('cost_price', 4.0),
-                        template.get('standard_price', 4.5),
-                        template.get('min_qty_discount'),
-                        template.get('discount_percentage'),
-                        template.get('discount_type'),
-                        template.get('promotion_name'),
-                        template.get('promotion_start_date'),
-                        template.get('promotion_end_date'),
-                        template.get('volume_discounts'),
-                        template.get('supplier_id')
-                    ))
-                    added_count += 1
-        
-        conn.commit()
-        conn.close()
+            # Get all unique products (by name)
+            c.execute("SELECT DISTINCT name FROM products ORDER BY name")
+            products = [row['name'] for row in c.fetchall()]
+            
+            if not products:
+                return 0
+            
+            added_count = 0
+            
+            for product_name in products:
+                # Get a template product to copy attributes from
+                c.execute("""SELECT * FROM products WHERE name = ? LIMIT 1""", (product_name,))
+                template_row = c.fetchone()
+                if not template_row:
+                    continue
+                template = dict(template_row)
+            
+                for width in SUPPORTED_WIDTHS:
+                    # Check if this product-width combination exists
+                    c.execute("SELECT id FROM products WHERE name = ? AND width = ?", (product_name, width))
+                    if c.fetchone() is None:
+                        # Add this width for this product
+                        c.execute("""
+                            INSERT INTO products (
+                                name, width, description, category, cost_price, standard_price,
+                                min_qty_discount, discount_percentage, discount_type,
+                                promotion_name, promotion_start_date, promotion_end_date,
+                                volume_discounts, volume_discount_tiers, supplier_id
+                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        """, (
+                            product_name,
+                            width,
+                            template.get('description', f"{product_name} flooring - {width} width"),
+                            template.get('category', 'Hardwood'),
+                            template.get('cost_price', 4.0),
+                            template.get('standard_price', 4.5),
+                            template.get('min_qty_discount'),
+                            template.get('discount_percentage'),
+                            template.get('discount_type'),
+                            template.get('promotion_name'),
+                            template.get('promotion_start_date'),
+                            template.get('promotion_end_date'),
+                            template.get('volume_discounts'),
+                            normalize_tiers(template.get('volume_discounts')),
+                            template.get('supplier_id')
+                        ))
+                        added_count += 1
+            
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
         
         if added_count > 0:
+            bump_catalog_version(db.db_path)
             print(f"✅ Added {added_count} missing width variants")
         
         return added_count
@@ -116,8 +139,8 @@ def add_missing_widths():
                             name, width, description, category, cost_price, standard_price,
                             min_qty_discount, discount_percentage, discount_type,
                             promotion_name, promotion_start_date, promotion_end_date,
-                            volume_discounts
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                            volume_discounts, volume_discount_tiers
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                     """, (
                         product_name,
                         width,
@@ -131,7 +154,8 @@ def add_missing_widths():
                         template.get('promotion_name'),
                         template.get('promotion_start_date'),
                         template.get('promotion_end_date'),
-                        template.get('volume_discounts')
+                        template.get('volume_discounts'),
+                        normalize_tiers(template.get('volume_discounts'))
                     ))
                     added_count += 1
                     print(f"✓ Added {product_name} {width}")
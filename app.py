@@ -5,7 +5,6 @@ import json
 from datetime import datetime
 import time
 import os
-from typing import Dict, Any
 import google.auth.exceptions
 
 # Local imports
@@ -14,10 +13,15 @@ from gemini_client import GeminiClient
 from email_handler import EmailHandler
 from auth_ui import render_authentication_gate
 from customer_ui import render_customer_page
-from utils import validate_zip_code, validate_width, parse_volume_discounts
+from utils import validate_zip_code, validate_width
+from service_registry import services
+from pricing_cache import PricingCache
+from batch_pricing import BatchPricer, LineItem, resolve_base_price
+from catalog import CatalogSnapshot
 from config import (
     GEMINI_API_KEY, DATABASE_PATH, EMAIL_TEMPLATES,
-    THEME, SAMPLE_PRODUCTS, SAMPLE_SUPPLIERS, SUPPORTED_WIDTHS
+    THEME, SAMPLE_PRODUCTS, SAMPLE_SUPPLIERS, SUPPORTED_WIDTHS, AI_CACHE_CONFIG,
+    BATCH_PRICING_CONFIG, ANALYTICS_CONFIG
 )
 
 # ===================== UI SETUP =====================
@@ -32,24 +36,54 @@ st.set_page_config(
 if not os.path.exists('data'):
     os.makedirs('data')
 
-db = Database(DATABASE_PATH)
+def _create_database() -> Database:
+    database = Database(DATABASE_PATH)
+    
+    # Initialize SQLAlchemy tables (for customers, etc.)
+    try:
+        from models.base import Base, engine
+        Base.metadata.create_all(bind=engine)
+        print("✓ SQLAlchemy tables initialized")
+    except Exception as e:
+        print(f"SQLAlchemy table initialization warning: {e}")
+    return database
 
-# Initialize SQLAlchemy tables (for customers, etc.)
-try:
-    from models.base import Base, engine
-    Base.metadata.create_all(bind=engine)
-    print("✓ SQLAlchemy tables initialized")
-except Exception as e:
-    print(f"SQLAlchemy table initialization warning: {e}")
+def _create_pricing_cache() -> PricingCache:
+    services.get("db")  # Schema (including ai_pricing_cache) is migrated by Database.init_db
+    return PricingCache(DATABASE_PATH, **AI_CACHE_CONFIG)
+
+def _create_gemini_client():
+    if not GEMINI_API_KEY:
+        return None
+    return GeminiClient(GEMINI_API_KEY, cache=services.get("pricing_cache"))
+
+def _create_batch_pricer() -> BatchPricer:
+    try:
+        gemini_client = services.get("gemini")
+    except Exception:
+        gemini_client = None  # Batches still price at standard markup
+    return BatchPricer(services.get("db"), gemini_client, **BATCH_PRICING_CONFIG)
+
+def _create_email_handler() -> EmailHandler:
+    return EmailHandler(services.get("db"))
+
+# Services are built once per process and reused across reruns and sessions
+services.register("db", _create_database)
+services.register("pricing_cache", _create_pricing_cache)
+services.register("gemini", _create_gemini_client)
+services.register("email_handler", _create_email_handler)
+services.register("batch_pricer", _create_batch_pricer)
+
+# Start model discovery and Gmail auth in the background while the user signs in
+services.warm_up(["gemini", "email_handler"])
+
+db = services.get("db")
 
 # ==================== AUTHENTICATION GATE ====================
 # This must be checked FIRST, before any other UI is rendered
 if not render_authentication_gate(db):
     st.stop()  # Block access if not authenticated
 
-# Clean up expired sessions periodically
-db.cleanup_expired_sessions()
-
 try:
     conn = db.get_connection()
     cursor = conn.cursor()
@@ -68,22 +102,26 @@ except Exception as e:
     st.error(f"Database initialization error: {str(e)}")
 
 try:
-    if not GEMINI_API_KEY:
-        gemini = None
-    else:
-        gemini = GeminiClient(GEMINI_API_KEY)
+    gemini = services.get("gemini")
 except Exception as e:
+    # The registry keeps the failure until it is invalidated, so offer a retry like Gmail
     st.error(f"❌ Error initializing AI services: {str(e)}")
+    if st.button("🔄 Retry AI Connection"):
+        services.invalidate("gemini")
+        services.invalidate("batch_pricer")  # Built without a model client while Gemini was down
+        st.rerun()
     gemini = None
 
 try:
-    email_handler = EmailHandler(db)
+    email_handler = services.get("email_handler")
 except RuntimeError as e:
     # Headless environment - user needs to set up token.json
     error_msg = str(e)
     if "Gmail authentication failed" in error_msg or "No existing Gmail credentials" in error_msg:
         # SILENT FAILURE - Log to console only to keep UI clean
         print(f"Gmail Auth Warning: {error_msg}")
+        # Missing credentials are cheap to detect, so retry next rerun in case token.json was added
+        services.invalidate("email_handler")
         email_handler = None
         st.session_state.gmail_status = "not_configured"
     else:
@@ -93,9 +131,12 @@ except Exception as e:
     # If authentication failed due to expired/revoked token, surface clear UI guidance
     if isinstance(e, google.auth.exceptions.RefreshError) or 'expired' in str(e).lower() or 'revoked' in str(e).lower():
         st.error("Gmail authentication failed: token expired or revoked. Please re-authenticate.")
-        st.info("To re-authenticate: delete 'token.json' in the project folder and reload the app. A browser window will open to complete OAuth.")
+        st.info("To re-authenticate: delete 'token.json' in the project folder and click Retry below. A browser window will open to complete OAuth.")
     else:
         st.error(f"Error initializing EmailHandler: {str(e)}")
+    if st.button("🔄 Retry Gmail Connection"):
+        services.invalidate("email_handler")
+        st.rerun()
     email_handler = None
     st.session_state.gmail_status = "error"
 
@@ -106,10 +147,10 @@ if 'gmail_status' not in st.session_state:
     else:
         st.session_state.gmail_status = "error"
 
-# Initialize Scheduler
+# Initialize Scheduler (also runs the session janitor, so it starts even without Gmail)
 try:
     from scheduler_service import SchedulerService
-    if email_handler and db:
+    if db:
         scheduler = SchedulerService(db, email_handler, gemini)
         scheduler.start_scheduler()
 except Exception as e:
@@ -270,26 +311,16 @@ def clear_database_cache():
     st.cache_data.clear()
     st.cache_resource.clear()
 
-def get_market_data(location: str, product: Dict[str, Any]) -> Dict[str, Any]:
-    """Get market analysis without fallback handling"""
-    if not gemini or not gemini.initialized:
-        return {}
-        
-    try:
-        analysis = gemini.generate_market_analysis(
-            location,
-            {"name": product["name"], "cost": product.get("base_price", 4.0), "specs": product}
-        )
-        if not analysis:
-            print(f"[LOG] Market analysis returned empty for {location}")
-            return {}
-        return analysis
-    except Exception as e:
-        print(f"[LOG] Market analysis error for {location}: {str(e)}")
-        return {}
-
 # ===================== SIDEBAR =====================
 def render_sidebar():
+    # SchedulerService is a singleton, so this is the instance started at import
+    try:
+        from scheduler_service import SchedulerService
+        scheduler = SchedulerService(db, email_handler, gemini) if db else None
+    except Exception as e:
+        print(f"Scheduler unavailable: {e}")
+        scheduler = None
+    
     with st.sidebar:
         # Theme-aware Logo and Branding
         st.markdown('''
@@ -402,13 +433,19 @@ def render_sidebar():
                 
             # Manual Trigger for Admins
             if st.session_state.get('is_admin', False):
-                if st.button("🔄 Force Sync Now", type="secondary", use_container_width=True):
+                if scheduler:
+                    janitor = scheduler.get_janitor_metrics()
+                    if janitor['last_run_at']:
+                        t = datetime.fromisoformat(janitor['last_run_at'])
+                        st.caption(f"Session Cleanup: {t.strftime('%a %H:%M')} · "
+                                   f"{janitor['total_purged']} purged since start")
+                    job_stats = scheduler.get_job_stats()
+                    st.caption(f"Job Queue: {job_stats['pending']} pending · {job_stats['running']} running · "
+                               f"{job_stats['failed']} failed")
+
+                if scheduler and st.button("🔄 Force Sync Now", type="secondary", use_container_width=True):
                     with st.spinner("Running sync..."):
                         try:
-                            from scheduler_service import SchedulerService
-                            if 'scheduler' not in globals():
-                                scheduler = SchedulerService(db, email_handler, gemini)
-                            
                             scheduler.daily_reply_check()
                             st.toast("Sync completed!", icon="✅")
                             time.sleep(1)
@@ -442,12 +479,70 @@ def render_sidebar():
         return selected
 
 # ===================== QUOTE GENERATOR =====================
+def render_batch_pricing(catalog: CatalogSnapshot):
+    """Price several product / width / ZIP line items at once for side-by-side comparison"""
+    with st.expander("📦 Batch Pricing (compare multiple products and job sites)"):
+        batch_pricer = services.get("batch_pricer")
+        st.caption(f"Up to {batch_pricer.max_items} line items, priced concurrently. "
+                   "Results are for comparison only and are not submitted as quotes.")
+        
+        product_names = catalog.names
+        widths = sorted(set(p['width'] for p in catalog.products))
+        if 'batch_items' not in st.session_state:
+            st.session_state.batch_items = pd.DataFrame([
+                {"Product": product_names[0], "Width": widths[0], "ZIP Code": "", "Square Feet": 1000}
+            ])
+        
+        edited = st.data_editor(
+            st.session_state.batch_items,
+            num_rows="dynamic",
+            use_container_width=True,
+            key="batch_items_editor",
+            column_config={
+                "Product": st.column_config.SelectboxColumn("Product", options=product_names, required=True),
+                "Width": st.column_config.SelectboxColumn("Width", options=widths, required=True),
+                "ZIP Code": st.column_config.TextColumn("ZIP Code", required=True),
+                "Square Feet": st.column_config.NumberColumn("Square Feet", min_value=1, max_value=100000, step=1)
+            }
+        )
+        
+        if st.button("⚡ Price All", key="batch_price_all", type="primary"):
+            items = [
+                LineItem(row["Product"], row["Width"], str(row["ZIP Code"] or "").strip(), float(row["Square Feet"] or 0))
+                for _, row in edited.dropna(subset=["Product", "Width"]).iterrows()
+            ]
+            if not items:
+                st.warning("Add at least one line item to price.")
+                return
+            
+            progress = st.progress(0.0, text="Pricing line items...")
+            def on_progress(done: int, total: int):
+                progress.progress(done / total if total else 1.0, text=f"Priced {done} of {total} unique requests")
+            
+            try:
+                results = batch_pricer.price(items, catalog, on_progress=on_progress)
+            except ValueError as e:
+                st.error(str(e))
+                return
+            progress.empty()
+            
+            is_admin = st.session_state.get('role') in ['admin', 'super_admin']
+            columns = ["product", "width", "zip_code", "quantity", "selling_price", "total", "source", "error"]
+            if is_admin:
+                columns[6:6] = ["base_price", "margin", "suggested_retail_price", "suggested_dealer_price"]
+            results_df = pd.DataFrame(results).reindex(columns=columns)
+            st.dataframe(results_df, use_container_width=True, hide_index=True)
+            
+            ai_count = sum(1 for r in results if r.get("source") == "ai")
+            st.caption(f"{ai_count} of {len(results)} line items priced with AI market data; "
+                       "the rest use standard markup.")
+
 def render_quote_page():
     st.header("💰 Quote Generator")
     
     try:
-        products = db.get_products()
-        if not products:
+        catalog = db.get_catalog()
+        if not catalog:
             st.error("No products found in database. Please check the database connection.")
             return
     except Exception as e:
@@ -460,7 +555,7 @@ def render_quote_page():
         st.subheader("Generate New Quote")
         
         if 'selected_product' not in st.session_state:
-            st.session_state.selected_product = sorted(set(p["name"] for p in products))[0]
+            st.session_state.selected_product = catalog.names[0]
         if 'selected_width' not in st.session_state:
             st.session_state.selected_width = None
         
@@ -503,7 +598,7 @@ def render_quote_page():
         try:
             customer_repo = CustomerRepository(session)
             user_id = st.session_state.get('user_id')
-            is_admin = db.is_user_admin(user_id) if user_id else False
+            is_admin = st.session_state.get('is_admin', False)
             customers, _ = customer_repo.list_customers(
                 limit=1000,
                 user_id=str(user_id) if user_id else None,
@@ -521,6 +616,7 @@ def render_quote_page():
         
         default_name = ""
         default_location = "Raleigh, NC"
+        selected_customer = None
         
         if selected_customer_key != "New Customer":
             selected_customer = customer_options[selected_customer_key]
@@ -540,72 +636,41 @@ def render_quote_page():
             
             submitted = st.form_submit_button("Submit for Approval", type="primary", use_container_width=True)
     
+    render_batch_pricing(catalog)
+    
     if submitted:
         if not customer_name or not customer_name.strip():
             st.error("⚠️ Customer name is required to generate a quote")
         else:
             with st.spinner("Processing quote request..."):
                 try:
-                    matching_product = next(
-                        (p for p in products if p['name'] == product and p['width'] == width),
-                        None
-                    )
+                    matching_product = catalog.get(product, width)
                     
                     if not matching_product:
                         st.error(f"Product {product} {width} not found in database")
                         return
                     
-                    standard_price = matching_product.get('standard_price', 0)
-                    cost_price = matching_product.get('cost_price', 0)
-                    discount_pct = matching_product.get('discount_percentage', 0)
-                    promo_name = matching_product.get('promotion_name')
-                    start_date = matching_product.get('promotion_start_date')
-                    end_date = matching_product.get('promotion_end_date')
-                    
-                    promo_active = False
-                    if discount_pct and discount_pct > 0 and start_date and end_date:
-                        promo_active = db.is_promotion_active(start_date, end_date)
-                    
-                    if promo_active:
-                        base_price = standard_price * (1 - discount_pct / 100)
-                    else:
-                        base_price = standard_price if standard_price > 0 else cost_price
-                    
-                    # Apply volume discount if available
-                    volume_discount_pct = parse_volume_discounts(matching_product.get('volume_discounts'), quantity)
-                    if volume_discount_pct > 0:
-                        volume_price = standard_price * (1 - volume_discount_pct / 100)
-                        # If volume discount is better than current base_price, use it
-                        if volume_price < base_price:
-                            base_price = volume_price
-                            promo_active = True
-                            promo_name = f"Volume Discount ({volume_discount_pct}%)"
-                            discount_pct = volume_discount_pct
+                    pricing = resolve_base_price(db, matching_product, quantity)
+                    base_price = pricing["base_price"]
+                    promo_active = pricing["promo_active"]
+                    promo_name = pricing["promo_name"]
+                    discount_pct = pricing["discount_pct"]
                     
                     if base_price <= 0:
                         st.error(f"Invalid price data for {product} {width}")
                         return
                     
-                    product_with_price = {
-                        "name": product,
-                        "width": width,
-                        "base_price": base_price
-                    }
-                    
                     # 1. ZIP CODE VALIDATION (Optional, but keeping it for sanity check)
                     verified_loc = location.strip()
                     print(f"[LOG] Quote ZIP: {verified_loc}")
                     
-                    # 2. AI PRICING CALL
-                    market_data = get_market_data(verified_loc, product_with_price)
-                    
+                    # 2. AI PRICING CALL (market analysis and quote in one request)
                     quote_data = None
                     if gemini and gemini.initialized:
                         try:
                             print(f"Calculating quote with Gemini for {verified_loc}...")
-                            quote_data = gemini.calculate_quote(
-                                base_price, 
-                                market_data,
+                            quote_data = gemini.price_quote(
+                                base_price,
                                 product_name=product,
                                 width=width,
                                 location=verified_loc
@@ -643,6 +708,10 @@ def render_quote_page():
                     total = round(selling_price * quantity, 2)
                     
                     user_id = st.session_state.get('user_id')
+                    # Link the selected customer unless the name was edited to someone else
+                    customer_id = None
+                    if selected_customer and customer_name.strip() == selected_customer.full_name:
+                        customer_id = selected_customer.id
                     db.create_quote(
                         customer_name, location,
                         json.dumps({"product": product, "width": width}),
@@ -651,7 +720,9 @@ def render_quote_page():
                         ai_retail_price=suggested_retail,
                         ai_dealer_price=suggested_dealer,
                         ai_zip_code=location,
-                        ai_generated_at=datetime.now()
+                        ai_generated_at=datetime.now(),
+                        customer_id=customer_id,
+                        product_id=matching_product['id']
                     )
                     
                     if is_admin:
@@ -711,16 +782,16 @@ def render_analytics_page():
     st.header("📊 Analytics Dashboard")
     
     user_id = st.session_state.get('user_id')
-    is_admin = db.is_user_admin(user_id) if user_id else False
+    is_admin = st.session_state.get('is_admin', False)
     
     if is_admin:
         with st.container(border=True):
             st.subheader("🤖 AI Market Pricing Lookup")
             st.caption("On-demand market pricing analysis for any product and location.")
             
-            products_data = db.get_products()
-            if products_data:
-                product_names = sorted(list(set(p['name'] for p in products_data)))
+            catalog = db.get_catalog()
+            if catalog:
+                product_names = catalog.names
                 
                 lcol1, lcol2, lcol3 = st.columns([2, 1, 1])
                 
@@ -750,23 +821,14 @@ def render_analytics_page():
                             # 2. AI PRICING CALL
                             with st.spinner(f"AI is analyzing market data for {selected_product} in {verified_loc}..."):
                                     try:
-                                        matching_p = next((p for p in products_data if p['name'] == selected_product and p['width'] == selected_width), None)
+                                        matching_p = catalog.get(selected_product, selected_width)
                                         base_price = matching_p['standard_price'] if matching_p else 4.0
                                         
-                                        product_with_price = {
-                                            "name": selected_product,
-                                            "width": selected_width,
-                                            "base_price": base_price
-                                        }
-                                        
                                         print(f"[LOG] Triggering AI call for {selected_product} in {lookup_zip}")
                                         
-                                        market_data = get_market_data(lookup_zip, product_with_price)
-                                        
                                         if gemini and gemini.initialized:
-                                            quote_data = gemini.calculate_quote(
-                                                base_price, 
-                                                market_data,
+                                            quote_data = gemini.price_quote(
+                                                base_price,
                                                 product_name=selected_product,
                                                 width=selected_width,
                                                 location=verified_loc
@@ -797,6 +859,19 @@ def render_analytics_page():
                                         print(f"[LOG] AI Error for {lookup_zip}: {str(e)}")
             else:
                 st.info("No product data available for lookup.")
+            
+            pricing_cache = gemini.cache if gemini else None
+            if pricing_cache:
+                cache_stats = pricing_cache.get_stats()
+                ccol1, ccol2 = st.columns([3, 1])
+                with ccol1:
+                    st.caption(f"⚡ AI pricing cache: {cache_stats['entries']} entries, "
+                               f"{cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                               f"({cache_stats['hit_rate']:.0%} hit rate)")
+                with ccol2:
+                    if st.button("Clear AI Cache", key="clear_ai_cache", use_container_width=True):
+                        removed = pricing_cache.clear()
+                        st.toast(f"Cleared {removed} cached AI responses")
         st.divider()
     
     col1, col2 = st.columns(2)
@@ -804,7 +879,7 @@ def render_analytics_page():
     with col1:
         st.subheader("Quote Statistics")
         user_id = st.session_state.get('user_id')
-        is_admin = db.is_user_admin(user_id) if user_id else False
+        is_admin = st.session_state.get('is_admin', False)
         
         if is_admin:
             st.caption("👑 Admin view: Showing company-wide statistics")
@@ -812,50 +887,21 @@ def render_analytics_page():
             st.caption("👤 Personal view: Showing your quotes only")
         
         try:
-            analytics_data = db.get_analytics_data(user_id=user_id, is_admin=is_admin)
+            rollups = db.get_quote_rollups(user_id=user_id, is_admin=is_admin)
             
-            if analytics_data:
-                df = pd.DataFrame(analytics_data)
-                
-                def extract_specs(specs_str):
-                    try:
-                        specs = json.loads(specs_str)
-                        return specs.get('product', 'Unknown'), specs.get('width', 'Unknown')
-                    except:
-                        return 'Unknown', 'Unknown'
-
-                df['wood_type'], df['width'] = zip(*df['product_specs'].map(extract_specs))
-                df['zip_code'] = df['zip_code'].fillna(df['location'])
-                df['customer_type'] = df['customer_type'].fillna('Unknown').str.title()
-                
-                st.markdown("### 🛠️ Filter & Sort")
-                sort_by = st.selectbox(
-                    "Sort Quotes By",
-                    ["Date (Newest First)", "Date (Oldest First)", "Customer Name", "Wood Type", "Zip Code", "Price (High to Low)"]
-                )
-                
-                if sort_by == "Date (Newest First)":
-                    df = df.sort_values('created_at', ascending=False)
-                elif sort_by == "Date (Oldest First)":
-                    df = df.sort_values('created_at', ascending=True)
-                elif sort_by == "Customer Name":
-                    df = df.sort_values('customer_name')
-                elif sort_by == "Wood Type":
-                    df = df.sort_values('wood_type')
-                elif sort_by == "Zip Code":
-                    df = df.sort_values('zip_code')
-                elif sort_by == "Price (High to Low)":
-                    df = df.sort_values('final_price', ascending=False)
+            if rollups:
+                df = pd.DataFrame(rollups)
+                df['customer_type'] = df['customer_type'].str.title()
                 
+                total_quotes = int(df['quote_count'].sum())
                 m1, m2, m3 = st.columns(3)
-                m1.metric("Total Quotes", len(df))
-                m2.metric("Avg Quote Value", format_currency(df['final_price'].mean()))
-                m3.metric("Total Volume", f"{df['quantity'].sum():,} sqft")
+                m1.metric("Total Quotes", total_quotes)
+                m2.metric("Avg Quote Value", format_currency(df['total_price'].sum() / total_quotes))
+                m3.metric("Total Volume", f"{int(df['total_quantity'].sum()):,} sqft")
                 
-                if len(df) > 1:
+                if total_quotes > 1:
                     st.markdown("### 📈 Quote History")
-                    df['created_at'] = pd.to_datetime(df['created_at'])
-                    chart_data = df.set_index('created_at')['final_price']
+                    chart_data = df.groupby(pd.to_datetime(df['day']))['total_price'].sum()
                     st.line_chart(chart_data)
                 
                 st.divider()
@@ -865,40 +911,56 @@ def render_analytics_page():
                 
                 with chart_col1:
                     st.subheader("Quotes by Product Category")
-                    if 'product_category' in df.columns:
-                        category_counts = df['product_category'].fillna('Uncategorized').value_counts()
-                        st.bar_chart(category_counts)
-                    else:
-                        st.info("No category data available yet.")
+                    category_counts = df.groupby('category')['quote_count'].sum().sort_values(ascending=False)
+                    st.bar_chart(category_counts)
                     
                 with chart_col2:
                     st.subheader("Quotes by Wood Type")
-                    wood_counts = df['wood_type'].value_counts()
+                    wood_counts = df.groupby('product')['quote_count'].sum().sort_values(ascending=False)
                     st.bar_chart(wood_counts)
                 
+                def avg_price_per_sqft(column):
+                    grouped = df[df['priced_count'] > 0].groupby(column)[['sum_price_per_sqft', 'priced_count']].sum()
+                    return grouped['sum_price_per_sqft'] / grouped['priced_count']
+                
                 st.divider()
                 st.subheader("📍 Pricing Insights")
                 tab1, tab2 = st.tabs(["🗺️ Zip Code Analysis", "👥 Dealer vs Retail"])
                 
                 with tab1:
-                    if 'zip_code' in df.columns and not df['zip_code'].isnull().all():
-                        df['price_per_sqft'] = df['final_price'] / df['quantity']
-                        zip_stats = df.groupby('zip_code')['price_per_sqft'].mean().sort_values(ascending=False)
+                    zip_stats = avg_price_per_sqft('zip_code')
+                    zip_stats = zip_stats[zip_stats.index != ''].sort_values(ascending=False)
+                    if not zip_stats.empty:
                         st.bar_chart(zip_stats)
                         
                 with tab2:
-                    if 'customer_type' in df.columns:
-                        if 'price_per_sqft' not in df.columns:
-                            df['price_per_sqft'] = df['final_price'] / df['quantity']
-                        type_stats = df.groupby('customer_type')['price_per_sqft'].mean()
-                        st.bar_chart(type_stats, color="#ffaa00")
+                    type_stats = avg_price_per_sqft('customer_type')
+                    st.bar_chart(type_stats, color="#ffaa00")
                 
                 st.divider()
                 st.subheader("📋 Recent Quotes")
+                recent_limit = ANALYTICS_CONFIG["recent_quotes_limit"]
+                sort_by = st.selectbox(
+                    "Sort Quotes By",
+                    ["Date (Newest First)", "Date (Oldest First)", "Customer Name", "Wood Type", "Zip Code", "Price (High to Low)"]
+                )
+                recent = pd.DataFrame(db.get_analytics_data(user_id=user_id, is_admin=is_admin,
+                                                            limit=recent_limit, sort_by=sort_by))
+                
+                def extract_product(specs_str):
+                    try:
+                        return json.loads(specs_str).get('product', 'Unknown')
+                    except:
+                        return 'Unknown'
+
+                recent['wood_type'] = recent['product_specs'].map(extract_product)
+                recent['zip_code'] = recent['zip_code'].fillna(recent['location'])
                 display_cols = ['customer_name', 'wood_type', 'zip_code', 'quantity', 'final_price', 'created_at']
-                display_df = df[display_cols].copy()
+                display_df = recent[display_cols].copy()
                 display_df.columns = ['Customer', 'Product', 'Zip/Location', 'Sq Ft', 'Total Price', 'Date']
                 display_df['Total Price'] = display_df['Total Price'].apply(format_currency)
+                if total_quotes > recent_limit:
+                    st.caption(f"Showing {recent_limit} of {total_quotes} quotes")
                 st.dataframe(display_df, hide_index=True, use_container_width=True)
             else:
                 st.info("ℹ️ No quotes generated yet.")
@@ -907,7 +969,7 @@ def render_analytics_page():
     
     with col2:
         st.subheader("Current Pricing Overview")
-        products = db.get_products()
+        products = db.get_catalog().products
         if products:
             products_df = pd.DataFrame([
                 {
@@ -928,7 +990,7 @@ def render_analytics_page():
     st.divider()
     st.subheader("🎯 Product Discount & Promotion Insights")
     
-    products = db.get_products()
+    products = db.get_catalog().products
     if products:
         product_insights = []
         for p in products:
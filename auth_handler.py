@@ -3,12 +3,13 @@ Professional Authentication Handler Module
 Handles password security, user registration, login validation, and session management
 """
 
-import hashlib
 import secrets
 import re
 from datetime import datetime
 from typing import Dict, Tuple, Optional
 
+from password_hasher import HasherBusy, get_password_hasher
+
 
 class AuthHandler:
     """
@@ -33,39 +34,31 @@ class AuthHandler:
     @staticmethod
     def hash_password(password: str) -> str:
         """
-        Hash password using PBKDF2 with SHA-256
-        Returns: salt$hash format for easy verification
-        """
-        salt = secrets.token_hex(16)  # 32-char hex string (16 bytes)
-        hash_obj = hashlib.pbkdf2_hmac(
-            'sha256',
-            password.encode('utf-8'),
-            salt.encode('utf-8'),
-            100000  # iterations
-        )
-        password_hash = hash_obj.hex()
-        return f"{salt}${password_hash}"
+        Hash password using PBKDF2 with SHA-256 (see password_hasher.py)
+        Returns: pbkdf2_sha256$iterations$salt$hash
+        """
+        return get_password_hasher().hash(password)
     
     @staticmethod
     def verify_password(password: str, password_hash: str) -> bool:
         """
-        Verify password against stored hash
+        Verify password against stored hash (current or legacy salt$hash format)
         Returns: True if password matches, False otherwise
+        Raises: HasherBusy if no hashing worker became free in time
         """
         try:
-            salt, stored_hash = password_hash.split('$')
-            hash_obj = hashlib.pbkdf2_hmac(
-                'sha256',
-                password.encode('utf-8'),
-                salt.encode('utf-8'),
-                100000
-            )
-            computed_hash = hash_obj.hex()
-            return computed_hash == stored_hash
+            return get_password_hasher().verify(password, password_hash)
+        except HasherBusy:
+            raise
         except Exception as e:
             print(f"Password verification error: {str(e)}")
             return False
     
+    @staticmethod
+    def needs_rehash(password_hash: str) -> bool:
+        """True if the stored hash uses older parameters and should be replaced on login"""
+        return get_password_hasher().needs_rehash(password_hash)
+    
     @staticmethod
     def validate_username(username: str) -> Tuple[bool, str]:
         """
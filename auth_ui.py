@@ -5,6 +5,8 @@ Creates stunning, responsive authentication pages with Streamlit
 
 import streamlit as st
 from auth_handler import AuthHandler
+from password_hasher import HasherBusy, get_password_hasher
+from session_cache import role_flags
 from database import Database
 import time
 
@@ -271,11 +273,24 @@ def render_login_page(db: Database) -> bool:
                     st.error("❌ Username or password incorrect")
                     return False
                 
-                # Verify password
-                if not AuthHandler.verify_password(password, user['password_hash']):
+                # Verify password (runs in the hashing worker pool)
+                try:
+                    password_ok = AuthHandler.verify_password(password, user['password_hash'])
+                except HasherBusy:
+                    st.error("❌ Too many sign-ins right now, please try again in a moment")
+                    return False
+                if not password_ok:
                     st.error("❌ Username or password incorrect")
                     return False
                 
+                # Upgrade hashes stored with older parameters, off the request path
+                if AuthHandler.needs_rehash(user['password_hash']):
+                    get_password_hasher().rehash_async(
+                        password,
+                        lambda new_hash, user_id=user['id'], old_hash=user['password_hash']:
+                            db.update_password_hash(user_id, new_hash, old_hash)
+                    )
+                
                 # Create session
                 session_token = AuthHandler.generate_session_token()
                 session_result = db.create_session(
@@ -295,9 +310,10 @@ def render_login_page(db: Database) -> bool:
                     st.session_state.remember_me = remember_me
                     
                     # Load role and admin status
-                    role = user.get('role', 'user')
-                    st.session_state.role = role
-                    st.session_state.is_admin = role in ('admin', 'super_admin') or bool(user.get('is_admin', 0))
+                    flags = role_flags(user.get('role'), user.get('is_admin', 0))
+                    st.session_state.role = flags['role']
+                    st.session_state.is_admin = flags['is_admin']
+                    st.session_state.is_super_admin = flags['is_super_admin']
                     
                     st.success(f"✅ Welcome back, {user['full_name']}!")
                     st.toast(f"Logged in as {user['username']}", icon="✅")
@@ -433,8 +449,12 @@ def render_signup_page(db: Database) -> bool:
                     else:
                         st.warning("⚠️ Invalid Admin Code - Account will be created as standard user")
                 
-                # Hash password
-                password_hash = AuthHandler.hash_password(password)
+                # Hash password (runs in the hashing worker pool)
+                try:
+                    password_hash = AuthHandler.hash_password(password)
+                except HasherBusy:
+                    st.error("❌ Too many sign-ins right now, please try again in a moment")
+                    return False
                 
                 # Register user
                 result = db.register_user(username, email, password_hash, full_name)
@@ -442,23 +462,11 @@ def render_signup_page(db: Database) -> bool:
                 if result['success']:
                     # If admin code was valid, update the user role immediately
                     if is_super_admin_signup:
-                        try:
-                            conn = db.get_connection()
-                            c = conn.cursor()
-                            c.execute("UPDATE users SET role = 'super_admin', is_admin = 1 WHERE id = ?", (result['user_id'],))
-                            conn.commit()
-                            conn.close()
-                        except Exception as e:
-                            print(f"Error promoting user to super admin: {e}")
+                        if not db.update_user_role(result['user_id'], 'super_admin'):
+                            print("Error promoting user to super admin")
                     elif is_admin_signup:
-                        try:
-                            conn = db.get_connection()
-                            c = conn.cursor()
-                            c.execute("UPDATE users SET role = 'admin', is_admin = 1 WHERE id = ?", (result['user_id'],))
-                            conn.commit()
-                            conn.close()
-                        except Exception as e:
-                            print(f"Error promoting user to admin: {e}")
+                        if not db.update_user_role(result['user_id'], 'admin'):
+                            print("Error promoting user to admin")
                 
                 if result['success']:
                     # Auto-login after signup
@@ -476,9 +484,10 @@ def render_signup_page(db: Database) -> bool:
                         st.session_state.remember_me = True
                         
                         # Load role and admin status
-                        role = user.get('role', 'user')
-                        st.session_state.role = role
-                        st.session_state.is_admin = role in ('admin', 'super_admin') or bool(user.get('is_admin', 0))
+                        flags = role_flags(user.get('role'), user.get('is_admin', 0))
+                        st.session_state.role = flags['role']
+                        st.session_state.is_admin = flags['is_admin']
+                        st.session_state.is_super_admin = flags['is_super_admin']
                         
                         st.success(f"✅ Welcome to PrimeLine, {full_name}!")
                         st.toast("Account created successfully!", icon="🎉")
@@ -613,6 +622,10 @@ def render_authentication_gate(db: Database):
     if st.session_state.authenticated and st.session_state.session_token:
         session_valid = db.validate_session(st.session_state.session_token)
         if session_valid['valid']:
+            # Role comes from the same (cached) validation, so pages check permissions via session_state
+            st.session_state.role = session_valid['role']
+            st.session_state.is_admin = session_valid['is_admin']
+            st.session_state.is_super_admin = session_valid['is_super_admin']
             return True  # Session is valid, allow access
         else:
             # Session expired or invalid
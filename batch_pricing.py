@@ -0,0 +1,234 @@
+"""
+Batch pricing for multi-product / multi-ZIP quote comparisons.
+
+Line items are priced concurrently on a bounded thread pool. Model calls share a
+token-bucket rate limit and a per-request timeout; cache hits skip both.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from catalog import CatalogSnapshot
+from volume_discounts import product_discount
+
+STANDARD_MARKUP = 1.3
+
+
+class LineItem(NamedTuple):
+    product: str
+    width: str
+    zip_code: str
+    quantity: float
+
+
+def resolve_base_price(db, product: Dict[str, Any], quantity: float) -> Dict[str, Any]:
+    """
+    Base cost for a product row after promotions and volume discounts.
+    Returns base_price, promo_active, promo_name and discount_pct.
+    """
+    standard_price = product.get('standard_price') or 0
+    cost_price = product.get('cost_price') or 0
+    discount_pct = product.get('discount_percentage') or 0
+    promo_name = product.get('promotion_name')
+    start_date = product.get('promotion_start_date')
+    end_date = product.get('promotion_end_date')
+
+    promo_active = False
+    if discount_pct and discount_pct > 0 and start_date and end_date:
+        promo_active = db.is_promotion_active(start_date, end_date)
+
+    if promo_active:
+        base_price = standard_price * (1 - discount_pct / 100)
+    else:
+        base_price = standard_price if standard_price > 0 else cost_price
+
+    # Apply volume discount if it beats the current base price
+    volume_discount_pct = product_discount(product, quantity)
+    if volume_discount_pct > 0:
+        volume_price = standard_price * (1 - volume_discount_pct / 100)
+        if volume_price < base_price:
+            base_price = volume_price
+            promo_active = True
+            promo_name = f"Volume Discount ({volume_discount_pct}%)"
+            discount_pct = volume_discount_pct
+
+    return {
+        "base_price": base_price,
+        "promo_active": promo_active,
+        "promo_name": promo_name,
+        "discount_pct": discount_pct,
+    }
+
+
+class RateLimiter:
+    """Thread-safe token bucket: `rate` requests per second with bursts up to `burst`"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = float(rate)
+        self.capacity = max(1, int(burst))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Take one token, waiting up to `timeout` seconds. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class BatchPricer:
+    """
+    Prices a list of LineItems concurrently through GeminiClient.price_quote.
+    - Identical (product, width, ZIP, base cost) requests are priced once
+    - Items that are unknown, time out or get no AI answer fall back to standard markup
+    """
+
+    DEFAULT_MAX_WORKERS = 4
+    DEFAULT_REQUESTS_PER_SECOND = 2.0
+    DEFAULT_BURST = 4
+    DEFAULT_TIMEOUT = 45  # seconds per model request
+    DEFAULT_MAX_ITEMS = 50
+
+    def __init__(self, db, gemini, max_workers: int = DEFAULT_MAX_WORKERS,
+                 requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+                 burst: int = DEFAULT_BURST, timeout_seconds: float = DEFAULT_TIMEOUT,
+                 max_items: int = DEFAULT_MAX_ITEMS):
+        self.db = db
+        self.gemini = gemini
+        self.max_workers = max(1, int(max_workers))
+        self.timeout_seconds = timeout_seconds
+        self.max_items = max_items
+        # Shared across batches so concurrent sessions stay under the same request budget
+        self.rate_limiter = RateLimiter(requests_per_second, burst)
+
+    def _price_one(self, item: LineItem, base_price: float) -> Dict[str, Any]:
+        if not self.gemini or not self.gemini.initialized:
+            return {}
+        return self.gemini.price_quote(
+            base_price,
+            product_name=item.product,
+            width=item.width,
+            location=item.zip_code,
+            timeout=self.timeout_seconds,
+            rate_limiter=self.rate_limiter
+        )
+
+    def price(self, items: List[LineItem], catalog: CatalogSnapshot,
+              on_progress: Optional[Callable[[int, int], None]] = None) -> List[Dict[str, Any]]:
+        """Price every line item against a catalog snapshot; results are returned in input order"""
+        if len(items) > self.max_items:
+            raise ValueError(f"Batch is limited to {self.max_items} line items (got {len(items)})")
+
+        results: List[Dict[str, Any]] = []
+        pending: Dict[tuple, List[int]] = {}
+
+        for idx, item in enumerate(items):
+            row = {
+                "product": item.product,
+                "width": item.width,
+                "zip_code": str(item.zip_code).strip(),
+                "quantity": item.quantity,
+                "error": None,
+            }
+            results.append(row)
+
+            product = catalog.get(item.product, item.width)
+            if not product:
+                row["error"] = "Product not found"
+                continue
+            pricing = resolve_base_price(self.db, product, item.quantity)
+            row.update(pricing)
+            if pricing["base_price"] <= 0:
+                row["error"] = "Invalid price data"
+                continue
+            if not row["zip_code"]:
+                row["error"] = "ZIP code required"
+                continue
+
+            key = (item.product, item.width, row["zip_code"], round(pricing["base_price"], 2))
+            pending.setdefault(key, []).append(idx)
+
+        total = len(pending)
+        done = 0
+        if on_progress:
+            on_progress(done, total)
+
+        if pending:
+            # Rate limiting spreads model calls out, so budget the whole batch accordingly
+            waves = -(-total // self.max_workers)
+            batch_timeout = self.timeout_seconds * (waves + 1) + total / self.rate_limiter.rate
+
+            executor = ThreadPoolExecutor(max_workers=min(self.max_workers, total),
+                                          thread_name_prefix="batch-pricing")
+            futures = {}
+            for key, indexes in pending.items():
+                first = items[indexes[0]]
+                item = LineItem(first.product, first.width, key[2], first.quantity)
+                futures[executor.submit(self._price_one, item, key[3])] = key
+            try:
+                for future in as_completed(futures, timeout=batch_timeout):
+                    key = futures[future]
+                    try:
+                        quote = future.result() or {}
+                        error = None if quote else "No AI pricing available"
+                    except Exception as e:
+                        print(f"Batch pricing error for {key}: {e}")
+                        quote, error = {}, str(e)
+                    for idx in pending[key]:
+                        results[idx]["quote"] = dict(quote)
+                        results[idx]["error"] = error
+                    done += 1
+                    if on_progress:
+                        on_progress(done, total)
+            except FuturesTimeout:
+                print(f"Batch pricing timed out with {total - done} of {total} requests outstanding")
+                for future, key in futures.items():
+                    if not future.done():
+                        for idx in pending[key]:
+                            results[idx]["error"] = "Timed out"
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        for row in results:
+            self._finalize(row)
+        return results
+
+    @staticmethod
+    def _finalize(row: Dict[str, Any]):
+        """Fill selling price and totals, using standard markup when there is no AI quote"""
+        quote = row.pop("quote", None) or {}
+        base_price = row.get("base_price")
+        if not base_price or base_price <= 0:
+            row["source"] = "unavailable"
+            return
+
+        if quote.get("selling_price"):
+            row["source"] = "ai"
+            row["selling_price"] = quote["selling_price"]
+            row["margin"] = quote.get("margin")
+            row["confidence"] = quote.get("confidence")
+            row["suggested_retail_price"] = quote.get("suggested_retail_price")
+            row["suggested_dealer_price"] = quote.get("suggested_dealer_price")
+            row["verified_location"] = quote.get("verified_location")
+        else:
+            row["source"] = "standard"
+            row["selling_price"] = round(base_price * STANDARD_MARKUP, 2)
+            row["margin"] = 30.0
+            row["confidence"] = 0.0
+        row["total"] = round(row["selling_price"] * (row.get("quantity") or 0), 2)
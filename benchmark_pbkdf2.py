@@ -0,0 +1,73 @@
+"""
+Pick PBKDF2 parameters for this host.
+
+Times single hashes at several iteration counts, then a simulated login burst through
+the PasswordHasher worker pool, and prints the largest iteration count whose single
+verification stays under the target. Set it with PBKDF2_ITERATIONS in .env.
+
+    python benchmark_pbkdf2.py --target-ms 250 --burst 20
+"""
+
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from password_hasher import PasswordHasher
+
+CANDIDATE_ITERATIONS = [100000, 150000, 200000, 310000, 400000, 600000]
+
+
+def time_hash(iterations: int, samples: int) -> float:
+    """Median milliseconds for one hash at the given iteration count"""
+    hasher = PasswordHasher(iterations=iterations, workers=1)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        hasher.hash_now("Benchmark-Passw0rd!")
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def time_burst(iterations: int, workers: int, burst: int) -> tuple:
+    """Simulate `burst` simultaneous logins; returns (median ms, slowest ms) per login"""
+    hasher = PasswordHasher(iterations=iterations, workers=workers, timeout_seconds=600)
+    stored = hasher.hash_now("Benchmark-Passw0rd!")
+
+    def login(_):
+        started = time.perf_counter()
+        hasher.verify("Benchmark-Passw0rd!", stored)
+        return (time.perf_counter() - started) * 1000
+
+    # One thread per "script run", all waiting on the shared hashing pool
+    with ThreadPoolExecutor(max_workers=burst) as clients:
+        timings = list(clients.map(login, range(burst)))
+    return statistics.median(timings), max(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--target-ms", type=float, default=250, help="Budget for one verification")
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--burst", type=int, default=20, help="Simultaneous logins to simulate")
+    parser.add_argument("--workers", type=int, default=PasswordHasher.DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    print(f"CPU cores: {os.cpu_count()}")
+    print(f"{'iterations':>10}  {'hash ms':>8}")
+    chosen = CANDIDATE_ITERATIONS[0]
+    for iterations in CANDIDATE_ITERATIONS:
+        ms = time_hash(iterations, args.samples)
+        print(f"{iterations:>10}  {ms:>8.1f}")
+        if ms <= args.target_ms:
+            chosen = iterations
+
+    median_ms, worst_ms = time_burst(chosen, args.workers, args.burst)
+    print(f"\nBurst of {args.burst} logins at {chosen} iterations with {args.workers} workers: "
+          f"median {median_ms:.0f} ms, slowest {worst_ms:.0f} ms")
+    print(f"✅ Recommended: PBKDF2_ITERATIONS={chosen}")
+
+
+if __name__ == "__main__":
+    main()
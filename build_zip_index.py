@@ -0,0 +1,35 @@
+"""
+Build the offline ZIP code index (data/zip_index_us.bin) used by utils.validate_zip_code.
+
+Run at deploy time, or after updating pgeocode, and commit the result:
+
+    python build_zip_index.py [output_path]
+
+pgeocode downloads its GeoNames dataset here (once, into its cache), so the app
+itself never needs network access to validate a ZIP code.
+"""
+
+import os
+import sys
+
+from zip_index import DEFAULT_INDEX_PATH, write_zip_index
+
+
+def fetch_us_locations():
+    """Every 5-digit ZIP known to pgeocode, as rows with its location fields"""
+    import pgeocode
+
+    nominatim = pgeocode.Nominatim('us')
+    # query_postal_code takes a list; unknown codes come back with an empty place_name
+    locations = nominatim.query_postal_code([f"{code:05d}" for code in range(100000)])
+    return locations.itertuples(index=False)
+
+
+def main():
+    output_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_INDEX_PATH
+    total = write_zip_index(output_path, fetch_us_locations())
+    print(f"✓ Wrote {total} ZIP codes to {output_path} ({os.path.getsize(output_path):,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
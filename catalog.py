@@ -0,0 +1,91 @@
+"""
+In-memory product catalog snapshot.
+
+Pages read the catalog several times per render; instead of re-running the product
+join each time they share one immutable snapshot per database file. Writers bump a
+per-database catalog version (Database.update_product_price, add_product,
+bulk_import_products), and the next get_catalog() call rebuilds the snapshot.
+"""
+
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+_lock = threading.Lock()
+_versions: Dict[str, int] = {}
+_snapshots: Dict[str, "CatalogSnapshot"] = {}
+
+
+def _key(db_path: str) -> str:
+    return os.path.abspath(db_path)
+
+
+def catalog_version(db_path: str) -> int:
+    with _lock:
+        return _versions.get(_key(db_path), 0)
+
+
+def bump_catalog_version(db_path: str) -> int:
+    """Mark the product catalog as changed; call after the write has committed"""
+    key = _key(db_path)
+    with _lock:
+        _versions[key] = _versions.get(key, 0) + 1
+        _snapshots.pop(key, None)
+        return _versions[key]
+
+
+class CatalogSnapshot:
+    """
+    Product rows (as returned by Database.get_products) indexed for dict lookups.
+    - products: all rows ordered by name, width
+    - get(name, width) / widths(name) / for_supplier(supplier_id)
+    Rows are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, version: int, products: List[Dict[str, Any]]):
+        self.version = version
+        self.products = products
+        self.by_key: Dict[tuple, Dict[str, Any]] = {}
+        self.by_name: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_supplier: Dict[Optional[int], List[Dict[str, Any]]] = {}
+        for product in products:
+            self.by_key[(product['name'], product['width'])] = product
+            self.by_name.setdefault(product['name'], []).append(product)
+            self.by_supplier.setdefault(product.get('supplier_id'), []).append(product)
+        self.names = sorted(self.by_name)
+
+    def __len__(self):
+        return len(self.products)
+
+    def __bool__(self):
+        return bool(self.products)
+
+    def get(self, name: str, width: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Row for (name, width); without a width the first width of the product"""
+        if width:
+            return self.by_key.get((name, width))
+        rows = self.by_name.get(name)
+        return rows[0] if rows else None
+
+    def widths(self, name: str) -> List[str]:
+        return [p['width'] for p in self.by_name.get(name, [])]
+
+    def for_supplier(self, supplier_id: int) -> List[Dict[str, Any]]:
+        return self.by_supplier.get(supplier_id, [])
+
+
+def get_catalog(db) -> CatalogSnapshot:
+    """Current snapshot for the database, rebuilt only after the catalog version changes"""
+    key = _key(db.db_path)
+    with _lock:
+        snapshot = _snapshots.get(key)
+        version = _versions.get(key, 0)
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    snapshot = CatalogSnapshot(version, db.get_products())
+    with _lock:
+        # Keep it only if no write landed while the rows were being read
+        if _versions.get(key, 0) == version:
+            _snapshots[key] = snapshot
+    return snapshot
@@ -93,4 +93,49 @@ SCHEDULER_CONFIG = {
     "timezone": "UTC"
 }
 
-SUPPORTED_WIDTHS = ["2.5\"", "3.5\"", "4\"", "5\"", "6\"", "7\"", "8\"", "10\"", "11\"", "12\"", "13\"", "14\"", "Custom"]
\ No newline at end of file
+PASSWORD_HASH_CONFIG = {
+    # PBKDF2-SHA256 rounds for new hashes; older hashes are upgraded on the next login.
+    # Pick a value for the host with `python benchmark_pbkdf2.py`.
+    "iterations": int(os.getenv("PBKDF2_ITERATIONS", "100000")),
+    "workers": int(os.getenv("PASSWORD_HASH_WORKERS", "2")),  # Concurrent hash computations
+    "timeout_seconds": 15          # Wait for a free worker before a login is refused as busy
+}
+
+JOB_QUEUE_CONFIG = {
+    "workers": 4,                  # Jobs run concurrently (e.g. supplier price requests)
+    "poll_seconds": 5,             # Idle workers check for due retries this often
+    "max_attempts": 5,             # Attempts per job before it is marked failed
+    "backoff_seconds": 30,         # First retry delay; doubles per attempt, capped at an hour
+    "heartbeat_seconds": 60,       # Workers refresh heartbeat_at on their running jobs this often
+    "stale_after_seconds": 15 * 60,  # Running jobs without a heartbeat this long are re-queued (worker died)
+    "keep_finished_days": 30       # Done/failed jobs (and their dedupe keys) are kept this long
+}
+
+SESSION_JANITOR_CONFIG = {
+    "interval_minutes": 15,        # How often the scheduler purges expired sessions
+    "batch_size": 500,             # Sessions deleted per write transaction
+    "max_batches": 200,            # Upper bound per run; anything left waits for the next run
+    "batch_pause_seconds": 0.05,   # Gap between batches so request writes get the writer
+    "vacuum_pages": 1000,          # Free pages returned to the filesystem per run
+    "convert_auto_vacuum": False   # One-time VACUUM of older files on start; prefer running enable_incremental_vacuum.py
+}
+
+SUPPORTED_WIDTHS = ["2.5\"", "3.5\"", "4\"", "5\"", "6\"", "7\"", "8\"", "10\"", "11\"", "12\"", "13\"", "14\"", "Custom"]
+
+AI_CACHE_CONFIG = {
+    "ttl_seconds": 6 * 60 * 60,  # Market conditions drift; re-ask the model after 6 hours
+    "max_entries": 5000,         # Least recently used entries are evicted beyond this
+    "flush_interval": 30         # Seconds between batched last_access/hits writes for cache hits
+}
+
+BATCH_PRICING_CONFIG = {
+    "max_workers": 4,             # Concurrent model requests per batch
+    "requests_per_second": 2.0,   # Shared token-bucket rate limit for model calls
+    "burst": 4,
+    "timeout_seconds": 45,        # Per model request
+    "max_items": 50
+}
+
+ANALYTICS_CONFIG = {
+    "recent_quotes_limit": 100    # Rows fetched for the dashboard's Recent Quotes table
+}
@@ -0,0 +1,245 @@
+"""
+SQLite connection pooling for the Database layer.
+Keeps long-lived connections around so pragmas and connect overhead are paid once
+instead of on every query.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class PooledConnection:
+    """
+    Lease on a pooled sqlite3 connection.
+    Behaves like the underlying connection, except close() hands it back to the pool.
+    """
+
+    def __init__(self, pool: "ConnectionPool", conn: sqlite3.Connection, write: bool = False):
+        self._pool = pool
+        self._conn = conn
+        self._write = write
+        self._released = False
+
+    @property
+    def raw(self) -> sqlite3.Connection:
+        return self._conn
+
+    def close(self):
+        """Return the connection to the pool (safe to call more than once)"""
+        if self._released:
+            return
+        self._released = True
+        self._pool.release(self)
+
+    def __getattr__(self, name):
+        if self._released:
+            raise sqlite3.ProgrammingError("Cannot operate on a released connection.")
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._conn.__exit__(exc_type, exc, tb)
+
+
+class ConnectionPool:
+    """
+    Connection pool for a single SQLite database file:
+    - Reader connections are checked out per thread from a bounded idle pool
+    - A single writer connection is shared and serialized through a re-entrant lock
+    - Pragmas are applied once, when a connection is opened
+    - Idle connections are health-checked before being handed out again
+    """
+
+    DEFAULT_POOL_SIZE = 5
+    DEFAULT_TIMEOUT = 30
+    DEFAULT_HEALTH_CHECK_INTERVAL = 60  # seconds
+
+    def __init__(self, db_path: str, pool_size: int = DEFAULT_POOL_SIZE,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL):
+        self.db_path = db_path
+        self.pool_size = max(1, int(pool_size))
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._lock = threading.Lock()
+        self._idle: List[tuple] = []  # (connection, last_used)
+        self._open_readers = 0
+
+        self._writer_lock = threading.RLock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_last_used = 0.0
+        self._writer_depth = 0
+
+        self._wal_enabled = False
+        self.stats = {"opened": 0, "reused": 0, "discarded": 0, "health_check_failures": 0}
+
+    # ------------------------------------------------------------------ connections
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        # journal_mode is persistent in the database file, so it only needs setting once per pool
+        if not self._wal_enabled:
+            # auto_vacuum only takes effect on a new, empty file; existing files are
+            # converted by Database.enable_incremental_vacuum
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._wal_enabled = True
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self.stats["opened"] += 1
+        return conn
+
+    def _is_healthy(self, conn: sqlite3.Connection, last_used: float) -> bool:
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error as e:
+            print(f"Discarding unhealthy database connection: {e}")
+            self.stats["health_check_failures"] += 1
+            return False
+
+    @staticmethod
+    def _close_quietly(conn: sqlite3.Connection):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    # ------------------------------------------------------------------ leases
+
+    def acquire(self, write: bool = False) -> PooledConnection:
+        """Check out a connection. Writers block until the shared writer is free."""
+        if write:
+            return self._acquire_writer()
+        return self._acquire_reader()
+
+    def _acquire_reader(self) -> PooledConnection:
+        while True:
+            with self._lock:
+                self._open_readers += 1
+                if not self._idle:
+                    break
+                conn, last_used = self._idle.pop()
+            if self._is_healthy(conn, last_used):
+                self.stats["reused"] += 1
+                return PooledConnection(self, conn)
+            self._close_quietly(conn)
+            with self._lock:
+                self._open_readers -= 1
+            self.stats["discarded"] += 1
+
+        try:
+            return PooledConnection(self, self._connect())
+        except Exception:
+            with self._lock:
+                self._open_readers -= 1
+            raise
+
+    def _acquire_writer(self) -> PooledConnection:
+        self._writer_lock.acquire()
+        try:
+            if self._writer is not None and self._writer_depth == 0:
+                if not self._is_healthy(self._writer, self._writer_last_used):
+                    self._close_quietly(self._writer)
+                    self._writer = None
+                    self.stats["discarded"] += 1
+                else:
+                    self.stats["reused"] += 1
+            if self._writer is None:
+                self._writer = self._connect()
+            self._writer_depth += 1
+            return PooledConnection(self, self._writer, write=True)
+        except Exception:
+            self._writer_lock.release()
+            raise
+
+    def release(self, lease: PooledConnection):
+        conn = lease.raw
+        if lease._write:
+            try:
+                self._writer_depth -= 1
+                if self._writer_depth == 0:
+                    # Anything the caller left uncommitted is discarded, like closing a connection would
+                    if conn.in_transaction:
+                        conn.rollback()
+                    self._writer_last_used = time.monotonic()
+            except sqlite3.Error:
+                self._close_quietly(conn)
+                self._writer = None
+            finally:
+                self._writer_lock.release()
+            return
+
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._close_quietly(conn)
+            with self._lock:
+                self._open_readers -= 1
+            self.stats["discarded"] += 1
+            return
+
+        with self._lock:
+            self._open_readers -= 1
+            if len(self._idle) < self.pool_size:
+                self._idle.append((conn, time.monotonic()))
+                return
+        self._close_quietly(conn)
+
+    # ------------------------------------------------------------------ lifecycle
+
+    def close_all(self):
+        """Close idle connections and the writer if it is not currently leased"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close_quietly(conn)
+        with self._writer_lock:
+            if self._writer is not None and self._writer_depth == 0:
+                self._close_quietly(self._writer)
+                self._writer = None
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self.stats,
+                "idle": len(self._idle),
+                "readers_in_use": self._open_readers,
+                "pool_size": self.pool_size,
+            }
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str, **kwargs) -> ConnectionPool:
+    """Return the process-wide pool for a database file, creating it on first use"""
+    key = os.path.abspath(db_path)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(db_path, **kwargs)
+                _pools[key] = pool
+    return pool
+
+
+def close_pool(db_path: str):
+    """Close and forget the pool for a database file (e.g. before deleting it)"""
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.pop(key, None)
+    if pool:
+        pool.close_all()
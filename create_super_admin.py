@@ -1,6 +1,6 @@
 import getpass
 from database import Database
-from auth_handler import AuthHandler
+from password_hasher import get_password_hasher
 import sys
 
 def create_super_admin():
@@ -36,7 +36,7 @@ def create_super_admin():
             print("✅ User updated to Super Admin successfully!")
         else:
             # Hash password
-            password_hash = AuthHandler.hash_password(password)
+            password_hash = get_password_hasher().hash_now(password)
             
             # Insert super admin user
             c.execute('''INSERT INTO users (username, email, password_hash, full_name, is_active, is_admin, role)
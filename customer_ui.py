@@ -99,11 +99,8 @@ def add_customer_dialog():
                 )
                 
                 # Check if user is admin
-                from database import Database
-                from config import DATABASE_PATH
-                db_instance = Database(DATABASE_PATH)
                 user_id = int(st.session_state.user_id) if 'user_id' in st.session_state else None
-                is_admin = db_instance.is_user_admin(user_id) if user_id else False
+                is_admin = st.session_state.get('is_admin', False)
                 
                 # Admin-created customers default to UNASSIGNED
                 # Regular users' customers are assigned to themselves
@@ -259,7 +256,7 @@ def render_customer_page():
     from config import DATABASE_PATH
     db_instance = Database(DATABASE_PATH)
     user_id = st.session_state.get('user_id')
-    is_admin = db_instance.is_user_admin(user_id) if user_id else False
+    is_admin = st.session_state.get('is_admin', False)
     
     # Top controls
     col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
@@ -288,22 +285,30 @@ def render_customer_page():
         else:
             st.info("👤 Personal View: Showing your customers only")
     
-    # Pagination state
-    if 'customer_page' not in st.session_state:
-        st.session_state.customer_page = 0
-    
     PAGE_SIZE = 10
     
-    # Fetch Data with user filtering
-    customers, total_count = repo.list_customers(
-        skip=st.session_state.customer_page * PAGE_SIZE,
-        limit=PAGE_SIZE,
+    list_filters = dict(
         search_query=search_query,
         include_deleted=show_deleted,
         user_id=str(user_id) if user_id else None,
         is_admin=is_admin and show_all  # Only bypass filter if admin AND show_all is checked
     )
     
+    # Pagination state: cursors of the pages visited so far (None = first page), reset when filters change
+    filter_key = tuple(sorted(list_filters.items()))
+    if st.session_state.get('customer_page_filters') != filter_key:
+        st.session_state.customer_page_filters = filter_key
+        st.session_state.customer_page_cursors = [None]
+    page_cursors = st.session_state.customer_page_cursors
+    
+    # Fetch Data with user filtering
+    try:
+        customers, next_cursor = repo.list_customers_page(limit=PAGE_SIZE, cursor=page_cursors[-1], **list_filters)
+    except ValueError:
+        st.session_state.customer_page_cursors = page_cursors = [None]
+        customers, next_cursor = repo.list_customers_page(limit=PAGE_SIZE, **list_filters)
+    total_count = repo.count_customers(**list_filters)
+    
     # Metrics
     m1, m2, m3 = st.columns(3)
     m1.metric("Total Customers", total_count)
@@ -444,19 +449,18 @@ def render_customer_page():
             st.markdown("---")
 
     # Pagination Controls
-    total_pages = (total_count + PAGE_SIZE - 1) // PAGE_SIZE
-    
-    if total_pages > 1:
+    if len(page_cursors) > 1 or next_cursor:
         c1, c2, c3 = st.columns([1, 2, 1])
         with c1:
-            if st.button("Previous", disabled=st.session_state.customer_page == 0):
-                st.session_state.customer_page -= 1
+            if st.button("Previous", disabled=len(page_cursors) == 1):
+                page_cursors.pop()
                 st.rerun()
         with c2:
-            st.markdown(f"<div style='text-align: center'>Page {st.session_state.customer_page + 1} of {total_pages}</div>", unsafe_allow_html=True)
+            total_pages = max(1, (total_count + PAGE_SIZE - 1) // PAGE_SIZE)
+            st.markdown(f"<div style='text-align: center'>Page {len(page_cursors)} of ~{total_pages}</div>", unsafe_allow_html=True)
         with c3:
-            if st.button("Next", disabled=st.session_state.customer_page >= total_pages - 1):
-                st.session_state.customer_page += 1
+            if st.button("Next", disabled=next_cursor is None):
+                page_cursors.append(next_cursor)
                 st.rerun()
 
 def render_customer_history_page():
@@ -507,9 +511,12 @@ def render_customer_history_page():
         st.subheader("💰 Buying Power & Insights")
         
         # Calculate metrics
+        # Quotes linked to this customer, plus older ones recorded under the name before it was on file
+        customer_filter = "customer_id = ? OR (customer_id IS NULL AND customer_name = ?)"
+        customer_params = (selected_customer.id.hex, selected_customer.full_name)
         cursor.execute(
-            "SELECT COUNT(*) as count, SUM(final_price) as total_spend, AVG(final_price) as avg_order FROM quotes WHERE customer_name = ?",
-            (selected_customer.full_name,)
+            f"SELECT COUNT(*) as count, SUM(final_price) as total_spend, AVG(final_price) as avg_order FROM quotes WHERE {customer_filter}",
+            customer_params
         )
         result = cursor.fetchone()
         
@@ -557,8 +564,8 @@ def render_customer_history_page():
         st.subheader("📜 Purchase History")
         
         cursor.execute(
-            "SELECT id, customer_name, location, product_specs, quantity, final_price, created_at FROM quotes WHERE customer_name = ? ORDER BY created_at DESC",
-            (selected_customer.full_name,)
+            f"SELECT id, customer_name, location, product_specs, quantity, final_price, created_at FROM quotes WHERE {customer_filter} ORDER BY created_at DESC",
+            customer_params
         )
         history = cursor.fetchall()
         
@@ -1,13 +1,31 @@
-import sqlite3
 from datetime import datetime
+import json
 import os
 import time
+import threading
+import uuid
 from contextlib import contextmanager
 
+from catalog import bump_catalog_version, get_catalog
+from connection_pool import ConnectionPool, get_pool
+from schema_migrations import apply_migrations
+from session_cache import get_session_cache, get_user_cache, role_flags
+from pricing_cache import invalidate_product as invalidate_cached_pricing
+import quote_rollups
+from volume_discounts import normalize_tiers
+
+# Database files whose schema has already been migrated in this process
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
 class Database:
-    def __init__(self, db_path: str = 'data/crm.db'):
+    def __init__(self, db_path: str = 'data/crm.db', pool_size: int = ConnectionPool.DEFAULT_POOL_SIZE):
         self.db_path = db_path
         self._ensure_data_dir()
+        # Pools are shared per database file, so every Database instance reuses the same connections
+        self.pool = get_pool(db_path, pool_size=pool_size)
+        self.sessions = get_session_cache(db_path)
+        self.users = get_user_cache(db_path)
         self.init_db()
         
     def _ensure_data_dir(self):
@@ -15,402 +33,120 @@ class Database:
         if db_dir and not os.path.exists(db_dir):
             os.makedirs(db_dir)
             
-    def get_connection(self):
-        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA journal_mode=WAL")
-        conn.execute("PRAGMA synchronous=NORMAL")
-        return conn
+    def get_connection(self, write: bool = False):
+        """
+        Check out a pooled connection; close() returns it to the pool.
+        Pass write=True for statements that modify data so writes are serialized.
+        """
+        return self.pool.acquire(write=write)
     
     @contextmanager
-    def get_db_context(self):
-        conn = self.get_connection()
+    def get_db_context(self, write: bool = False):
+        conn = self.get_connection(write=write)
         try:
             yield conn
         finally:
             conn.close()
 
     def init_db(self):
-        conn = self.get_connection()
-        try:
-            c = conn.cursor()
-            
-            # Users table - optimized for authentication
-            c.execute('''CREATE TABLE IF NOT EXISTS users
-                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                         username TEXT NOT NULL UNIQUE COLLATE NOCASE,
-                         email TEXT NOT NULL UNIQUE COLLATE NOCASE,
-                         password_hash TEXT NOT NULL,
-                         full_name TEXT,
-                         is_active INTEGER DEFAULT 1,
-                         is_admin INTEGER DEFAULT 0,
-                         role TEXT DEFAULT 'user',
-                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                         last_login TIMESTAMP)''')
-            
-            # Sessions table - optimized for session management
-            c.execute('''CREATE TABLE IF NOT EXISTS sessions
-                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                         user_id INTEGER NOT NULL,
-                         session_token TEXT NOT NULL UNIQUE,
-                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                         expires_at TIMESTAMP NOT NULL,
-                         last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                         ip_address TEXT,
-                         user_agent TEXT,
-                         remember_me INTEGER DEFAULT 0,
-                         is_active INTEGER DEFAULT 1,
-                         FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE)''')
-            
-            # Create indexes for performance
-            c.execute('''CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)''')
-            c.execute('''CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)''')
-            c.execute('''CREATE INDEX IF NOT EXISTS idx_sessions_token ON sessions(session_token)''')
-            c.execute('''CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id)''')
-            c.execute('''CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions(expires_at)''')
-            
-            # Customers table
-            c.execute('''CREATE TABLE IF NOT EXISTS customers
-                        (id CHAR(32) PRIMARY KEY,
-                         first_name VARCHAR(100),
-                         last_name VARCHAR(100),
-                         full_name VARCHAR(255) NOT NULL,
-                         email VARCHAR(255) NOT NULL,
-                         phone VARCHAR(50),
-                         location VARCHAR(255),
-                         notes TEXT,
-                         is_deleted BOOLEAN DEFAULT 0,
-                         deleted_at DATETIME,
-                         created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                         updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                         user_id INTEGER,
-                         business_name TEXT,
-                         zip_code TEXT,
-                         customer_type TEXT DEFAULT 'contractor',
-                         service TEXT,
-                         role TEXT,
-                         source TEXT DEFAULT 'Admin',
-                         status TEXT DEFAULT 'New',
-                         FOREIGN KEY(user_id) REFERENCES users(id))''')
-            
-            c.execute('''CREATE TABLE IF NOT EXISTS products
-                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                         name TEXT NOT NULL,
-                         width TEXT NOT NULL,
-                         description TEXT,
-                         category TEXT DEFAULT 'Hardwood',
-                         cost_price REAL DEFAULT 0.0,
-                         standard_price REAL DEFAULT 0.0,
-                         min_qty_discount INTEGER,
-                         discount_percentage REAL,
-                         discount_type TEXT,
-                         promotion_name TEXT,
-                         promotion_start_date TIMESTAMP,
-                         promotion_end_date TIMESTAMP,
-                         volume_discounts TEXT,
-                         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-                         
-            # Suppliers table
-            c.execute('''CREATE TABLE IF NOT EXISTS suppliers
-                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                         name TEXT NOT NULL UNIQUE,
-                         email TEXT NOT NULL UNIQUE,
-                         phone TEXT,
-                         address TEXT,
-                         zip_code TEXT,
-                         additional_info TEXT,
-                         is_active INTEGER DEFAULT 1,
-                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-                         
-            c.execute('''CREATE TABLE IF NOT EXISTS price_requests
-                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                         supplier_id INTEGER,
-                         status TEXT DEFAULT 'pending',
-                         sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                         response_data TEXT,
-                         FOREIGN KEY(supplier_id) REFERENCES suppliers(id))''')
-                         
-            c.execute('''CREATE TABLE IF NOT EXISTS quotes
-                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                         customer_name TEXT NOT NULL,
-                         location TEXT NOT NULL,
-                         product_specs TEXT NOT NULL,
-                         quantity INTEGER,
-                         final_price REAL,
-                         user_id INTEGER,
-                         status TEXT DEFAULT 'pending_admin_approval',
-                         rejection_reason TEXT,
-                         ai_retail_price REAL,
-                         ai_dealer_price REAL,
-                         ai_zip_code TEXT,
-                         ai_generated_at TIMESTAMP,
-                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                         FOREIGN KEY(user_id) REFERENCES users(id))''')
-            
-            # Migration: Add is_admin column to existing users table if it doesn't exist
-            try:
-                c.execute("SELECT is_admin FROM users LIMIT 1")
-            except:
-                c.execute("ALTER TABLE users ADD COLUMN is_admin INTEGER DEFAULT 0")
-                print("✓ Added is_admin column to users table")
-
-            # Migration: Add role column to existing users table if it doesn't exist
-            try:
-                c.execute("SELECT role FROM users LIMIT 1")
-            except:
-                c.execute("ALTER TABLE users ADD COLUMN role TEXT DEFAULT 'user'")
-                print("✓ Added role column to users table")
-                
-                # Backfill role based on is_admin
-                c.execute("UPDATE users SET role = 'admin' WHERE is_admin = 1")
-                conn.commit()
-                print("✓ Backfilled role column based on is_admin status")
-            
-            # Migration: Add user_id column to existing quotes table if it doesn't exist
+        """Bring the schema up to date (checked once per database file per process)"""
+        key = os.path.abspath(self.db_path)
+        if key in _schema_ready:
+            return
+        with _schema_lock:
+            if key in _schema_ready:
+                return
+            conn = self.get_connection(write=True)
             try:
-                c.execute("SELECT user_id FROM quotes LIMIT 1")
-            except:
-                c.execute("ALTER TABLE quotes ADD COLUMN user_id INTEGER REFERENCES users(id)")
-                print("✓ Added user_id column to quotes table")
+                apply_migrations(conn)
+            finally:
+                conn.close()
+            _schema_ready.add(key)
 
-            # Migration: Add status column to existing quotes table if it doesn't exist
-            try:
-                c.execute("SELECT status FROM quotes LIMIT 1")
-            except:
-                c.execute("ALTER TABLE quotes ADD COLUMN status TEXT DEFAULT 'pending_admin_approval'")
-                print("✓ Added status column to quotes table")
-                
-                # Backfill status for existing quotes to 'approved' (assuming old quotes are valid)
-                c.execute("UPDATE quotes SET status = 'approved' WHERE status = 'pending_admin_approval'")
-                conn.commit()
-                print("✓ Backfilled status column for existing quotes")
-            
-            # Migration: Add AI pricing columns to quotes table
-            try:
-                c.execute("SELECT ai_retail_price FROM quotes LIMIT 1")
-            except:
-                c.execute("ALTER TABLE quotes ADD COLUMN ai_retail_price REAL")
-                print("✓ Added ai_retail_price column to quotes table")
-            
-            try:
-                c.execute("SELECT ai_dealer_price FROM quotes LIMIT 1")
-            except:
-                c.execute("ALTER TABLE quotes ADD COLUMN ai_dealer_price REAL")
-                print("✓ Added ai_dealer_price column to quotes table")
-            
-            try:
-                c.execute("SELECT ai_zip_code FROM quotes LIMIT 1")
-            except:
-                c.execute("ALTER TABLE quotes ADD COLUMN ai_zip_code TEXT")
-                print("✓ Added ai_zip_code column to quotes table")
-            
-            try:
-                c.execute("SELECT ai_generated_at FROM quotes LIMIT 1")
-            except:
-                c.execute("ALTER TABLE quotes ADD COLUMN ai_generated_at TIMESTAMP")
-                print("✓ Added ai_generated_at column to quotes table")
-            
-            # Migration: Add business_name column to customers table
-            try:
-                c.execute("SELECT business_name FROM customers LIMIT 1")
-            except:
-                c.execute("ALTER TABLE customers ADD COLUMN business_name TEXT DEFAULT 'N/A'")
-                print("✓ Added business_name column to customers table")
+    # ... (skipping unchanged methods)
 
-            # Migration: Add zip_code column to customers table
-            try:
-                c.execute("SELECT zip_code FROM customers LIMIT 1")
-            except:
-                c.execute("ALTER TABLE customers ADD COLUMN zip_code TEXT")
-                print("✓ Added zip_code column to customers table")
-                
-                # Migrate location to zip_code (naive migration)
-                c.execute("UPDATE customers SET zip_code = location WHERE location IS NOT NULL")
-                print("✓ Migrated location to zip_code")
+    # Column list shared by the product read queries (joined with suppliers as s)
+    _PRODUCT_COLUMNS = '''p.id, p.name, p.width, p.description, p.category, p.cost_price, p.standard_price, 
+                                p.discount_percentage, p.min_qty_discount, p.promotion_name, 
+                                p.promotion_start_date, p.promotion_end_date, p.volume_discounts, p.volume_discount_tiers,
+                                p.updated_at, p.supplier_id,
+                                s.name as supplier_name'''
 
-            # Migration: Add customer_type column to customers table
-            try:
-                c.execute("SELECT customer_type FROM customers LIMIT 1")
-            except:
-                c.execute("ALTER TABLE customers ADD COLUMN customer_type TEXT DEFAULT 'contractor'")
-                print("✓ Added customer_type column to customers table")
+    def update_product_price(self, name: str, new_price: float, width: str = None, 
+                           discount_percentage: float = None, min_qty: int = None,
+                           promotion_name: str = None, volume_discounts: str = None,
+                           supplier_id: int = None) -> list:
+        """
+        Update product price and optional promotion details for one width.
+        Lines without a width are skipped, since prices are set per width.
+        Returns the updated rows as dicts (an empty list if nothing matched or the update failed).
+        """
+        if not width:
+            print(f"Skipping price update for {name}: no width given")
+            return []
+        
+        conn = self.get_connection(write=True)
+        try:
+            c = conn.cursor()
             
-            # Migration: Ensure email is unique
-            try:
-                c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_customers_email ON customers(email)")
-            except Exception as e:
-                print(f"Note: Could not create unique index on customers email: {e}")
-
-            # Create customer_interactions table
-            c.execute('''CREATE TABLE IF NOT EXISTS customer_interactions
-                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                     customer_id TEXT NOT NULL,
-                     user_id INTEGER,
-                     status TEXT NOT NULL,
-                     notes TEXT,
-                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                     FOREIGN KEY (customer_id) REFERENCES customers(id),
-                     FOREIGN KEY (user_id) REFERENCES users(id))''')
+            if discount_percentage is not None:
+                set_clause = '''standard_price = ?, cost_price = ?, 
+                                  discount_percentage = ?, min_qty_discount = ?,
+                                  promotion_name = ?, volume_discounts = ?, volume_discount_tiers = ?,
+                                  updated_at = CURRENT_TIMESTAMP'''
+                params = [new_price, new_price * 0.7 if discount_percentage else new_price,
+                         discount_percentage, min_qty, promotion_name, volume_discounts,
+                         normalize_tiers(volume_discounts)]
+            else:
+                set_clause = "standard_price = ?, cost_price = ?, updated_at = CURRENT_TIMESTAMP"
+                params = [new_price, new_price]
             
-            # Create index for quote user_id filtering
-            c.execute('''CREATE INDEX IF NOT EXISTS idx_quotes_user_id ON quotes(user_id)''')
+            if supplier_id:
+                set_clause += ", supplier_id = ?"
+                params.append(supplier_id)
             
-            # Migration: Add new columns to existing customers table
-            if c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='customers'").fetchone():
-                # user_id
-                try:
-                    c.execute("SELECT user_id FROM customers LIMIT 1")
-                except:
-                    c.execute("ALTER TABLE customers ADD COLUMN user_id INTEGER REFERENCES users(id)")
-                    print("✓ Added user_id column to customers table")
-                
-                # first_name
-                try:
-                    c.execute("SELECT first_name FROM customers LIMIT 1")
-                except:
-                    c.execute("ALTER TABLE customers ADD COLUMN first_name VARCHAR(100)")
-                    print("✓ Added first_name column to customers table")
-                
-                # last_name
-                try:
-                    c.execute("SELECT last_name FROM customers LIMIT 1")
-                except:
-                    c.execute("ALTER TABLE customers ADD COLUMN last_name VARCHAR(100)")
-                    print("✓ Added last_name column to customers table")
-                
-                # service
-                try:
-                    c.execute("SELECT service FROM customers LIMIT 1")
-                except:
-                    c.execute("ALTER TABLE customers ADD COLUMN service TEXT")
-                    print("✓ Added service column to customers table")
-                
-                # role
-                try:
-                    c.execute("SELECT role FROM customers LIMIT 1")
-                except:
-                    c.execute("ALTER TABLE customers ADD COLUMN role TEXT")
-                    print("✓ Added role column to customers table")
-                
-                # source
-                try:
-                    c.execute("SELECT source FROM customers LIMIT 1")
-                except:
-                    c.execute("ALTER TABLE customers ADD COLUMN source TEXT DEFAULT 'Admin'")
-                    print("✓ Added source column to customers table")
-                
-                # status
-                try:
-                    c.execute("SELECT status FROM customers LIMIT 1")
-                except:
-                    c.execute("ALTER TABLE customers ADD COLUMN status TEXT DEFAULT 'New'")
-                    print("✓ Added status column to customers table")
+            c.execute(f"UPDATE products SET {set_clause} WHERE name = ? AND width = ?",
+                      tuple(params + [name, width]))
+            if c.rowcount == 0:
+                print(f"Product not found: {name} {width}")
+                return []
             
-            # Migration: Add is_active column to suppliers table if it doesn't exist
-            try:
-                c.execute("SELECT is_active FROM suppliers LIMIT 1")
-            except:
-                c.execute("ALTER TABLE suppliers ADD COLUMN is_active INTEGER DEFAULT 1")
-                print("✓ Added is_active column to suppliers table")
-
-            # Migration: Add supplier_id column to products table if it doesn't exist
-            try:
-                c.execute("SELECT supplier_id FROM products LIMIT 1")
-            except:
-                c.execute("ALTER TABLE products ADD COLUMN supplier_id INTEGER REFERENCES suppliers(id)")
-                print("✓ Added supplier_id column to products table")
-
-            # Migration: Add rejection_reason to quotes
-            try:
-                c.execute("SELECT rejection_reason FROM quotes LIMIT 1")
-            except:
-                c.execute("ALTER TABLE quotes ADD COLUMN rejection_reason TEXT")
-                print("✓ Added rejection_reason column to quotes table")
-
-            # Migration: Add new columns to suppliers
-            for col in ['phone', 'address', 'zip_code', 'additional_info']:
-                try:
-                    c.execute(f"SELECT {col} FROM suppliers LIMIT 1")
-                except:
-                    c.execute(f"ALTER TABLE suppliers ADD COLUMN {col} TEXT")
-                    print(f"✓ Added {col} column to suppliers table")
-
-            # Sync History table for automated tasks
-            c.execute('''CREATE TABLE IF NOT EXISTS sync_history
-                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                         sync_type TEXT NOT NULL,
-                         supplier_id INTEGER,
-                         status TEXT NOT NULL,
-                         message TEXT,
-                         timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                         FOREIGN KEY(supplier_id) REFERENCES suppliers(id))''')
+            # Cached AI pricing was computed against the old base cost
+            invalidate_cached_pricing(c, name, width)
+            
+            c.execute(f'''SELECT {self._PRODUCT_COLUMNS}
+                         FROM products p
+                         LEFT JOIN suppliers s ON p.supplier_id = s.id
+                         WHERE p.name = ? AND p.width = ?''', (name, width))
+            updated = [dict(row) for row in c.fetchall()]
             
             conn.commit()
+            bump_catalog_version(self.db_path)
+            return updated
+        except Exception as e:
+            print(f"Database error in update_product_price: {str(e)}")
+            return []
         finally:
             conn.close()
 
-    # ... (skipping unchanged methods)
-
-    def update_product_price(self, name: str, new_price: float, width: str = None, 
-                           discount_percentage: float = None, min_qty: int = None,
-                           promotion_name: str = None, volume_discounts: str = None,
-                           supplier_id: int = None) -> bool:
-        """Update product price and optional promotion details"""
+    def get_product(self, name: str, width: str = None):
+        """Keyed lookup of a single product row; without a width the first width is returned"""
         conn = self.get_connection()
         try:
             c = conn.cursor()
-            
-            # Check if product exists
             if width:
-                c.execute("SELECT id FROM products WHERE name = ? AND width = ?", (name, width))
+                c.execute(f'''SELECT {self._PRODUCT_COLUMNS}
+                             FROM products p
+                             LEFT JOIN suppliers s ON p.supplier_id = s.id
+                             WHERE p.name = ? AND p.width = ?''', (name, width))
             else:
-                c.execute("SELECT id FROM products WHERE name = ?", (name,))
-                
-            if not c.fetchone():
-                print(f"Product not found: {name} {width or ''}")
-                return False
-            
-            # Update price
-            if width:
-                if discount_percentage is not None:
-                    query = '''UPDATE products 
-                              SET standard_price = ?, cost_price = ?, 
-                                  discount_percentage = ?, min_qty_discount = ?,
-                                  promotion_name = ?, volume_discounts = ?,
-                                  updated_at = CURRENT_TIMESTAMP'''
-                    params = [new_price, new_price * 0.7 if discount_percentage else new_price,
-                             discount_percentage, min_qty, promotion_name, volume_discounts]
-                    
-                    if supplier_id:
-                        query += ", supplier_id = ?"
-                        params.append(supplier_id)
-                        
-                    query += " WHERE name = ? AND width = ?"
-                    params.extend([name, width])
-                    
-                    c.execute(query, tuple(params))
-                else:
-                    query = '''UPDATE products 
-                              SET standard_price = ?, cost_price = ?, updated_at = CURRENT_TIMESTAMP'''
-                    params = [new_price, new_price]
-                    
-                    if supplier_id:
-                        query += ", supplier_id = ?"
-                        params.append(supplier_id)
-                        
-                    query += " WHERE name = ? AND width = ?"
-                    params.extend([name, width])
-                    
-                    c.execute(query, tuple(params))
-            else:
-                # Similar logic for no width (omitted for brevity as width is usually present)
-                pass
-            
-            conn.commit()
-            return True
-        except Exception as e:
-            print(f"Database error in update_product_price: {str(e)}")
-            return False
+                c.execute(f'''SELECT {self._PRODUCT_COLUMNS}
+                             FROM products p
+                             LEFT JOIN suppliers s ON p.supplier_id = s.id
+                             WHERE p.name = ?
+                             ORDER BY p.width LIMIT 1''', (name,))
+            row = c.fetchone()
+            return dict(row) if row else None
         finally:
             conn.close()
 
@@ -418,10 +154,7 @@ class Database:
         conn = self.get_connection()
         try:
             c = conn.cursor()
-            c.execute('''SELECT p.id, p.name, p.width, p.description, p.category, p.cost_price, p.standard_price, 
-                                p.discount_percentage, p.min_qty_discount, p.promotion_name, 
-                                p.promotion_start_date, p.promotion_end_date, p.volume_discounts, p.updated_at,
-                                s.name as supplier_name
+            c.execute(f'''SELECT {self._PRODUCT_COLUMNS}
                         FROM products p
                         LEFT JOIN suppliers s ON p.supplier_id = s.id
                         ORDER BY p.name, p.width''')
@@ -429,6 +162,10 @@ class Database:
         finally:
             conn.close()
 
+    def get_catalog(self):
+        """Shared in-memory catalog snapshot (see catalog.py); rebuilt after product writes"""
+        return get_catalog(self)
+
     def get_products_by_supplier(self, supplier_id: int):
         """Get all products from a specific supplier"""
         conn = self.get_connection()
@@ -437,7 +174,7 @@ class Database:
             c.execute('''SELECT p.id, p.name, p.width, p.description, p.category, 
                                 p.cost_price, p.standard_price, p.discount_percentage, 
                                 p.min_qty_discount, p.promotion_name, p.volume_discounts, 
-                                p.updated_at
+                                p.volume_discount_tiers, p.updated_at
                         FROM products p
                         WHERE p.supplier_id = ?
                         ORDER BY p.name, p.width''', (supplier_id,))
@@ -445,111 +182,93 @@ class Database:
         finally:
             conn.close()
 
-    def bulk_import_products(self, products_data: list, supplier_id: int = None, user_id: int = None) -> dict:
+    # Optional product fields a bulk import may carry; absent (None) values keep the stored value
+    _IMPORT_OPTIONAL_FIELDS = ['description', 'category', 'cost_price', 'discount_percentage',
+                               'min_qty_discount', 'promotion_name', 'volume_discounts',
+                               'volume_discount_tiers']
+
+    def bulk_import_products(self, products_data: list, supplier_id: int = None, user_id: int = None,
+                             row_offset: int = 0, row_numbers: list = None) -> dict:
         """
         Bulk import products - update existing or insert new ones.
-        Returns dict with results: {updated: int, inserted: int, errors: list}
+        Rows are staged into a temp table and applied with one upsert on (name, width).
+        Error reports number rows from row_offset + 1, or use row_numbers (each product's
+        row in the source file) when given.
+        Returns dict with results: {updated: int, inserted: int, skipped: int, errors: list,
+        failed: bool}; failed means the upsert was rolled back and nothing was saved.
         """
         results = {
             "updated": 0,
             "inserted": 0,
             "errors": [],
-            "skipped": 0
+            "skipped": 0,
+            "failed": False
         }
         
-        conn = self.get_connection()
+        staged = []
+        for idx, product in enumerate(products_data):
+            name = product.get('name')
+            width = product.get('width')
+            standard_price = product.get('standard_price')
+            
+            if not name or not width or not standard_price:
+                results["errors"].append({
+                    "row": row_numbers[idx] if row_numbers else row_offset + idx + 1,
+                    "product": name or "Unknown",
+                    "error": "Missing required fields (name, width, or price)"
+                })
+                results["skipped"] += 1
+                continue
+            
+            product = dict(product, volume_discount_tiers=normalize_tiers(product.get('volume_discounts')))
+            staged.append((len(staged), name, width, standard_price) +
+                          tuple(product.get(field) for field in self._IMPORT_OPTIONAL_FIELDS))
+        
+        if not staged:
+            return results
+        
+        fields = self._IMPORT_OPTIONAL_FIELDS
+        conn = self.get_connection(write=True)
         try:
             c = conn.cursor()
+            c.execute(f'''CREATE TEMP TABLE IF NOT EXISTS product_import_staging
+                         (seq INTEGER PRIMARY KEY, name TEXT NOT NULL, width TEXT NOT NULL,
+                          standard_price REAL, {', '.join(fields)})''')
+            c.execute("DELETE FROM product_import_staging")
+            c.executemany(f'''INSERT INTO product_import_staging
+                             (seq, name, width, standard_price, {', '.join(fields)})
+                             VALUES ({', '.join('?' * (4 + len(fields)))})''', staged)
             
-            for idx, product in enumerate(products_data):
-                try:
-                    name = product.get('name')
-                    width = product.get('width')
-                    standard_price = product.get('standard_price')
-                    
-                    if not name or not width or not standard_price:
-                        results["errors"].append({
-                            "row": idx + 1,
-                            "product": name or "Unknown",
-                            "error": "Missing required fields (name, width, or price)"
-                        })
-                        results["skipped"] += 1
-                        continue
-                    
-                    # Check if product exists
-                    c.execute("SELECT id FROM products WHERE name = ? AND width = ?", (name, width))
-                    existing = c.fetchone()
-                    
-                    if existing:
-                        # Update existing product
-                        update_fields = ["standard_price = ?"]
-                        params = [standard_price]
-                        
-                        if 'cost_price' in product:
-                            update_fields.append("cost_price = ?")
-                            params.append(product['cost_price'])
-                        
-                        if 'description' in product:
-                            update_fields.append("description = ?")
-                            params.append(product['description'])
-                        
-                        if 'category' in product:
-                            update_fields.append("category = ?")
-                            params.append(product['category'])
-                        
-                        if 'discount_percentage' in product:
-                            update_fields.append("discount_percentage = ?")
-                            params.append(product['discount_percentage'])
-                        
-                        if 'min_qty_discount' in product:
-                            update_fields.append("min_qty_discount = ?")
-                            params.append(product['min_qty_discount'])
-                        
-                        if 'promotion_name' in product:
-                            update_fields.append("promotion_name = ?")
-                            params.append(product['promotion_name'])
-                        
-                        if 'volume_discounts' in product:
-                            update_fields.append("volume_discounts = ?")
-                            params.append(product['volume_discounts'])
-                        
-                        if supplier_id:
-                            update_fields.append("supplier_id = ?")
-                            params.append(supplier_id)
-                        
-                        update_fields.append("updated_at = CURRENT_TIMESTAMP")
-                        params.extend([name, width])
-                        
-                        query = f"UPDATE products SET {', '.join(update_fields)} WHERE name = ? AND width = ?"
-                        c.execute(query, params)
-                        results["updated"] += 1
-                    else:
-                        # Insert new product
-                        c.execute('''INSERT INTO products 
-                                    (name, width, description, category, cost_price, standard_price,
-                                     min_qty_discount, discount_percentage, promotion_name, volume_discounts, supplier_id)
-                                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                                 (name, width,
-                                  product.get('description'),
-                                  product.get('category', 'Hardwood'),
-                                  product.get('cost_price', 0.0),
-                                  standard_price,
-                                  product.get('min_qty_discount'),
-                                  product.get('discount_percentage'),
-                                  product.get('promotion_name'),
-                                  product.get('volume_discounts'),
-                                  supplier_id))
-                        results["inserted"] += 1
-                        
-                except Exception as e:
-                    results["errors"].append({
-                        "row": idx + 1,
-                        "product": product.get('name', 'Unknown'),
-                        "error": str(e)
-                    })
-                    results["skipped"] += 1
+            # AUTOINCREMENT ids only grow, so rows above this id were inserted by the upsert
+            max_id_before = c.execute("SELECT COALESCE(MAX(id), 0) FROM products").fetchone()[0]
+            
+            # Rows are applied in sheet order; a repeated (name, width) updates the row inserted
+            # earlier in the same statement, exactly as the old row-by-row import did
+            c.execute(f'''INSERT INTO products (name, width, standard_price, {', '.join(fields)}, supplier_id)
+                         SELECT name, width, standard_price, {', '.join(fields)}, ?
+                         FROM product_import_staging WHERE 1 ORDER BY seq
+                         ON CONFLICT(name, width) DO UPDATE SET
+                             standard_price = excluded.standard_price,
+                             {', '.join(f"{f} = COALESCE(excluded.{f}, {f})" for f in fields)},
+                             supplier_id = COALESCE(excluded.supplier_id, supplier_id),
+                             updated_at = CURRENT_TIMESTAMP''', (supplier_id,))
+            
+            # Column defaults for new rows whose sheet left the optional fields empty
+            c.execute('''UPDATE products SET category = COALESCE(category, 'Hardwood'),
+                                               cost_price = COALESCE(cost_price, 0.0)
+                         WHERE id > ?''', (max_id_before,))
+            inserted = c.execute("SELECT COUNT(*) FROM products WHERE id > ?", (max_id_before,)).fetchone()[0]
+            
+            # Cached AI pricing was computed against the old base costs
+            c.execute('''DELETE FROM ai_pricing_cache WHERE EXISTS
+                         (SELECT 1 FROM product_import_staging s
+                          WHERE s.name = ai_pricing_cache.product AND s.width = ai_pricing_cache.width)''')
+            c.execute("DELETE FROM product_import_staging")
             
             conn.commit()
+            bump_catalog_version(self.db_path)
+            results["inserted"] = inserted
+            results["updated"] = len(staged) - inserted
             
             # Log the import
             if user_id:
@@ -563,6 +282,8 @@ class Database:
         except Exception as e:
             conn.rollback()
             results["errors"].append({"error": f"Database error: {str(e)}"})
+            results["skipped"] += len(staged)
+            results["failed"] = True
         finally:
             conn.close()
         
@@ -600,7 +321,7 @@ class Database:
 
     def log_sync_event(self, sync_type: str, status: str, message: str = None, supplier_id: int = None):
         """Log an automated sync event"""
-        conn = self.get_connection()
+        conn = self.get_connection(write=True)
         try:
             c = conn.cursor()
             c.execute('''INSERT INTO sync_history (sync_type, status, message, supplier_id)
@@ -612,6 +333,31 @@ class Database:
         finally:
             conn.close()
 
+    def get_sync_state(self, key: str, default: str = None):
+        """Read a persisted sync checkpoint"""
+        conn = self.get_connection()
+        try:
+            c = conn.cursor()
+            c.execute("SELECT value FROM sync_state WHERE key = ?", (key,))
+            row = c.fetchone()
+            return row['value'] if row else default
+        finally:
+            conn.close()
+
+    def set_sync_state(self, key: str, value: str):
+        """Persist a sync checkpoint"""
+        conn = self.get_connection(write=True)
+        try:
+            c = conn.cursor()
+            c.execute('''INSERT INTO sync_state (key, value, updated_at)
+                        VALUES (?, ?, CURRENT_TIMESTAMP)
+                        ON CONFLICT(key) DO UPDATE SET value = excluded.value,
+                                                       updated_at = CURRENT_TIMESTAMP''',
+                     (key, str(value) if value is not None else None))
+            conn.commit()
+        finally:
+            conn.close()
+
     def get_last_sync(self, sync_type: str):
         """Get the last successful sync event for a given type"""
         conn = self.get_connection()
@@ -631,7 +377,7 @@ class Database:
                    discount_percentage: float = None, discount_type: str = None,
                    promotion_name: str = None, promotion_start_date: str = None,
                    promotion_end_date: str = None, volume_discounts: str = None) -> int:
-        conn = self.get_connection()
+        conn = self.get_connection(write=True)
         try:
             c = conn.cursor()
             width_str = str(width).strip()
@@ -642,12 +388,15 @@ class Database:
             
             c.execute('''INSERT INTO products (name, width, description, category, cost_price, standard_price,
                                                min_qty_discount, discount_percentage, discount_type,
-                                               promotion_name, promotion_start_date, promotion_end_date, volume_discounts)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                                               promotion_name, promotion_start_date, promotion_end_date, volume_discounts,
+                                               volume_discount_tiers)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
                      (name.strip(), width_str, description, category, float(cost_price), float(std_price),
                       min_qty_discount, discount_percentage, discount_type,
-                      promotion_name, promotion_start_date, promotion_end_date, volume_discounts))
+                      promotion_name, promotion_start_date, promotion_end_date, volume_discounts,
+                      normalize_tiers(volume_discounts)))
             conn.commit()
+            bump_catalog_version(self.db_path)
             result = c.lastrowid
             return result
         finally:
@@ -655,7 +404,7 @@ class Database:
 
     def add_supplier(self, name: str, email: str, phone: str = None, address: str = None, 
                     zip_code: str = None, additional_info: str = None) -> int:
-        conn = self.get_connection()
+        conn = self.get_connection(write=True)
         try:
             c = conn.cursor()
             c.execute('''INSERT INTO suppliers (name, email, phone, address, zip_code, additional_info)
@@ -716,25 +465,79 @@ class Database:
         finally:
             conn.close()
 
-    def create_quote(self, customer_name, location, product_specs, quantity, final_price, user_id=None, status='pending_admin_approval',
-                    ai_retail_price=None, ai_dealer_price=None, ai_zip_code=None, ai_generated_at=None):
+    def get_supplier_by_email(self, email: str):
+        """Case-insensitive supplier lookup by email address"""
+        if not email:
+            return None
         conn = self.get_connection()
         try:
             c = conn.cursor()
+            c.execute('''SELECT id, name, email, phone, address, zip_code, additional_info, is_active, created_at
+                        FROM suppliers WHERE email = ? COLLATE NOCASE''', (email.strip(),))
+            row = c.fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+
+    def _resolve_customer_id(self, c, customer_name: str):
+        """Key of the customer on file under this full or business name, if any"""
+        if not customer_name:
+            return None
+        for column in ("full_name", "business_name"):
+            c.execute(f"SELECT id FROM customers WHERE {column} = ? ORDER BY COALESCE(is_deleted, 0) LIMIT 1",
+                      (customer_name,))
+            row = c.fetchone()
+            if row:
+                return row['id']
+        return None
+
+    def _resolve_product_id(self, c, product_specs):
+        """Product row for the (product, width) in a quote's product_specs JSON"""
+        try:
+            specs = json.loads(product_specs) if isinstance(product_specs, str) else product_specs
+        except ValueError:
+            return None
+        if not isinstance(specs, dict) or not specs.get('product'):
+            return None
+        c.execute("SELECT id FROM products WHERE name = ? AND width = ?",
+                  (specs.get('product'), specs.get('width')))
+        row = c.fetchone()
+        return row['id'] if row else None
+
+    def create_quote(self, customer_name, location, product_specs, quantity, final_price, user_id=None, status='pending_admin_approval',
+                    ai_retail_price=None, ai_dealer_price=None, ai_zip_code=None, ai_generated_at=None,
+                    customer_id=None, product_id=None):
+        """
+        Insert a quote. customer_id / product_id are looked up from the customer name
+        and product_specs when the caller does not already have them.
+        """
+        conn = self.get_connection(write=True)
+        try:
+            c = conn.cursor()
+            if customer_id is None:
+                customer_id = self._resolve_customer_id(c, customer_name)
+            elif isinstance(customer_id, uuid.UUID):
+                customer_id = customer_id.hex
+            if product_id is None:
+                product_id = self._resolve_product_id(c, product_specs)
             c.execute('''INSERT INTO quotes 
                         (customer_name, location, product_specs, quantity, final_price, user_id, status,
-                         ai_retail_price, ai_dealer_price, ai_zip_code, ai_generated_at)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                         ai_retail_price, ai_dealer_price, ai_zip_code, ai_generated_at,
+                         customer_id, product_id)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
                       (customer_name, location, product_specs, quantity, final_price, user_id, status,
-                       ai_retail_price, ai_dealer_price, ai_zip_code, ai_generated_at))
+                       ai_retail_price, ai_dealer_price, ai_zip_code, ai_generated_at,
+                       customer_id, product_id))
+            quote_id = c.lastrowid
+            quote_rollups.apply_quote(c, quote_id)
             conn.commit()
-            return c.lastrowid
+            return quote_id
         finally:
             conn.close()
 
     def update_quote(self, quote_id, final_price, quantity=None, location=None, product_specs=None):
         """Update quote details"""
-        conn = self.get_connection()
+        conn = self.get_connection(write=True)
         try:
             c = conn.cursor()
             updates = ["final_price = ?"]
@@ -749,11 +552,16 @@ class Database:
             if product_specs is not None:
                 updates.append("product_specs = ?")
                 params.append(product_specs)
+                updates.append("product_id = ?")
+                params.append(self._resolve_product_id(c, product_specs))
                 
             params.append(quote_id)
             query = f"UPDATE quotes SET {', '.join(updates)} WHERE id = ?"
             
+            # Move the quote's contribution from its old rollup row to the new one
+            quote_rollups.apply_quote(c, quote_id, -1)
             c.execute(query, params)
+            quote_rollups.apply_quote(c, quote_id)
             conn.commit()
             return True
         except Exception as e:
@@ -764,14 +572,16 @@ class Database:
 
     def update_quote_status(self, quote_id, status, reason=None):
         """Update quote status with optional rejection reason"""
-        conn = self.get_connection()
+        conn = self.get_connection(write=True)
         try:
             c = conn.cursor()
+            quote_rollups.apply_quote(c, quote_id, -1)
             if reason:
                 c.execute("UPDATE quotes SET status = ?, rejection_reason = ? WHERE id = ?", 
                          (status, reason, quote_id))
             else:
                 c.execute("UPDATE quotes SET status = ? WHERE id = ?", (status, quote_id))
+            quote_rollups.apply_quote(c, quote_id)
             conn.commit()
             return True
         except Exception as e:
@@ -798,8 +608,19 @@ class Database:
         finally:
             conn.close()
 
-    def get_analytics_data(self, user_id: int = None, is_admin: bool = False):
-        """Get comprehensive quote data for analytics, joined with customer info"""
+    # Sort options for the dashboard's recent quotes list
+    _QUOTE_SORTS = {
+        "Date (Newest First)": "q.created_at DESC",
+        "Date (Oldest First)": "q.created_at ASC",
+        "Customer Name": "q.customer_name",
+        "Wood Type": "CASE WHEN json_valid(q.product_specs) THEN json_extract(q.product_specs, '$.product') END",
+        "Zip Code": "COALESCE(c.zip_code, q.location)",
+        "Price (High to Low)": "q.final_price DESC",
+    }
+
+    def get_analytics_data(self, user_id: int = None, is_admin: bool = False,
+                           limit: int = None, sort_by: str = "Date (Newest First)"):
+        """Get quote rows for analytics, joined with customer info (optionally sorted and limited in SQL)"""
         conn = self.get_connection()
         try:
             c = conn.cursor()
@@ -818,10 +639,8 @@ class Database:
                     c.business_name,
                     p.category as product_category
                 FROM quotes q
-                LEFT JOIN customers c ON q.customer_name = c.business_name OR q.customer_name = c.full_name
-                LEFT JOIN products p ON 
-                    json_extract(q.product_specs, '$.product') = p.name AND 
-                    json_extract(q.product_specs, '$.width') = p.width
+                LEFT JOIN customers c ON c.id = q.customer_id
+                LEFT JOIN products p ON p.id = q.product_id
             '''
             
             params = []
@@ -830,44 +649,68 @@ class Database:
                 query += " WHERE q.user_id = ? OR q.user_id IS NULL"
                 params.append(user_id)
                 
-            query += " ORDER BY q.created_at DESC"
+            order = self._QUOTE_SORTS.get(sort_by, self._QUOTE_SORTS["Date (Newest First)"])
+            query += f" ORDER BY {order}, q.id DESC"
+            if limit:
+                query += " LIMIT ?"
+                params.append(limit)
             
             c.execute(query, params)
             return [dict(row) for row in c.fetchall()]
         finally:
             conn.close()
 
-    def is_user_admin(self, user_id: int) -> bool:
-        """Check if a user has admin privileges"""
+    def get_quote_rollups(self, user_id: int = None, is_admin: bool = False):
+        """Daily quote rollup rows; non-admins see their own quotes plus unassigned ones"""
         conn = self.get_connection()
         try:
             c = conn.cursor()
-            # Check role first, fallback to is_admin flag
-            c.execute("SELECT role, is_admin FROM users WHERE id = ?", (user_id,))
-            result = c.fetchone()
-            if not result:
-                return False
-            
-            # If role column exists and is populated
-            if 'role' in result.keys() and result['role']:
-                return result['role'] in ('admin', 'super_admin')
-                
-            return bool(result['is_admin'])
+            if is_admin or user_id is None:
+                c.execute("SELECT * FROM quote_rollups_daily WHERE quote_count > 0")
+            else:
+                c.execute("SELECT * FROM quote_rollups_daily WHERE user_id IN (?, 0) AND quote_count > 0",
+                          (user_id,))
+            return [dict(row) for row in c.fetchall()]
         finally:
             conn.close()
 
-    def is_user_super_admin(self, user_id: int) -> bool:
-        """Check if a user is a super admin"""
+    def rebuild_quote_rollups(self) -> int:
+        """Recompute the quote rollups from scratch. Returns the number of rollup rows."""
+        conn = self.get_connection(write=True)
+        try:
+            rows = quote_rollups.rebuild(conn.cursor())
+            conn.commit()
+            return rows
+        finally:
+            conn.close()
+
+    def get_user_role(self, user_id: int) -> dict:
+        """role/is_admin/is_super_admin for a user (cached per user_id), or None if the user does not exist"""
+        flags = self.users.get(user_id)
+        if flags is not None:
+            return flags
         conn = self.get_connection()
         try:
             c = conn.cursor()
-            c.execute("SELECT role FROM users WHERE id = ?", (user_id,))
+            c.execute("SELECT role, is_admin FROM users WHERE id = ?", (user_id,))
             result = c.fetchone()
-            if not result or 'role' not in result.keys():
-                return False
-            return result['role'] == 'super_admin'
         finally:
             conn.close()
+        if not result:
+            return None
+        flags = role_flags(result['role'], result['is_admin'])
+        self.users.put(user_id, flags)
+        return flags
+
+    def is_user_admin(self, user_id: int) -> bool:
+        """Check if a user has admin privileges"""
+        flags = self.get_user_role(user_id)
+        return bool(flags and flags['is_admin'])
+
+    def is_user_super_admin(self, user_id: int) -> bool:
+        """Check if a user is a super admin"""
+        flags = self.get_user_role(user_id)
+        return bool(flags and flags['is_super_admin'])
 
     def populate_sample_data(self):
         try:
@@ -919,15 +762,17 @@ class Database:
                 ("Luxury Imports Ltd", "premium@luxuryimports.com", "Exotic wood imports - white-glove service")
             ]
             
-            conn = self.get_connection()
+            conn = self.get_connection(write=True)
             try:
                 c = conn.cursor()
                 c.execute("DELETE FROM quotes")
+                c.execute("DELETE FROM quote_rollups_daily")
                 c.execute("DELETE FROM price_requests")
                 c.execute("DELETE FROM products")
                 c.execute("DELETE FROM suppliers")
                 c.execute("DELETE FROM sqlite_sequence")
                 conn.commit()
+                bump_catalog_version(self.db_path)
             finally:
                 conn.close()
                 
@@ -942,7 +787,7 @@ class Database:
             print("Adding all width variants for products...")
             SUPPORTED_WIDTHS = ["2.5\"", "3.5\"", "4\"", "5\"", "6\"", "7\"", "8\"", "10\"", "11\"", "12\"", "13\"", "14\""]
             
-            conn = self.get_connection()
+            conn = self.get_connection(write=True)
             try:
                 c = conn.cursor()
                 
@@ -966,8 +811,8 @@ class Database:
                                     name, width, description, category, cost_price, standard_price,
                                     min_qty_discount, discount_percentage, discount_type,
                                     promotion_name, promotion_start_date, promotion_end_date,
-                                    volume_discounts
-                                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                    volume_discounts, volume_discount_tiers
+                                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                             """, (
                                 product_name,
                                 width,
@@ -981,11 +826,13 @@ class Database:
                                 template.get('promotion_name'),
                                 template.get('promotion_start_date'),
                                 template.get('promotion_end_date'),
-                                template.get('volume_discounts')
+                                template.get('volume_discounts'),
+                                template.get('volume_discount_tiers')
                             ))
                             added_count += 1
                 
                 conn.commit()
+                bump_catalog_version(self.db_path)
                 print(f"✅ Added {added_count} width variants. Total products: {len(products) * len(SUPPORTED_WIDTHS)}")
             finally:
                 conn.close()
@@ -1000,7 +847,7 @@ class Database:
     
     def register_user(self, username: str, email: str, password_hash: str, full_name: str = None) -> dict:
         """Register a new user - returns user dict or error dict"""
-        conn = self.get_connection()
+        conn = self.get_connection(write=True)
         try:
             c = conn.cursor()
             
@@ -1034,6 +881,27 @@ class Database:
         finally:
             conn.close()
 
+    def update_password_hash(self, user_id: int, new_hash: str, old_hash: str = None) -> bool:
+        """
+        Store a new password hash. With old_hash the update only applies if the stored hash
+        is unchanged, so a background rehash never overwrites a password changed meanwhile.
+        """
+        conn = self.get_connection(write=True)
+        try:
+            c = conn.cursor()
+            if old_hash is None:
+                c.execute("UPDATE users SET password_hash = ? WHERE id = ?", (new_hash, user_id))
+            else:
+                c.execute("UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?",
+                          (new_hash, user_id, old_hash))
+            conn.commit()
+            return c.rowcount > 0
+        except Exception as e:
+            print(f"Error updating password hash: {e}")
+            return False
+        finally:
+            conn.close()
+
     def get_all_users(self) -> list:
         """Get all users for management"""
         conn = self.get_connection()
@@ -1047,7 +915,7 @@ class Database:
 
     def update_user_role(self, user_id: int, new_role: str) -> bool:
         """Update user role"""
-        conn = self.get_connection()
+        conn = self.get_connection(write=True)
         try:
             c = conn.cursor()
             
@@ -1057,6 +925,8 @@ class Database:
             c.execute("UPDATE users SET role = ?, is_admin = ? WHERE id = ?", 
                      (new_role, is_admin_flag, user_id))
             conn.commit()
+            self.sessions.invalidate_user(user_id)
+            self.users.invalidate(user_id)
             return True
         except Exception as e:
             print(f"Error updating user role: {e}")
@@ -1066,11 +936,13 @@ class Database:
 
     def delete_user(self, user_id: int) -> bool:
         """Soft delete user"""
-        conn = self.get_connection()
+        conn = self.get_connection(write=True)
         try:
             c = conn.cursor()
             c.execute("UPDATE users SET is_active = 0 WHERE id = ?", (user_id,))
             conn.commit()
+            self.sessions.invalidate_user(user_id)
+            self.users.invalidate(user_id)
             return True
         except Exception as e:
             print(f"Error deleting user: {e}")
@@ -1083,7 +955,7 @@ class Database:
         """Create a new session - 45 mins default, extended if remember_me"""
         from datetime import datetime, timedelta
         
-        conn = self.get_connection()
+        conn = self.get_connection(write=True)
         try:
             c = conn.cursor()
             
@@ -1111,51 +983,68 @@ class Database:
             conn.close()
 
     def validate_session(self, session_token: str) -> dict:
-        """Validate a session token and return user info if valid"""
+        """
+        Validate a session token and return user info, including role/is_admin/is_super_admin, if valid.
+        Valid sessions are cached briefly and last_activity is written in batches (see session_cache.py).
+        """
         from datetime import datetime
         
+        cached = self.sessions.get(session_token)
+        if cached is not None:
+            self.sessions.touch(session_token)
+            return dict(cached)
+        
         conn = self.get_connection()
         try:
             c = conn.cursor()
             
             # Get session and check expiration
-            c.execute('''SELECT s.id, s.user_id, s.expires_at, s.is_active, u.username, u.email, u.full_name
+            c.execute('''SELECT s.id, s.user_id, s.expires_at, s.is_active, u.username, u.email, u.full_name,
+                               u.role, u.is_admin
                         FROM sessions s
                         JOIN users u ON s.user_id = u.id
                         WHERE s.session_token = ? AND s.is_active = 1''', (session_token,))
             
             result = c.fetchone()
-            if not result:
-                return {"valid": False, "error": "Session not found"}
-            
-            session = dict(result)
-            expires_at = datetime.fromisoformat(session['expires_at'])
-            
-            # Check if expired
-            if datetime.now() > expires_at:
-                # Invalidate expired session
-                c.execute("UPDATE sessions SET is_active = 0 WHERE id = ?", (session['id'],))
-                conn.commit()
-                return {"valid": False, "error": "Session expired"}
-            
-            # Update last activity
-            c.execute("UPDATE sessions SET last_activity = CURRENT_TIMESTAMP WHERE id = ?", (session['id'],))
-            conn.commit()
-            
-            return {
-                "valid": True,
-                "user_id": session['user_id'],
-                "username": session['username'],
-                "email": session['email'],
-                "full_name": session['full_name']
-            }
-            
         finally:
             conn.close()
+        
+        if not result:
+            return {"valid": False, "error": "Session not found"}
+        
+        session = dict(result)
+        expires_at = datetime.fromisoformat(session['expires_at'])
+        
+        # Check if expired
+        if datetime.now() > expires_at:
+            # Invalidate expired session
+            conn = self.get_connection(write=True)
+            try:
+                conn.execute("UPDATE sessions SET is_active = 0 WHERE id = ?", (session['id'],))
+                conn.commit()
+            finally:
+                conn.close()
+            return {"valid": False, "error": "Session expired"}
+        
+        flags = role_flags(session['role'], session['is_admin'])
+        self.users.put(session['user_id'], flags)
+        info = {
+            "valid": True,
+            "user_id": session['user_id'],
+            "username": session['username'],
+            "email": session['email'],
+            "full_name": session['full_name'],
+            **flags
+        }
+        self.sessions.put(session_token, info, session['id'], expires_at)
+        # Update last activity (batched)
+        self.sessions.touch(session_token)
+        return dict(info)
 
     def invalidate_session(self, session_token: str) -> bool:
         """Invalidate/logout a session"""
-        conn = self.get_connection()
+        self.sessions.invalidate(session_token)
+        conn = self.get_connection(write=True)
         try:
             c = conn.cursor()
             c.execute("UPDATE sessions SET is_active = 0 WHERE session_token = ?", (session_token,))
@@ -1168,17 +1057,74 @@ class Database:
             conn.close()
 
     def cleanup_expired_sessions(self):
-        """Clean up expired sessions (run periodically)"""
-        from datetime import datetime
-        
-        conn = self.get_connection()
+        """Clean up expired sessions (run periodically by the scheduler's session janitor)"""
+        return self.purge_expired_sessions()
+
+    def purge_expired_sessions(self, batch_size: int = 500, max_batches: int = 100,
+                               pause_seconds: float = 0.0) -> int:
+        """
+        Delete expired sessions in batches of batch_size, committing after each batch so
+        request writes can take the writer connection in between. Returns the number deleted.
+        """
+        cutoff = datetime.now()
+        purged = 0
+        for _ in range(max_batches):
+            conn = self.get_connection(write=True)
+            try:
+                c = conn.cursor()
+                c.execute('''DELETE FROM sessions WHERE id IN
+                             (SELECT id FROM sessions WHERE expires_at < ? LIMIT ?)''',
+                          (cutoff, batch_size))
+                conn.commit()
+                deleted = c.rowcount
+            except Exception as e:
+                print(f"Error cleaning up sessions: {str(e)}")
+                break
+            finally:
+                conn.close()
+            purged += deleted
+            if deleted < batch_size:
+                break
+            if pause_seconds:
+                time.sleep(pause_seconds)
+        return purged
+
+    def enable_incremental_vacuum(self) -> bool:
+        """
+        Switch an existing database file to auto_vacuum=INCREMENTAL. New files start in that
+        mode (see ConnectionPool); older ones need a one-time VACUUM, which rewrites the file
+        and holds the writer while it runs, so it is run explicitly (enable_incremental_vacuum.py)
+        rather than by the scheduler. Returns True if the mode is active.
+        """
+        conn = self.get_connection(write=True)
         try:
-            c = conn.cursor()
-            c.execute("DELETE FROM sessions WHERE expires_at < ?", (datetime.now(),))
-            conn.commit()
-            return c.rowcount
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                return True
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            # VACUUM may renumber the implicit rowids customers_fts is keyed on
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'customers_fts'").fetchone():
+                conn.execute("INSERT INTO customers_fts(customers_fts) VALUES ('rebuild')")
+                conn.commit()
+            return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        except Exception as e:
+            print(f"Error enabling incremental vacuum: {str(e)}")
+            return False
+        finally:
+            conn.close()
+
+    def incremental_vacuum(self, max_pages: int = 1000) -> int:
+        """Return up to max_pages free pages to the filesystem. Returns the number of pages freed."""
+        conn = self.get_connection(write=True)
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                return 0
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            # execute() steps the pragma only once (one page); executescript runs it to completion
+            conn.executescript(f"PRAGMA incremental_vacuum({int(max_pages)});")
+            return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
         except Exception as e:
-            print(f"Error cleaning up sessions: {str(e)}")
+            print(f"Error running incremental vacuum: {str(e)}")
             return 0
         finally:
             conn.close()
\ No newline at end of file
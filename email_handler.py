@@ -3,8 +3,9 @@ import re
 import json
 from datetime import datetime
 from database import Database
-from gmail_service import GmailService
+from gmail_service import GmailService, StaleHistoryError
 from config import GMAIL_CREDENTIALS_PATH
+from volume_discounts import parse_tiers
 
 class EmailHandler:
     def __init__(self, database: Database):
@@ -12,15 +13,17 @@ class EmailHandler:
         self.db = database
         self.sent_request_thread_ids = set()
     
-    def verify_database_update(self, name: str, price: float, width: str = None) -> bool:
+    def verify_database_update(self, name: str, price: float, width: str = None, rows: list = None) -> bool:
+        """Check the stored price; pass the rows returned by update_product_price to skip the re-read"""
         try:
-            products = self.db.get_products()
-            for p in products:
-                if p['name'] == name:
-                    if width is None or p['width'] == width:
-                        standard_price = p.get('standard_price', p.get('cost_price', 0))
-                        if abs(standard_price - price) < 0.01:
-                            return True
+            if rows is None:
+                product = self.db.get_product(name, width)
+                rows = [product] if product else []
+            for p in rows:
+                if p['name'] == name and (width is None or p['width'] == width):
+                    standard_price = p.get('standard_price', p.get('cost_price', 0))
+                    if abs(standard_price - price) < 0.01:
+                        return True
             return False
         except Exception as e:
             print(f"Error verifying database update: {str(e)}")
@@ -49,19 +52,11 @@ class EmailHandler:
         
         return None
     
-    def _parse_volume_discounts(self, discount_text: str) -> dict:
+    def _parse_volume_discounts(self, discount_text: str) -> Optional[str]:
+        """Volume tiers found in the text, in canonical form (None if there are none)"""
         try:
-            discounts = {}
-            lines = discount_text.split('\n')
-            for line in lines:
-                match = re.search(r'(\d+)\s*(?:to|-)?\s*(?:(\d+)\s*)?sqft\s*[:-]\s*(\d+(?:\.\d+)?)\s*%', line, re.IGNORECASE)
-                if match:
-                    min_qty = int(match.group(1))
-                    max_qty = int(match.group(2)) if match.group(2) else None
-                    discount = float(match.group(3))
-                    key = f"{min_qty}-{max_qty if max_qty else 'inf'}"
-                    discounts[key] = discount
-            return discounts if discounts else None
+            tiers = parse_tiers(discount_text)
+            return tiers.format() if tiers else None
         except Exception as e:
             print(f"Error parsing volume discounts: {str(e)}")
             return None
@@ -143,14 +138,66 @@ Note: This is an automated request. If you have any questions, please contact yo
         
         return result
     
-    def check_replies_and_save(self, gemini_client=None) -> list:
-        # Get our own email address first
+    # sync_state key holding the last Gmail historyId whose new mail has been processed
+    HISTORY_CHECKPOINT_KEY = "gmail_history_id"
+    # sync_state key holding {message_id: attempts} for replies that could not be processed yet;
+    # the checkpoint moves past them, so they are re-fetched by id on the next runs
+    RETRY_MESSAGES_KEY = "gmail_retry_message_ids"
+    MAX_REPLY_ATTEMPTS = 5
+    # Subject fragment shared by every price-request reply (the broadest cascade query below)
+    REPLY_SUBJECT = "Price Update"
+    
+    def _load_retry_ids(self) -> Dict[str, int]:
         try:
-            own_email = self.gmail.get_user_email()
-        except:
-            print("Warning: Could not get user email, using default filters")
-            own_email = None
-
+            return json.loads(self.db.get_sync_state(self.RETRY_MESSAGES_KEY) or '{}')
+        except ValueError:
+            return {}
+    
+    def _save_retry_ids(self, previous: Dict[str, int], failed_ids: List[str]):
+        """Keep failed replies for another attempt, dropping those that failed MAX_REPLY_ATTEMPTS times"""
+        retry = {}
+        for message_id in filter(None, failed_ids):
+            attempts = previous.get(message_id, 0) + 1
+            if attempts < self.MAX_REPLY_ATTEMPTS:
+                retry[message_id] = attempts
+            else:
+                print(f"Giving up on message {message_id} after {attempts} attempts")
+        if retry or previous:
+            self.db.set_sync_state(self.RETRY_MESSAGES_KEY, json.dumps(retry))
+    
+    def _fetch_new_replies(self, checkpoint: str, own_email: Optional[str],
+                           retry_ids: Optional[List[str]] = None,
+                           failed_ids: Optional[List[str]] = None) -> Optional[tuple]:
+        """
+        Incremental sync: messages added to the inbox since the stored checkpoint, plus
+        earlier replies that failed to process (retry_ids).
+        Returns (messages, new_history_id), or None when the checkpoint is stale.
+        Ids of messages that could not be fetched are appended to failed_ids.
+        
+        Like the search cascade, only messages whose subject contains REPLY_SUBJECT are
+        considered; replies whose subject was rewritten are not picked up.
+        """
+        try:
+            message_ids, latest_history_id = self.gmail.list_history(checkpoint)
+        except StaleHistoryError as e:
+            print(f"History checkpoint is stale ({e}); falling back to a full scan")
+            return None
+        
+        print(f"Incremental sync: {len(message_ids)} new message(s) since history {checkpoint}")
+        retry_ids = [m for m in (retry_ids or []) if m not in set(message_ids)]
+        if retry_ids:
+            print(f"Retrying {len(retry_ids)} message(s) that failed to process earlier")
+        message_ids = retry_ids + message_ids
+        messages = self.gmail.get_messages(
+            message_ids,
+            exclude_senders=[own_email] if own_email else None,
+            subject_contains=self.REPLY_SUBJECT,
+            failed_ids=failed_ids
+        )
+        return messages, latest_history_id
+    
+    def _search_replies(self, own_email: Optional[str], failed_ids: Optional[List[str]] = None) -> list:
+        """Full scan: walk progressively broader searches until one returns replies"""
         # Query for replies - try multiple approaches in order of specificity
         queries_to_try = [
             ('subject:"Re: Price Update Request - PrimeLine Flooring" is:unread', 'Unread replies to PrimeLine'),
@@ -168,18 +215,88 @@ Note: This is an automated request. If you have any questions, please contact yo
                 continue
             print(f"Attempting: {description}")
             print(f"  Query: {query}")
-            messages = self.gmail.check_inbox(query=query, max_results=20)
+            messages = self.gmail.check_inbox(
+                query=query, max_results=20,
+                exclude_senders=[own_email] if own_email else None,
+                failed_ids=failed_ids
+            )
             if messages:
                 print(f"  [SUCCESS] Found {len(messages)} message(s)\n")
                 break
             else:
                 print(f"  [No results]\n")
+        return messages
+    
+    def check_replies_and_save(self, gemini_client=None, full_scan: bool = False) -> list:
+        # Get our own email address and the current mailbox history position first
+        own_email = None
+        current_history_id = None
+        try:
+            profile = self.gmail.get_profile()
+            own_email = profile.get('emailAddress')
+            current_history_id = profile.get('historyId')
+        except Exception:
+            print("Warning: Could not get user email, using default filters")
+        
+        checkpoint = None if full_scan else self.db.get_sync_state(self.HISTORY_CHECKPOINT_KEY)
         
+        retry_state = self._load_retry_ids()
+        # Replies that could not be fetched or processed; retried by id on the next runs
+        failed_ids = []
+        fetched = self._fetch_new_replies(checkpoint, own_email, list(retry_state), failed_ids) if checkpoint else None
+        if fetched is not None:
+            messages, next_checkpoint = fetched
+        else:
+            # No checkpoint yet (or it expired): scan, then resume incrementally from
+            # the history position captured before the scan started
+            messages = self._search_replies(own_email, failed_ids)
+            next_checkpoint = current_history_id
+            # The scan may not match earlier failures, so fetch those by id as well
+            scanned = {message['id'] for message in messages}
+            retry_ids = [m for m in retry_state if m not in scanned]
+            if retry_ids:
+                messages = messages + self.gmail.get_messages(
+                    retry_ids,
+                    exclude_senders=[own_email] if own_email else None,
+                    subject_contains=self.REPLY_SUBJECT,
+                    failed_ids=failed_ids
+                )
+        
+        # A broader scan query may have fetched a message an earlier query could not
+        fetched_ids = {message['id'] for message in messages}
+        failed_ids = [m for m in failed_ids if m not in fetched_ids]
+        results = self._process_replies(messages, own_email, gemini_client, failed_ids=failed_ids)
+        
+        # The checkpoint moves past everything fetched; failed replies are retried by id instead
+        self._save_retry_ids(retry_state, failed_ids)
+        if next_checkpoint:
+            self.db.set_sync_state(self.HISTORY_CHECKPOINT_KEY, next_checkpoint)
+        return results
+    
+    def _supplier_id_for_sender(self, sender: str, supplier_ids: Dict[str, Optional[int]]) -> Optional[int]:
+        """Resolve the supplier for a "Name <email@example.com>" sender, memoized in supplier_ids"""
+        email_match = re.search(r'<(.+?)>', sender)
+        sender_email = (email_match.group(1) if email_match else sender).strip().lower()
+        if sender_email not in supplier_ids:
+            try:
+                supplier = self.db.get_supplier_by_email(sender_email)
+                supplier_ids[sender_email] = supplier['id'] if supplier else None
+            except Exception as e:
+                print(f"Error looking up supplier: {e}")
+                return None
+        return supplier_ids[sender_email]
+    
+    def _process_replies(self, messages: list, own_email: Optional[str], gemini_client=None,
+                         failed_ids: Optional[List[str]] = None) -> list:
+        """Parse replies and update prices; ids of replies that updated nothing are appended to failed_ids"""
+        if failed_ids is None:
+            failed_ids = []
         if not messages:
-            print("No messages found in any query")
+            print("No new supplier replies found")
             return []
         
         results = []
+        supplier_ids = {}  # sender email -> supplier id, for the duration of this run
         for message in messages:
             try:
                 sender = message.get('sender', 'Unknown')
@@ -197,11 +314,13 @@ Note: This is an automated request. If you have any questions, please contact yo
                 
                 if not response:
                     print(f"No prices extracted from message")
+                    failed_ids.append(message['id'])
                     continue
                 
                 products = response.get("products", [])
                 if not products or not isinstance(products, list):
                     print(f"Invalid products format in response")
+                    failed_ids.append(message['id'])
                     continue
                 
                 print(f"Found {len(products)} products in email")
@@ -244,24 +363,9 @@ Note: This is an automated request. If you have any questions, please contact yo
                         if isinstance(promo, dict):
                             promo_name = promo.get('name')
                         
-                        # Lookup supplier by email
-                        supplier_id = None
-                        try:
-                            # Extract email from sender string "Name <email@example.com>"
-                            import re
-                            email_match = re.search(r'<(.+?)>', sender)
-                            sender_email = email_match.group(1) if email_match else sender
-                            
-                            # Simple lookup - in production this would be a proper DB method
-                            suppliers = self.db.get_suppliers()
-                            for s in suppliers:
-                                if s['email'].lower() == sender_email.lower():
-                                    supplier_id = s['id']
-                                    break
-                        except Exception as e:
-                            print(f"Error looking up supplier: {e}")
+                        supplier_id = self._supplier_id_for_sender(sender, supplier_ids)
 
-                        success = self.db.update_product_price(
+                        updated_rows = self.db.update_product_price(
                             name, price_float, width,
                             discount_percentage=discount_pct,
                             min_qty=min_qty,
@@ -271,8 +375,8 @@ Note: This is an automated request. If you have any questions, please contact yo
                         )
 
                         
-                        if success:
-                            verified = self.verify_database_update(name, price_float, width)
+                        if updated_rows:
+                            verified = self.verify_database_update(name, price_float, width, rows=updated_rows)
                             if verified:
                                 display_name = f"{name} ({width})" if width else name
                                 updated_products.append({
@@ -289,9 +393,6 @@ Note: This is an automated request. If you have any questions, please contact yo
                                 print(f"⚠ Update reported success but verification failed for {name} {width or ''}")
                         else:
                             print(f"✗ Failed to update {name} {width or ''} - product may not exist in database")
-                            
-                            existing_products = self.db.get_products()
-                            print(f"Available products in DB: {[(p['name'], p.get('width')) for p in existing_products]}")
                     
                     except (ValueError, TypeError) as e:
                         print(f"Error processing product {name}: {str(e)}")
@@ -315,8 +416,10 @@ Note: This is an automated request. If you have any questions, please contact yo
                     print(f"✓ Successfully processed {len(updated_products)} product(s) from {sender}")
                 else:
                     print(f"No products were successfully updated for this message")
+                    failed_ids.append(message['id'])
             
             except Exception as e:
+                failed_ids.append(message.get('id'))
                 print(f"Error processing message from {message.get('sender', 'unknown')}: {str(e)}")
                 import traceback
                 traceback.print_exc()
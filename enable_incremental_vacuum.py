@@ -0,0 +1,12 @@
+from database import Database
+
+def enable_incremental_vacuum():
+    """One-time VACUUM that switches an older database file to auto_vacuum=INCREMENTAL (run while the app is idle)"""
+    db = Database()
+    if db.enable_incremental_vacuum():
+        print("✅ Incremental vacuum enabled")
+    else:
+        print("❌ Could not enable incremental vacuum")
+
+if __name__ == "__main__":
+    enable_incremental_vacuum()
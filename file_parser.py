@@ -3,55 +3,331 @@ File parsing utilities for bulk product imports.
 Supports CSV and Excel file formats.
 """
 
+import io
 import pandas as pd
-from typing import Dict, List, Any, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 import streamlit as st
 
+# Rows per chunk when streaming uploads through validation and import
+IMPORT_CHUNK_SIZE = 5000
+
+REQUIRED_COLUMNS = ['name', 'width', 'standard_price']
+
+OPTIONAL_TEXT_COLUMNS = ['description', 'category', 'promotion_name', 'volume_discounts']
+OPTIONAL_FLOAT_COLUMNS = ['cost_price', 'discount_percentage']
+OPTIONAL_INT_COLUMNS = ['min_qty_discount']
+
+WIDTH_PATTERN = r'^\d+(\.\d+)?"$'
+
+def _clean_text(series: pd.Series) -> pd.Series:
+    """Strip strings; blanks become missing"""
+    text = series.astype('string').str.strip()
+    return text.mask(text == '')
+
+def normalize_widths(series: pd.Series) -> pd.Series:
+    """
+    Normalize width spellings to the 5" form: 5, 5.0, 5 in, 5 inch, 5”, 5'' -> 5"
+    Values that still don't match the width rule are left as typed.
+    """
+    width = _clean_text(series)
+    width = width.str.replace(r'[”″“]|\'\'', '"', regex=True)
+    width = width.str.replace(r'\s*(?:inches|inch|in\.?)$', '"', regex=True, case=False)
+    width = width.str.replace(r'^(\d+(?:\.\d+)?)\s*"?$', r'\1"', regex=True)
+    return width.str.replace(r'^(\d+)\.0+"$', r'\1"', regex=True)
+
+def _issue_masks(df: pd.DataFrame) -> Tuple[Dict[str, pd.Series], Dict[str, pd.Series]]:
+    """
+    Coerce every known column and flag problems per row.
+    Returns (columns, masks): normalized column Series, and {issue: boolean mask}.
+    """
+    columns = {
+        'name': _clean_text(df['name']),
+        'width': normalize_widths(df['width']),
+        'standard_price': pd.to_numeric(df['standard_price'], errors='coerce'),
+    }
+    masks = {}
+    
+    # Empty required fields
+    for col in REQUIRED_COLUMNS:
+        if col == 'standard_price':
+            masks[f"empty:{col}"] = df[col].isnull()
+        else:
+            masks[f"empty:{col}"] = columns[col].isna().to_numpy(dtype=bool)
+    
+    # Prices must be numbers above zero
+    price = columns['standard_price']
+    masks["invalid_price"] = (price <= 0) | (price.isnull() & df['standard_price'].notnull())
+    
+    # Width should be like: 5", 7", etc.
+    width = columns['width']
+    masks["invalid_width"] = (width.notna() & ~width.str.match(WIDTH_PATTERN).fillna(False)).to_numpy(dtype=bool)
+    
+    for col in OPTIONAL_TEXT_COLUMNS:
+        if col in df.columns:
+            columns[col] = _clean_text(df[col])
+    for col in OPTIONAL_FLOAT_COLUMNS + OPTIONAL_INT_COLUMNS:
+        if col in df.columns:
+            values = pd.to_numeric(df[col], errors='coerce')
+            typed = df[col].astype('string').str.strip() != ''
+            masks[f"invalid_number:{col}"] = (values.isnull() & df[col].notnull() & typed).fillna(False)
+            columns[col] = values.round().astype('Int64') if col in OPTIONAL_INT_COLUMNS else values
+    
+    masks = {key: pd.Series(mask, index=df.index, dtype=bool) for key, mask in masks.items()}
+    return columns, masks
+
+def _count_validation_issues(df: pd.DataFrame) -> Dict[str, int]:
+    """Count problems per check so chunk results can be summed"""
+    _, masks = _issue_masks(df)
+    return {key: int(mask.sum()) for key, mask in masks.items() if mask.any()}
+
+def _format_validation_issues(counts: Dict[str, int]) -> List[str]:
+    errors = []
+    for col in REQUIRED_COLUMNS:
+        if counts.get(f"empty:{col}"):
+            errors.append(f"Column '{col}' has {counts[f'empty:{col}']} empty values")
+    if counts.get("invalid_price"):
+        errors.append(f"Found {counts['invalid_price']} products with invalid prices (must be > 0)")
+    if counts.get("invalid_width"):
+        errors.append(f"Found {counts['invalid_width']} products with invalid width format (should be like: 5\", 7\")")
+    for col in OPTIONAL_FLOAT_COLUMNS + OPTIONAL_INT_COLUMNS:
+        if counts.get(f"invalid_number:{col}"):
+            errors.append(f"Column '{col}' has {counts[f'invalid_number:{col}']} non-numeric values")
+    return errors
+
+ISSUE_REASONS = {
+    "empty:name": "Missing name",
+    "empty:width": "Missing width",
+    "empty:standard_price": "Missing price",
+    "invalid_price": "Price must be a number greater than 0",
+    "invalid_width": "Invalid width format (should be like: 5\", 7\")",
+}
+
+def normalize_product_frame(df: pd.DataFrame, row_offset: int = 0) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Vectorized validation and conversion of a product sheet (or chunk).
+    Returns (records, row_errors):
+    - records: product dicts for valid rows, in the prepare_product_dict format
+    - row_errors: {row, product, error} for rejected rows, numbered row_offset + index + 1
+      (the chunk iterators index rows by their position in the file)
+    """
+    missing_columns = _missing_columns(df)
+    if missing_columns:
+        return [], [{"error": f"Missing required columns: {', '.join(missing_columns)}"}]
+    
+    columns, masks = _issue_masks(df)
+    invalid = pd.Series(False, index=df.index)
+    for mask in masks.values():
+        invalid |= mask
+    
+    row_errors = []
+    if invalid.any():
+        positions = invalid.to_numpy().nonzero()[0]
+        reasons = {
+            key: mask.to_numpy()
+            for key, mask in masks.items() if mask.any()
+        }
+        names = columns['name'].to_numpy()
+        index = df.index.to_numpy()
+        for pos in positions:
+            messages = [
+                ISSUE_REASONS.get(key, f"Invalid {key.split(':', 1)[-1]}")
+                for key, flags in reasons.items() if flags[pos]
+            ]
+            name = names[pos]
+            row_errors.append({
+                "row": row_offset + int(index[pos]) + 1,
+                "product": name if isinstance(name, str) else "Unknown",
+                "error": "; ".join(messages)
+            })
+    
+    # Column arrays -> records; tolist() yields plain Python scalars that sqlite3 can bind
+    keep = ~invalid.to_numpy()
+    keys = list(columns)
+    arrays = [columns[key][keep].tolist() for key in keys]
+    records = [
+        {key: value for key, value in zip(keys, values)
+         if value is not None and value is not pd.NA and value == value}
+        for values in zip(*arrays)
+    ]
+    return records, row_errors
+
+def _missing_columns(df: pd.DataFrame) -> List[str]:
+    return [col for col in REQUIRED_COLUMNS if col not in df.columns]
+
 def validate_product_data(df: pd.DataFrame) -> Tuple[bool, List[str]]:
     """
     Validate product data structure and content.
     Returns (is_valid, list_of_errors)
     """
-    errors = []
-    
     # Check required columns
-    required_columns = ['name', 'width', 'standard_price']
-    missing_columns = [col for col in required_columns if col not in df.columns]
-    
+    missing_columns = _missing_columns(df)
     if missing_columns:
-        errors.append(f"Missing required columns: {', '.join(missing_columns)}")
-        return False, errors
-    
-    # Check for empty required fields
-    for col in required_columns:
-        if df[col].isnull().any():
-            null_count = df[col].isnull().sum()
-            errors.append(f"Column '{col}' has {null_count} empty values")
-    
-    # Validate price ranges
-    if 'standard_price' in df.columns:
-        invalid_prices = df[df['standard_price'] <= 0]
-        if not invalid_prices.empty:
-            errors.append(f"Found {len(invalid_prices)} products with invalid prices (must be > 0)")
-    
-    # Validate width format
-    if 'width' in df.columns:
-        # Width should be like: 5", 7", etc.
-        invalid_widths = df[~df['width'].astype(str).str.match(r'^\d+(\.\d+)?"$')]
-        if not invalid_widths.empty:
-            errors.append(f"Found {len(invalid_widths)} products with invalid width format (should be like: 5\", 7\")")
+        return False, [f"Missing required columns: {', '.join(missing_columns)}"]
     
+    errors = _format_validation_issues(_count_validation_issues(df))
     return len(errors) == 0, errors
 
+def _normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    # Normalize column names (lowercase, strip spaces)
+    df.columns = [str(col).lower().strip() for col in df.columns]
+    return df
+
+def _csv_chunks(source, chunksize: int) -> Iterator[pd.DataFrame]:
+    # Blank lines are read and then dropped so the index keeps counting them
+    for chunk in pd.read_csv(source, chunksize=chunksize, skip_blank_lines=False):
+        chunk = chunk.dropna(how='all')
+        if not chunk.empty:
+            yield _normalize_columns(chunk)
+
+def iter_csv_chunks(file, chunksize: int = IMPORT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Yield a CSV upload as DataFrames of at most chunksize rows.
+    Blank lines are skipped; the index is each row's position among the data lines.
+    """
+    file.seek(0)
+    if isinstance(file, io.TextIOBase):
+        yield from _csv_chunks(file, chunksize)
+        return
+    
+    # pandas closes the text wrapper it puts around binary uploads, which would close the
+    # upload itself; wrapping it here and detaching afterwards keeps it open for later passes
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        yield from _csv_chunks(text, chunksize)
+    finally:
+        text.detach()
+
+def iter_excel_chunks(file, chunksize: int = IMPORT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Yield the first worksheet of an Excel upload in chunks.
+    .xlsx is streamed with openpyxl's read-only mode; legacy .xls is read whole and sliced.
+    Blank rows are skipped; the index is each row's position below the header.
+    """
+    file.seek(0)
+    name = getattr(file, 'name', '') or ''
+    if name.lower().endswith('.xls'):
+        df = _normalize_columns(pd.read_excel(file))
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+        return
+    
+    from openpyxl import load_workbook
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(col).lower().strip() if col is not None else '' for col in header]
+        
+        batch, positions = [], []
+        for position, row in enumerate(rows):
+            if row is None or all(value is None for value in row):
+                continue  # Skip blank rows like read_excel does, but keep counting them
+            # Read-only mode yields short tuples for rows that end early; pad them to the header
+            batch.append(tuple(row[:len(columns)]) + (None,) * (len(columns) - len(row)))
+            positions.append(position)
+            if len(batch) >= chunksize:
+                yield pd.DataFrame(batch, columns=columns, index=positions)
+                batch, positions = [], []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns, index=positions)
+    finally:
+        workbook.close()
+
+def iter_file_chunks(file, chunksize: int = IMPORT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    if file.name.lower().endswith('.csv'):
+        return iter_csv_chunks(file, chunksize)
+    return iter_excel_chunks(file, chunksize)
+
+def read_preview(file, nrows: int = 10) -> pd.DataFrame:
+    """First rows of an upload, without reading the rest of the file"""
+    chunk = next(iter(iter_file_chunks(file, chunksize=nrows)), None)
+    return chunk if chunk is not None else pd.DataFrame()
+
+def validate_file(file, chunksize: int = IMPORT_CHUNK_SIZE) -> Tuple[int, List[str]]:
+    """
+    Validate an upload chunk by chunk.
+    Returns (row_count, list_of_errors) with counts summed across the whole file.
+    """
+    try:
+        row_count = 0
+        counts = {}
+        for chunk in iter_file_chunks(file, chunksize):
+            missing_columns = _missing_columns(chunk)
+            if missing_columns:
+                return row_count, [f"Missing required columns: {', '.join(missing_columns)}"]
+            for key, value in _count_validation_issues(chunk).items():
+                counts[key] = counts.get(key, 0) + value
+            row_count += len(chunk)
+        if row_count == 0:
+            return 0, ["File contains no product rows"]
+        return row_count, _format_validation_issues(counts)
+    except Exception as e:
+        return 0, [f"Error parsing file: {str(e)}"]
+
+def import_products_from_file(file, db, supplier_id: int = None, user_id: int = None,
+                              chunksize: int = IMPORT_CHUNK_SIZE,
+                              on_progress: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    """
+    Stream an upload into Database.bulk_import_products one chunk at a time.
+    on_progress(rows_done) is called after each chunk; a single sync event is logged at the end.
+    Each chunk is committed on its own, so if a chunk cannot be read or saved the import
+    stops there: partial is set when earlier chunks were already saved, and
+    stopped_at_row is the file row the import stopped at.
+    Returns the combined {updated, inserted, skipped, errors, partial, stopped_at_row} report.
+    """
+    totals = {"updated": 0, "inserted": 0, "errors": [], "skipped": 0,
+              "partial": False, "stopped_at_row": None}
+    rows_done = 0
+    last_row = 0
+    try:
+        for chunk in iter_file_chunks(file, chunksize):
+            products_data, row_errors = normalize_product_frame(chunk)
+            totals["errors"].extend(row_errors)
+            totals["skipped"] += len(row_errors)
+            
+            rejected = {error.get("row") for error in row_errors}
+            row_numbers = [row for row in (chunk.index + 1).tolist() if row not in rejected]
+            results = db.bulk_import_products(products_data, supplier_id=supplier_id,
+                                              row_numbers=row_numbers)
+            for key in ("updated", "inserted", "skipped"):
+                totals[key] += results[key]
+            totals["errors"].extend(results["errors"])
+            if results.get("failed"):
+                totals["stopped_at_row"] = int(chunk.index[0]) + 1
+                break
+            rows_done += len(chunk)
+            last_row = int(chunk.index[-1]) + 1
+            if on_progress:
+                on_progress(rows_done)
+    except Exception as e:
+        totals["errors"].append({"error": f"Error reading file: {str(e)}"})
+        totals["stopped_at_row"] = last_row + 1
+    
+    if totals["stopped_at_row"]:
+        totals["partial"] = rows_done > 0
+        totals["errors"].append({
+            "row": totals["stopped_at_row"],
+            "error": (f"Import stopped here; rows up to {last_row} were imported, the rest were not"
+                      if totals["partial"] else "Import stopped here; nothing was saved")
+        })
+    
+    if user_id:
+        db.log_sync_event(
+            "bulk_import",
+            "partial" if totals["partial"] else ("error" if totals["stopped_at_row"] else "success"),
+            f"Imported {totals['inserted']} new, updated {totals['updated']}, skipped {totals['skipped']} products",
+            supplier_id
+        )
+    return totals
+
 def parse_csv_file(file) -> Tuple[pd.DataFrame, List[str]]:
     """
     Parse CSV file and return DataFrame with errors.
     """
     try:
-        df = pd.read_csv(file)
-        
-        # Normalize column names (lowercase, strip spaces)
-        df.columns = df.columns.str.lower().str.strip()
+        df = _normalize_columns(pd.read_csv(file))
         
         # Validate
         is_valid, errors = validate_product_data(df)
@@ -65,10 +341,7 @@ def parse_excel_file(file) -> Tuple[pd.DataFrame, List[str]]:
     Parse Excel file and return DataFrame with errors.
     """
     try:
-        df = pd.read_excel(file)
-        
-        # Normalize column names
-        df.columns = df.columns.str.lower().str.strip()
+        df = _normalize_columns(pd.read_excel(file))
         
         # Validate
         is_valid, errors = validate_product_data(df)
@@ -83,7 +356,7 @@ def prepare_product_dict(row: pd.Series) -> Dict[str, Any]:
     """
     product = {
         'name': str(row['name']).strip(),
-        'width': str(row['width']).strip(),
+        'width': str(normalize_widths(pd.Series([row['width']])).iloc[0]),
         'standard_price': float(row['standard_price']),
     }
     
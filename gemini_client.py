@@ -4,8 +4,9 @@ import re
 from typing import Dict, Any, Optional, List
 
 class GeminiClient:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache=None):
         self.api_key = api_key
+        self.cache = cache  # Optional PricingCache for market analysis / quote responses
         self.initialized = False
         self.model = None
         self.init_error = None
@@ -84,6 +85,56 @@ class GeminiClient:
             print(f"Unexpected parse error: {str(e)}")
             return None
     
+    def _cache_get(self, kind: str, location: str, product: str, width: Optional[str], base_cost: float) -> Optional[Dict]:
+        if not self.cache:
+            return None
+        cached = self.cache.get(kind, location, product, width, base_cost)
+        if cached:
+            print(f"[LOG] AI pricing cache hit: {kind} {product} {width or ''} @ {location}")
+        return cached
+    
+    def _cache_put(self, kind: str, location: str, product: str, width: Optional[str], base_cost: float, result: Dict):
+        if self.cache and result:
+            self.cache.put(kind, location, product, width, base_cost, result)
+    
+    def _has_valid_price_range(self, result: Dict[str, Any]) -> bool:
+        """Market range must be positive and ordered: low <= optimal <= high"""
+        price_range = result.get("recommended_price_range")
+        if not isinstance(price_range, dict) or not all(k in price_range for k in ["low", "high", "optimal"]):
+            return False
+        try:
+            low = float(price_range["low"])
+            high = float(price_range["high"])
+            optimal = float(price_range["optimal"])
+        except (ValueError, TypeError):
+            return False
+        return low > 0 and high > low and low <= optimal <= high
+    
+    def _validated_quote(self, result: Dict[str, Any], base_cost: float, default_margin: float) -> Optional[Dict[str, Any]]:
+        """Normalize the pricing fields of a model response, or None if they fail validation"""
+        if not result or result.get("location_confirmed") is not True:
+            return None
+        try:
+            selling_price = float(result["selling_price"])
+            margin = float(result.get("margin", default_margin))
+            confidence = float(result.get("confidence", 0.8))
+            retail = float(result.get("suggested_retail_price", base_cost * 2.0))
+            dealer = float(result.get("suggested_dealer_price", base_cost * 1.4))
+        except (KeyError, ValueError, TypeError) as e:
+            print(f"Error parsing quote values: {str(e)}")
+            return None
+        
+        if selling_price > base_cost and 0 <= confidence <= 1:
+            return {
+                "selling_price": round(selling_price, 2),
+                "margin": round(margin, 1),
+                "confidence": round(confidence, 2),
+                "suggested_retail_price": round(retail, 2),
+                "suggested_dealer_price": round(dealer, 2),
+                "analysis_summary": result.get("analysis_summary", "")
+            }
+        return None
+    
     def generate_supplier_email(self, supplier_name: str, products: List[str]) -> str:
         if not self.initialized:
             product_list = "\n".join([f"• {product}: $_______ per sq.ft" for product in products])
@@ -354,9 +405,14 @@ IMPORTANT RULES:
         if not self.initialized:
             return fallback_response
         
+        product_name = product_specs.get("name", "Unknown Product")
+        specs = product_specs.get("specs")
+        width = product_specs.get("width") or (specs.get("width") if isinstance(specs, dict) else None)
+        cached = self._cache_get("market_analysis", location, product_name, width, base_price)
+        if cached:
+            return cached
+        
         try:
-            product_name = product_specs.get("name", "Unknown Product")
-            
             prompt = f"""
 Analyze the flooring market for pricing strategy.
 
@@ -396,18 +452,9 @@ Return ONLY valid JSON with this exact structure:
                 print(f"Market analysis rejected: No location context for {location}")
                 return {} # Return empty to indicate failure
                 
-            if result and "recommended_price_range" in result:
-                price_range = result["recommended_price_range"]
-                if all(k in price_range for k in ["low", "high", "optimal"]):
-                    try:
-                        low = float(price_range["low"])
-                        high = float(price_range["high"])
-                        optimal = float(price_range["optimal"])
-                        
-                        if low > 0 and high > low and low <= optimal <= high:
-                            return result
-                    except (ValueError, TypeError):
-                        pass
+            if self._has_valid_price_range(result):
+                self._cache_put("market_analysis", location, product_name, width, base_price, result)
+                return result
             
             print("Market analysis returned invalid format or was rejected")
             return {}
@@ -433,6 +480,10 @@ Return ONLY valid JSON with this exact structure:
             print(f"Gemini not initialized (initialized={self.initialized}, model={self.model is not None})")
             return {}
         
+        cached = self._cache_get("quote", location, product_name, width, base_cost)
+        if cached:
+            return cached
+        
         try:
             market_factors = []
             if isinstance(market_data, dict):
@@ -474,25 +525,10 @@ Return ONLY valid JSON:
             response = self.model.generate_content(prompt)
             result = self._parse_json_response(response.text)
             
-            if result and result.get("location_confirmed") is True:
-                try:
-                    selling_price = float(result["selling_price"])
-                    margin = float(result.get("margin", markup_percentage))
-                    confidence = float(result.get("confidence", 0.8))
-                    retail = float(result.get("suggested_retail_price", base_cost * 2.0))
-                    dealer = float(result.get("suggested_dealer_price", base_cost * 1.4))
-                    
-                    if selling_price > base_cost and 0 <= confidence <= 1:
-                        return {
-                            "selling_price": round(selling_price, 2),
-                            "margin": round(margin, 1),
-                            "confidence": round(confidence, 2),
-                            "suggested_retail_price": round(retail, 2),
-                            "suggested_dealer_price": round(dealer, 2),
-                            "analysis_summary": result.get("analysis_summary", "")
-                        }
-                except (ValueError, TypeError) as e:
-                    print(f"Error parsing quote values: {str(e)}")
+            quote = self._validated_quote(result, base_cost, markup_percentage)
+            if quote:
+                self._cache_put("quote", location, product_name, width, base_cost, quote)
+                return quote
             
             return {}
             
@@ -500,6 +536,95 @@ Return ONLY valid JSON:
             print(f"Quote calculation error: {str(e)}")
             return {}
     
+    def price_quote(self, base_cost: float, product_name: str = "Unknown", width: str = "Unknown", location: str = "Unknown",
+                    timeout: Optional[float] = None, rate_limiter=None) -> Dict[str, Any]:
+        """
+        Market analysis and quote pricing in a single model call.
+        Returns the calculate_quote fields plus verified_location, recommended_price_range,
+        market_factors and demand_indicator, or {} if the response fails validation.
+        timeout bounds the model request; rate_limiter.acquire() is called before it (cache hits skip both).
+        """
+        if not self.initialized or not self.model:
+            print(f"Gemini not initialized (initialized={self.initialized}, model={self.model is not None})")
+            return {}
+        
+        cached = self._cache_get("price_quote", location, product_name, width, base_cost)
+        if cached:
+            return cached
+        
+        try:
+            prompt = f"""
+Analyze the local flooring market and calculate the optimal selling price.
+
+Product: {product_name} ({width})
+Location/Zip Code: {location}
+Base Cost: ${base_cost:.2f} per sqft
+
+CRITICAL INSTRUCTIONS:
+1. ONLY provide pricing if you have specific market data for the location: {location}.
+2. If the location is invalid, ambiguous, or you lack specific data for it, return an empty JSON object {{}}.
+3. DO NOT provide generic or national average pricing as a fallback.
+4. Your response MUST include "verified_location" (the city/area analyzed), "location_confirmed" (boolean) and an "analysis_summary" mentioning the location.
+5. The selling price must be above the base cost and should sit within the recommended price range.
+
+Return ONLY valid JSON with this exact structure:
+{{
+  "verified_location": "<city, state>",
+  "location_confirmed": true,
+  "recommended_price_range": {{
+    "low": <float>,
+    "high": <float>,
+    "optimal": <float>
+  }},
+  "market_factors": ["<factor1>", "<factor2>", "<factor3>"],
+  "demand_indicator": "<low|medium|high>",
+  "analysis_summary": "Pricing analysis for {location}...",
+  "selling_price": <float>,
+  "margin": <percentage as float>,
+  "confidence": <float between 0 and 1>,
+  "suggested_retail_price": <float>,
+  "suggested_dealer_price": <float>
+}}
+"""
+            
+            if rate_limiter and not rate_limiter.acquire(timeout=timeout):
+                print(f"Price quote skipped: rate limit wait exceeded for {location}")
+                return {}
+            
+            if timeout:
+                response = self.model.generate_content(prompt, request_options={"timeout": timeout})
+            else:
+                response = self.model.generate_content(prompt)
+            result = self._parse_json_response(response.text)
+            
+            if not result or "verified_location" not in result:
+                print(f"Price quote rejected: No location context for {location}")
+                return {}
+            
+            if not self._has_valid_price_range(result):
+                print("Price quote returned an invalid market range")
+                return {}
+            
+            optimal = float(result["recommended_price_range"]["optimal"])
+            default_margin = ((optimal - base_cost) / base_cost) * 100 if base_cost > 0 else 30.0
+            quote = self._validated_quote(result, base_cost, default_margin)
+            if not quote:
+                print(f"Price quote returned invalid pricing for {location}")
+                return {}
+            
+            quote.update({
+                "verified_location": result["verified_location"],
+                "recommended_price_range": result["recommended_price_range"],
+                "market_factors": result.get("market_factors", []),
+                "demand_indicator": result.get("demand_indicator", "medium")
+            })
+            self._cache_put("price_quote", location, product_name, width, base_cost, quote)
+            return quote
+            
+        except Exception as e:
+            print(f"Price quote error: {str(e)}")
+            return {}
+    
     def generate_customer_quote_email(self, quote_data: Dict[str, Any]) -> str:
         if not self.initialized:
             return self._fallback_customer_email(quote_data)
@@ -556,4 +681,4 @@ We look forward to working with you on your flooring project!
 
 Best regards,
 PrimeLine Flooring AI Team
-Smart Flooring Solutions through Artificial Intelligence"""
\ No newline at end of file
+Smart Flooring Solutions through Artificial Intelligence"""
\ No newline at end of file
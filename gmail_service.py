@@ -1,7 +1,11 @@
 import os.path
 import base64
+import threading
 from email.mime.text import MIMEText
-from typing import Dict, Any, Optional
+from email.utils import parseaddr
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google.auth.exceptions import RefreshError
@@ -9,6 +13,10 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+class StaleHistoryError(Exception):
+    """The stored historyId is older than the history Gmail retains; a full scan is needed."""
+
+
 class GmailService:
     SCOPES = [
         'https://www.googleapis.com/auth/gmail.send',
@@ -20,22 +28,71 @@ class GmailService:
         self.credentials_path = credentials_path
         self.creds = None
         self.service = None
+        # The service object is shared, but its httplib2 transport is not thread-safe;
+        # requests go through a per-thread AuthorizedHttp so scheduler workers can send concurrently
+        self._local = threading.local()
         self._authenticate()
     
+    def _http(self) -> AuthorizedHttp:
+        """Authorized HTTP transport for the calling thread (rebuilt when the credentials change)"""
+        local = self._local
+        if getattr(local, 'http', None) is None or local.creds is not self.creds:
+            local.http = AuthorizedHttp(self.creds, http=httplib2.Http())
+            local.creds = self.creds
+        return local.http
+    
     def is_authenticated(self) -> bool:
         return bool(self.creds and self.creds.valid)
     
+    def get_profile(self) -> Dict[str, Any]:
+        """Mailbox profile: emailAddress, historyId, messagesTotal, threadsTotal."""
+        if not self.service:
+            self._authenticate()
+        return self.service.users().getProfile(userId='me').execute(http=self._http())
+    
     def get_user_email(self) -> str:
         """Get the email address of the authenticated user."""
         try:
-            if not self.service:
-                self._authenticate()
-            profile = self.service.users().getProfile(userId='me').execute()
-            return profile.get('emailAddress', '')
+            return self.get_profile().get('emailAddress', '')
         except Exception as e:
             print(f"Error getting user email: {str(e)}")
             return ''
     
+    def list_history(self, start_history_id: str, label_id: str = 'INBOX') -> Tuple[List[str], str]:
+        """
+        Ids of messages added to `label_id` since start_history_id, oldest first,
+        plus the mailbox historyId to checkpoint next.
+        Raises StaleHistoryError when Gmail no longer has history that far back.
+        """
+        message_ids = []
+        seen = set()
+        latest_history_id = start_history_id
+        page_token = None
+        try:
+            while True:
+                response = self.service.users().history().list(
+                    userId='me',
+                    startHistoryId=start_history_id,
+                    labelId=label_id,
+                    historyTypes=['messageAdded'],
+                    pageToken=page_token
+                ).execute(http=self._http())
+                for record in response.get('history', []):
+                    for added in record.get('messagesAdded', []):
+                        message_id = added['message']['id']
+                        if message_id not in seen:
+                            seen.add(message_id)
+                            message_ids.append(message_id)
+                latest_history_id = response.get('historyId', latest_history_id)
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+        except HttpError as error:
+            if getattr(error, 'resp', None) is not None and error.resp.status == 404:
+                raise StaleHistoryError(f"History id {start_history_id} is no longer available") from error
+            raise
+        return message_ids, latest_history_id
+    
     def _is_headless(self) -> bool:
         """Check if running in a headless environment (Streamlit Cloud, etc)."""
         import os
@@ -212,7 +269,7 @@ class GmailService:
             raw_message = {'raw': raw}
             
             sent_message = self.service.users().messages().send(
-                userId='me', body=raw_message).execute()
+                userId='me', body=raw_message).execute(http=self._http())
             
             return {
                 'status': 'success',
@@ -226,47 +283,132 @@ class GmailService:
                 'error': str(error)
             }
     
-    def check_inbox(self, query: str = None, max_results: int = 10) -> list:
+    # Gmail accepts up to 100 calls per batch request but recommends staying at or below 50
+    BATCH_SIZE = 50
+    
+    def _batch_get(self, message_ids: List[str], failed_ids: Optional[List[str]] = None,
+                   **get_kwargs) -> Dict[str, dict]:
+        """
+        Fetch several messages with batched HTTP requests. Returns {id: message}; failures are
+        logged and skipped, and their ids appended to failed_ids.
+        """
+        fetched = {}
+        
+        def _collect(request_id, response, exception):
+            if exception is not None:
+                print(f"Error processing message {request_id}: {str(exception)}")
+                if failed_ids is not None:
+                    failed_ids.append(request_id)
+                return
+            fetched[request_id] = response
+        
+        for start in range(0, len(message_ids), self.BATCH_SIZE):
+            chunk = message_ids[start:start + self.BATCH_SIZE]
+            batch = self.service.new_batch_http_request(callback=_collect)
+            for message_id in chunk:
+                batch.add(
+                    self.service.users().messages().get(userId='me', id=message_id, **get_kwargs),
+                    request_id=message_id
+                )
+            try:
+                batch.execute(http=self._http())
+            except HttpError as error:
+                # The whole batch request failed; its messages count as unfetched
+                print(f"Error fetching {len(chunk)} message(s): {error}")
+                if failed_ids is not None:
+                    failed_ids.extend(m for m in chunk if m not in fetched and m not in failed_ids)
+        
+        return fetched
+    
+    @staticmethod
+    def _header(headers: list, name: str, default: str) -> str:
+        return next((h['value'] for h in headers if h['name'].lower() == name), default)
+    
+    def _print_inbox_diagnostics(self, query: str):
+        """Explain an empty result by peeking at the latest inbox subjects (extra API calls)"""
+        try:
+            all_messages = self.service.users().messages().list(
+                userId='me', maxResults=10).execute(http=self._http()).get('messages', [])
+            if all_messages:
+                print(f"  [No match for query: {query}]")
+                print(f"  [But {len(all_messages)} messages exist in inbox]")
+                previews = self._batch_get([m['id'] for m in all_messages[:2]],
+                                           format='metadata', metadataHeaders=['Subject'])
+                for msg in previews.values():
+                    subject = self._header(msg.get('payload', {}).get('headers', []), 'subject', 'No Subject')
+                    print(f"      - {subject[:60]}")
+            else:
+                print(f"  [Gmail inbox appears to be empty]")
+        except Exception:
+            pass
+    
+    def check_inbox(self, query: str = None, max_results: int = 10,
+                    exclude_senders: Optional[Iterable[str]] = None, diagnostics: bool = False,
+                    failed_ids: Optional[List[str]] = None) -> list:
+        """
+        Search the mailbox and return matching messages with decoded bodies (see get_messages).
+        diagnostics=True explains empty results.
+        """
         try:
             results = self.service.users().messages().list(
-                userId='me', q=query, maxResults=max_results).execute()
+                userId='me', q=query, maxResults=max_results).execute(http=self._http())
             messages = results.get('messages', [])
             
             if not messages:
-                # Try to provide diagnostic info - check if ANY messages exist
-                try:
-                    all_messages = self.service.users().messages().list(
-                        userId='me', maxResults=10).execute().get('messages', [])
-                    if all_messages:
-                        print(f"  [No match for query: {query}]")
-                        print(f"  [But {len(all_messages)} messages exist in inbox]")
-                        # Show first few subjects for debugging
-                        for msg_preview in all_messages[:2]:
-                            try:
-                                msg = self.service.users().messages().get(
-                                    userId='me', id=msg_preview['id'], format='minimal').execute()
-                                headers = msg.get('payload', {}).get('headers', [])
-                                subject = next((h['value'] for h in headers if h['name'].lower() == 'subject'), 'No Subject')
-                                print(f"      - {subject[:60]}")
-                            except:
-                                pass
-                    else:
-                        print(f"  [Gmail inbox appears to be empty]")
-                except:
-                    pass
+                if diagnostics:
+                    self._print_inbox_diagnostics(query)
                 return []
             
             print(f"Found {len(messages)} messages for query: {query}")
+            return self.get_messages([msg['id'] for msg in messages], exclude_senders=exclude_senders,
+                                     failed_ids=failed_ids)
+            
+        except HttpError as error:
+            print(f'Gmail API error: {error}')
+            return []
+    
+    def get_messages(self, message_ids: List[str], exclude_senders: Optional[Iterable[str]] = None,
+                     subject_contains: Optional[str] = None, failed_ids: Optional[List[str]] = None) -> list:
+        """
+        Fetch messages by id, in order, with decoded bodies.
+        Headers are fetched first (batched) so messages from exclude_senders, or whose subject
+        lacks subject_contains, are dropped before their full bodies are downloaded.
+        Ids that could not be fetched or decoded are appended to failed_ids.
+        """
+        if not message_ids:
+            return []
+        if failed_ids is None:
+            failed_ids = []
+        try:
+            excluded = {s.strip().lower() for s in (exclude_senders or []) if s}
+            if excluded or subject_contains:
+                metadata = self._batch_get(message_ids, failed_ids,
+                                           format='metadata', metadataHeaders=['From', 'Subject'])
+                wanted = []
+                for message_id in message_ids:
+                    if message_id not in metadata:
+                        continue
+                    headers = metadata[message_id].get('payload', {}).get('headers', [])
+                    sender = self._header(headers, 'from', '')
+                    if parseaddr(sender)[1].lower() in excluded:
+                        print(f"Skipping message from self: {sender}")
+                        continue
+                    if subject_contains and subject_contains.lower() not in self._header(headers, 'subject', '').lower():
+                        continue
+                    wanted.append(message_id)
+                message_ids = wanted
+            
+            fetched = self._batch_get(message_ids, failed_ids, format='full')
             
             full_messages = []
-            for msg in messages:
+            for message_id in message_ids:
+                message = fetched.get(message_id)
+                if not message:
+                    continue
                 try:
-                    message = self.service.users().messages().get(
-                        userId='me', id=msg['id'], format='full').execute()
-                    
                     headers = message['payload']['headers']
-                    subject = next((h['value'] for h in headers if h['name'].lower() == 'subject'), 'No Subject')
-                    sender = next((h['value'] for h in headers if h['name'].lower() == 'from'), 'Unknown')
+                    subject = self._header(headers, 'subject', 'No Subject')
+                    sender = self._header(headers, 'from', 'Unknown')
                     
                     body = self._extract_body(message['payload'])
                     
@@ -285,7 +427,8 @@ class GmailService:
                     full_messages.append(message_data)
                     
                 except Exception as e:
-                    print(f"Error processing message {msg['id']}: {str(e)}")
+                    print(f"Error processing message {message_id}: {str(e)}")
+                    failed_ids.append(message_id)
                     continue
             
             return full_messages
@@ -325,7 +468,7 @@ class GmailService:
                 userId='me',
                 id=message_id,
                 body={'removeLabelIds': ['UNREAD']}
-            ).execute()
+            ).execute(http=self._http())
             print(f"Marked message {message_id} as read")
             return True
         except HttpError as error:
@@ -338,7 +481,7 @@ class GmailService:
                 userId='me',
                 id=message_id,
                 body={'removeLabelIds': ['INBOX']}
-            ).execute()
+            ).execute(http=self._http())
             print(f"Archived message {message_id}")
             return True
         except HttpError as error:
@@ -348,7 +491,7 @@ class GmailService:
     def get_thread_messages(self, thread_id: str) -> list:
         try:
             thread = self.service.users().threads().get(
-                userId='me', id=thread_id, format='full').execute()
+                userId='me', id=thread_id, format='full').execute(http=self._http())
             
             messages = []
             for msg in thread['messages']:
@@ -371,4 +514,4 @@ class GmailService:
             
         except HttpError as error:
             print(f'Error getting thread: {error}')
-            return []
\ No newline at end of file
+            return []
\ No newline at end of file
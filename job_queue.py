@@ -0,0 +1,350 @@
+"""
+Durable job queue for scheduled work.
+
+Jobs live in the jobs table (migration 11), so work that was due while the app was down
+or that failed part-way is still there after a restart:
+
+    pending --claim--> running --complete--> done
+                          |
+                          +--fail--> pending (retry after exponential backoff)
+                                 --> failed  (attempts exhausted)
+
+JobWorkerPool runs due jobs concurrently on a few threads. Handlers are plain callables
+taking the decoded payload; raising marks the attempt failed. A dedupe_key makes enqueueing
+idempotent (e.g. one weekly price request per supplier per week). The pool stamps
+heartbeat_at on the jobs it is running, and recover_stale() puts back running jobs whose
+heartbeat stopped (their worker died). complete/fail only touch a job still locked by the
+calling worker, so a worker that lost its job to recovery cannot overwrite the new attempt.
+
+Timestamps are UTC 'YYYY-MM-DD HH:MM:SS' strings, like CURRENT_TIMESTAMP.
+"""
+
+import json
+import random
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from connection_pool import get_pool
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _stamp(when: Optional[datetime] = None) -> str:
+    return (when or _utcnow()).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class Job(NamedTuple):
+    id: int
+    job_type: str
+    payload: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+    dedupe_key: Optional[str]
+    worker_id: Optional[str] = None
+
+
+class JobQueue:
+    """
+    Job table access; every write is one short transaction on the shared writer.
+    - enqueue / enqueue_many: add jobs (duplicates by dedupe_key are ignored)
+    - claim / heartbeat / complete / fail: worker side, with exponential backoff between attempts
+    - recover_stale / purge_finished / get_stats: housekeeping
+    """
+
+    DEFAULT_MAX_ATTEMPTS = 5
+    DEFAULT_BACKOFF_SECONDS = 30
+    MAX_BACKOFF_SECONDS = 60 * 60
+
+    def __init__(self, db_path: str, backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+                 max_backoff_seconds: float = MAX_BACKOFF_SECONDS):
+        self.pool = get_pool(db_path)
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._listeners: List[threading.Event] = []
+
+    def add_listener(self, event: threading.Event):
+        """Event set whenever jobs are enqueued, so idle workers wake up immediately"""
+        self._listeners.append(event)
+
+    def _notify(self):
+        for event in self._listeners:
+            event.set()
+
+    def enqueue(self, job_type: str, payload: Optional[dict] = None, run_at: Optional[datetime] = None,
+                dedupe_key: Optional[str] = None, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> Optional[int]:
+        """Add a job (run_at is UTC, default now). Returns its id, or None if dedupe_key already exists."""
+        return self.enqueue_many([(job_type, payload, dedupe_key)], run_at, max_attempts)[0]
+
+    def enqueue_many(self, jobs: Iterable[tuple], run_at: Optional[datetime] = None,
+                     max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> List[Optional[int]]:
+        """Add (job_type, payload, dedupe_key) tuples in one transaction. Returns ids (None for duplicates)."""
+        due = _stamp(run_at)
+        ids = []
+        conn = self.pool.acquire(write=True)
+        try:
+            c = conn.cursor()
+            for job_type, payload, dedupe_key in jobs:
+                c.execute('''INSERT OR IGNORE INTO jobs (job_type, payload, max_attempts, next_run_at, dedupe_key)
+                             VALUES (?, ?, ?, ?, ?)''',
+                          (job_type, json.dumps(payload or {}), max_attempts, due, dedupe_key))
+                ids.append(c.lastrowid if c.rowcount else None)
+            conn.commit()
+        finally:
+            conn.close()
+        if any(ids):
+            self._notify()
+        return ids
+
+    def has_due_jobs(self) -> bool:
+        """Whether a pending job is due, checked on a reader so idle polls never take the writer"""
+        conn = self.pool.acquire()
+        try:
+            row = conn.execute("SELECT 1 FROM jobs WHERE status = ? AND next_run_at <= ? LIMIT 1",
+                               (PENDING, _stamp())).fetchone()
+            return row is not None
+        finally:
+            conn.close()
+
+    def claim(self, worker_id: str) -> Optional[Job]:
+        """Mark the oldest due pending job as running for this worker and return it"""
+        if not self.has_due_jobs():
+            return None
+        conn = self.pool.acquire(write=True)
+        try:
+            c = conn.cursor()
+            now = _stamp()
+            while True:
+                c.execute('''SELECT id, job_type, payload, attempts, max_attempts, dedupe_key FROM jobs
+                             WHERE status = ? AND next_run_at <= ?
+                             ORDER BY next_run_at, id LIMIT 1''', (PENDING, now))
+                row = c.fetchone()
+                if row is None:
+                    return None
+                c.execute('''UPDATE jobs SET status = ?, attempts = attempts + 1, locked_by = ?, locked_at = ?,
+                                             heartbeat_at = ?
+                             WHERE id = ? AND status = ?''', (RUNNING, worker_id, now, now, row['id'], PENDING))
+                conn.commit()
+                # Another process may have claimed it between the select and the update
+                if c.rowcount:
+                    try:
+                        payload = json.loads(row['payload'] or '{}')
+                    except ValueError:
+                        payload = {}
+                    return Job(row['id'], row['job_type'], payload, row['attempts'] + 1,
+                               row['max_attempts'], row['dedupe_key'], worker_id)
+        finally:
+            conn.close()
+
+    def heartbeat(self, worker_ids: Iterable[str]) -> int:
+        """Stamp heartbeat_at on running jobs held by these workers. Returns the count."""
+        worker_ids = list(worker_ids)
+        if not worker_ids:
+            return 0
+        conn = self.pool.acquire(write=True)
+        try:
+            c = conn.cursor()
+            c.execute(f'''UPDATE jobs SET heartbeat_at = ?
+                          WHERE status = ? AND locked_by IN ({', '.join('?' * len(worker_ids))})''',
+                      (_stamp(), RUNNING, *worker_ids))
+            conn.commit()
+            return c.rowcount
+        finally:
+            conn.close()
+
+    def complete(self, job: Job) -> bool:
+        """Mark the job done. Returns False if it is no longer locked by this worker."""
+        conn = self.pool.acquire(write=True)
+        try:
+            c = conn.cursor()
+            c.execute('''UPDATE jobs SET status = ?, finished_at = ?, locked_by = NULL, locked_at = NULL,
+                                         heartbeat_at = NULL, last_error = NULL
+                         WHERE id = ? AND status = ? AND locked_by IS ?''',
+                      (DONE, _stamp(), job.id, RUNNING, job.worker_id))
+            conn.commit()
+            return c.rowcount > 0
+        finally:
+            conn.close()
+
+    def backoff(self, attempts: int) -> float:
+        """Delay before the next attempt: doubling from backoff_seconds, capped, with jitter"""
+        delay = min(self.max_backoff_seconds, self.backoff_seconds * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    def fail(self, job: Job, error: str) -> Optional[bool]:
+        """
+        Record a failed attempt. Returns True if the job will be retried, False if it failed
+        for good, or None if it is no longer locked by this worker and was left alone.
+        """
+        retry = job.attempts < job.max_attempts
+        conn = self.pool.acquire(write=True)
+        try:
+            c = conn.cursor()
+            if retry:
+                next_run = _utcnow() + timedelta(seconds=self.backoff(job.attempts))
+                c.execute('''UPDATE jobs SET status = ?, next_run_at = ?, last_error = ?,
+                                             locked_by = NULL, locked_at = NULL, heartbeat_at = NULL
+                             WHERE id = ? AND status = ? AND locked_by IS ?''',
+                          (PENDING, _stamp(next_run), error, job.id, RUNNING, job.worker_id))
+            else:
+                c.execute('''UPDATE jobs SET status = ?, finished_at = ?, last_error = ?,
+                                             locked_by = NULL, locked_at = NULL, heartbeat_at = NULL
+                             WHERE id = ? AND status = ? AND locked_by IS ?''',
+                          (FAILED, _stamp(), error, job.id, RUNNING, job.worker_id))
+            conn.commit()
+            return retry if c.rowcount else None
+        finally:
+            conn.close()
+
+    def recover_stale(self, timeout_seconds: float) -> int:
+        """Put back running jobs without a heartbeat for timeout_seconds (their worker died). Returns the count."""
+        cutoff = _stamp(_utcnow() - timedelta(seconds=timeout_seconds))
+        conn = self.pool.acquire(write=True)
+        try:
+            c = conn.cursor()
+            c.execute('''UPDATE jobs SET status = CASE WHEN attempts < max_attempts THEN ? ELSE ? END,
+                                         last_error = 'Worker stopped before finishing',
+                                         finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE ? END,
+                                         locked_by = NULL, locked_at = NULL, heartbeat_at = NULL
+                         WHERE status = ? AND COALESCE(heartbeat_at, locked_at) < ?''',
+                      (PENDING, FAILED, _stamp(), RUNNING, cutoff))
+            conn.commit()
+            recovered = c.rowcount
+        finally:
+            conn.close()
+        if recovered:
+            self._notify()
+        return recovered
+
+    def purge_finished(self, older_than_days: float) -> int:
+        """Delete done/failed jobs finished more than older_than_days ago. Returns the count."""
+        cutoff = _stamp(_utcnow() - timedelta(days=older_than_days))
+        conn = self.pool.acquire(write=True)
+        try:
+            c = conn.cursor()
+            c.execute("DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (DONE, FAILED, cutoff))
+            conn.commit()
+            return c.rowcount
+        finally:
+            conn.close()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Job counts by status"""
+        conn = self.pool.acquire()
+        try:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+            return {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0, **{row[0]: row[1] for row in rows}}
+        finally:
+            conn.close()
+
+
+class JobWorkerPool:
+    """
+    Worker threads that claim and run due jobs, plus one thread that heartbeats the jobs
+    they are running every heartbeat_seconds.
+    handlers maps job_type -> callable(payload); jobs without a handler fail permanently.
+    """
+
+    DEFAULT_WORKERS = 4
+    DEFAULT_POLL_SECONDS = 5
+    DEFAULT_HEARTBEAT_SECONDS = 60
+
+    def __init__(self, queue: JobQueue, handlers: Dict[str, Callable[[dict], Any]],
+                 workers: int = DEFAULT_WORKERS, poll_seconds: float = DEFAULT_POLL_SECONDS,
+                 heartbeat_seconds: float = DEFAULT_HEARTBEAT_SECONDS):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = max(1, int(workers))
+        self.poll_seconds = poll_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stats = {"completed": 0, "retried": 0, "failed": 0, "lost": 0}
+        self._stats_lock = threading.Lock()
+        self._busy = set()  # worker ids currently running a job
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._id = uuid.uuid4().hex[:8]
+        queue.add_listener(self._wake)
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, args=(f"{self._id}-{i}",),
+                                      name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            with self._stats_lock:
+                busy = list(self._busy)
+            try:
+                self.queue.heartbeat(busy)
+            except Exception as e:
+                print(f"Job heartbeat error: {e}")
+
+    def _run(self, worker_id: str):
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(worker_id)
+            except Exception as e:
+                print(f"Job queue error: {e}")
+                job = None
+            if job is None:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+                continue
+            self.run_job(job)
+
+    def run_job(self, job: Job):
+        handler = self.handlers.get(job.job_type)
+        with self._stats_lock:
+            self._busy.add(job.worker_id)
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler for job type '{job.job_type}'")
+            handler(job.payload)
+        except Exception as e:
+            if handler is None:
+                job = job._replace(max_attempts=job.attempts)
+            retried = self.queue.fail(job, str(e))
+            if retried is None:
+                self._lost(job)
+            elif retried:
+                self._count("retried")
+                print(f"⚠ Job {job.id} ({job.job_type}) failed, attempt {job.attempts}/{job.max_attempts}: {e}")
+            else:
+                self._count("failed")
+                print(f"❌ Job {job.id} ({job.job_type}) failed permanently: {e}")
+            return
+        finally:
+            with self._stats_lock:
+                self._busy.discard(job.worker_id)
+        if self.queue.complete(job):
+            self._count("completed")
+        else:
+            self._lost(job)
+
+    def _lost(self, job: Job):
+        self._count("lost")
+        print(f"⚠ Job {job.id} ({job.job_type}) was re-queued by stale recovery; its result from this worker was dropped")
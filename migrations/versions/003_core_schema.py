@@ -0,0 +1,30 @@
+"""core sqlite schema registry
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from schema_migrations import apply_migrations
+
+
+# revision identifiers, used by Alembic.
+revision: str = '003'
+down_revision: Union[str, None] = '002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Core tables are versioned in schema_migrations.MIGRATIONS; apply whatever is pending
+    # on the same connection so Alembic and app startup share one migration history.
+    apply_migrations(op.get_bind().connection.dbapi_connection)
+
+
+def downgrade() -> None:
+    # Registry steps are forward-only
+    pass
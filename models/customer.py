@@ -77,6 +77,10 @@ class Customer(Base):
     __table_args__ = (
         Index('idx_customer_email_lower', email), # SQLite is case-insensitive by default for ASCII, but good to be explicit or handle logic
         Index('idx_customer_user_id', 'user_id'),  # Index for user filtering
+        Index('idx_customers_business_name', 'business_name'),  # Quote -> customer resolution by business name
+        # Keyset pagination on (created_at, id) for the active list, all users and per user
+        Index('idx_customers_listing', 'is_deleted', 'created_at', 'id'),
+        Index('idx_customers_user_listing', 'user_id', 'is_deleted', 'created_at', 'id'),
     )
 
     def __repr__(self):
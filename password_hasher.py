@@ -0,0 +1,129 @@
+"""
+Password hashing off the Streamlit script thread.
+
+PBKDF2 is deliberately slow, and a burst of sign-ins at shift start used to run every
+verification on the script threads at once. PasswordHasher runs hashing in a small,
+bounded worker pool (hashlib releases the GIL while deriving), so concurrent logins
+queue for a few CPU slots instead of starving everyone else's reruns.
+
+Stored format: pbkdf2_sha256$<iterations>$<salt>$<hash>. Hashes written before the
+algorithm and iteration count were encoded ("<salt>$<hash>", 100,000 iterations) still
+verify, and needs_rehash() reports them so the login flow can upgrade them. Run
+`python benchmark_pbkdf2.py` to pick PASSWORD_HASH_CONFIG["iterations"] for the host.
+"""
+
+import hashlib
+import hmac
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, NamedTuple, Optional
+
+from config import PASSWORD_HASH_CONFIG
+
+ALGORITHM = "pbkdf2_sha256"
+LEGACY_ITERATIONS = 100000
+
+
+class HasherBusy(Exception):
+    """Raised when a verification could not get a worker within the timeout"""
+
+
+class ParsedHash(NamedTuple):
+    algorithm: str
+    iterations: int
+    salt: str
+    digest: str
+
+
+def parse_hash(stored: str) -> Optional[ParsedHash]:
+    """Split a stored hash into its parts; None if it is not in a known format"""
+    parts = str(stored or "").split('$')
+    if len(parts) == 2:
+        return ParsedHash(ALGORITHM, LEGACY_ITERATIONS, parts[0], parts[1])
+    if len(parts) == 4 and parts[0] == ALGORITHM and parts[1].isdigit():
+        return ParsedHash(parts[0], int(parts[1]), parts[2], parts[3])
+    return None
+
+
+def _derive(password: str, salt: str, iterations: int) -> str:
+    # The salt is stored and used as its hex text, as the original salt$hash format did
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), iterations).hex()
+
+
+class PasswordHasher:
+    """
+    PBKDF2-SHA256 hashing with encoded parameters.
+    - hash(password) / verify(password, stored): run in the worker pool and wait for the result
+    - needs_rehash(stored): True for legacy hashes or a different iteration count
+    - rehash_async(password, on_hash): compute a fresh hash in the background
+    """
+
+    DEFAULT_ITERATIONS = LEGACY_ITERATIONS
+    DEFAULT_WORKERS = 2
+    DEFAULT_TIMEOUT_SECONDS = 15
+
+    def __init__(self, iterations: int = DEFAULT_ITERATIONS, workers: int = DEFAULT_WORKERS,
+                 timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS):
+        self.iterations = max(1, int(iterations))
+        self.timeout_seconds = timeout_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(workers)),
+                                            thread_name_prefix="password-hasher")
+
+    def hash_now(self, password: str) -> str:
+        """Hash on the calling thread (for scripts and the worker pool itself)"""
+        salt = secrets.token_hex(16)
+        return f"{ALGORITHM}${self.iterations}${salt}${_derive(password, salt, self.iterations)}"
+
+    @staticmethod
+    def verify_now(password: str, stored: str) -> bool:
+        """Verify on the calling thread"""
+        parsed = parse_hash(stored)
+        if parsed is None:
+            print("Password verification error: unrecognized hash format")
+            return False
+        computed = _derive(password, parsed.salt, parsed.iterations)
+        return hmac.compare_digest(computed, parsed.digest)
+
+    def _run(self, fn, *args):
+        future = self._executor.submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout_seconds)
+        except FutureTimeout:
+            future.cancel()
+            raise HasherBusy("Password hashing is busy, please try again")
+
+    def hash(self, password: str) -> str:
+        return self._run(self.hash_now, password)
+
+    def verify(self, password: str, stored: str) -> bool:
+        return self._run(self.verify_now, password, stored)
+
+    def needs_rehash(self, stored: str) -> bool:
+        parsed = parse_hash(stored)
+        if parsed is None or not str(stored).startswith(f"{ALGORITHM}$"):
+            return True
+        return parsed.iterations != self.iterations
+
+    def rehash_async(self, password: str, on_hash: Callable[[str], None]):
+        """Hash with the current parameters in the pool and pass the result to on_hash"""
+        def task():
+            try:
+                on_hash(self.hash_now(password))
+            except Exception as e:
+                print(f"Error upgrading password hash: {e}")
+        self._executor.submit(task)
+
+
+_hasher: Optional[PasswordHasher] = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Process-wide hasher configured from PASSWORD_HASH_CONFIG"""
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                _hasher = PasswordHasher(**PASSWORD_HASH_CONFIG)
+    return _hasher
@@ -0,0 +1,246 @@
+"""
+SQLite-backed cache for AI pricing responses.
+
+Market analysis and quote calculations are keyed on (ZIP, product, width, base cost),
+so repeat quotes for the same territory skip the model round trips. Entries expire
+after a TTL and the table is bounded by least-recently-used eviction.
+
+Hits only read the table: their last_access/hits updates are kept in memory and written
+in one batch every few seconds (and before each eviction), so cache reads never queue
+for the shared writer behind quote saves and imports.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from connection_pool import get_pool
+
+
+def make_cache_key(kind: str, location: str, product: str, width: Optional[str], base_cost: float) -> str:
+    """Stable key for one pricing request; base cost is rounded to the cent"""
+    parts = [
+        kind,
+        str(location or "").strip().upper(),
+        str(product or "").strip().lower(),
+        str(width or "").strip(),
+        f"{float(base_cost or 0):.2f}",
+    ]
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def invalidate_product(cursor, product: str, width: Optional[str] = None) -> int:
+    """
+    Drop cached pricing for a product (optionally one width) using the caller's cursor,
+    so the invalidation commits in the same transaction as the price change.
+    """
+    if width:
+        cursor.execute("DELETE FROM ai_pricing_cache WHERE product = ? AND width = ?", (product, width))
+    else:
+        cursor.execute("DELETE FROM ai_pricing_cache WHERE product = ?", (product,))
+    return cursor.rowcount
+
+
+class PricingCache:
+    """
+    Response cache for GeminiClient pricing calls.
+    - get()/put(): look up or store a JSON payload for a pricing request
+    - TTL expiry on read, LRU eviction once max_entries is exceeded
+    - invalidate()/clear(): manual invalidation by product or for everything
+    - get_stats(): hit/miss counters for this process plus the current entry count
+    - flush_access(): write pending last_access/hits updates now
+    """
+
+    DEFAULT_TTL_SECONDS = 6 * 60 * 60
+    DEFAULT_MAX_ENTRIES = 5000
+    DEFAULT_FLUSH_INTERVAL = 30  # seconds between batched last_access/hits writes
+
+    def __init__(self, db_path: str, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        self.pool = get_pool(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, int(max_entries))
+        self.flush_interval = flush_interval
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> [last_access, hits since the last flush]
+        self._access: Dict[str, list] = {}
+        self._access_lock = threading.Lock()
+        self._flusher = None
+
+    def _count(self, attr: str, n: int = 1):
+        with self._stats_lock:
+            setattr(self, attr, getattr(self, attr) + n)
+
+    def get(self, kind: str, location: str, product: str, width: Optional[str],
+            base_cost: float) -> Optional[Dict[str, Any]]:
+        key = make_cache_key(kind, location, product, width, base_cost)
+        conn = self.pool.acquire()
+        try:
+            row = conn.execute("SELECT payload, created_at FROM ai_pricing_cache WHERE key = ?",
+                               (key,)).fetchone()
+        except Exception as e:
+            print(f"Pricing cache read error: {e}")
+            row = None
+        finally:
+            conn.close()
+
+        if row is None:
+            self._count("misses")
+            return None
+
+        now = time.time()
+        if now - row["created_at"] > self.ttl_seconds:
+            conn = self.pool.acquire(write=True)
+            try:
+                conn.execute("DELETE FROM ai_pricing_cache WHERE key = ? AND created_at = ?",
+                             (key, row["created_at"]))
+                conn.commit()
+            except Exception as e:
+                print(f"Pricing cache update error: {e}")
+            finally:
+                conn.close()
+            self._count("misses")
+            return None
+
+        try:
+            payload = json.loads(row["payload"])
+        except (TypeError, ValueError):
+            self._count("misses")
+            return None
+        self._count("hits")
+        self._touch(key, now)
+        return payload
+
+    def _touch(self, key: str, now: float):
+        """Record a hit in memory; the flusher thread writes it later"""
+        with self._access_lock:
+            access = self._access.setdefault(key, [now, 0])
+            access[0] = now
+            access[1] += 1
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run_flusher, name="pricing-cache-flusher",
+                                                 daemon=True)
+                self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush_access()
+
+    def _take_access(self) -> list:
+        with self._access_lock:
+            pending, self._access = self._access, {}
+        return [(last_access, hits, key) for key, (last_access, hits) in pending.items()]
+
+    def _write_access(self, c, pending: list):
+        c.executemany("UPDATE ai_pricing_cache SET last_access = MAX(last_access, ?), hits = hits + ? WHERE key = ?",
+                      pending)
+
+    def _restore_access(self, pending: list):
+        """Put back updates whose write failed, unless newer ones arrived meanwhile"""
+        with self._access_lock:
+            for last_access, hits, key in pending:
+                access = self._access.setdefault(key, [last_access, 0])
+                access[1] += hits
+
+    def flush_access(self) -> int:
+        """Write pending hit updates in one transaction. Returns the number of entries updated."""
+        pending = self._take_access()
+        if not pending:
+            return 0
+        conn = self.pool.acquire(write=True)
+        try:
+            self._write_access(conn.cursor(), pending)
+            conn.commit()
+            return len(pending)
+        except Exception as e:
+            print(f"Pricing cache access flush error: {e}")
+            self._restore_access(pending)
+            return 0
+        finally:
+            conn.close()
+
+    def put(self, kind: str, location: str, product: str, width: Optional[str],
+            base_cost: float, payload: Dict[str, Any]):
+        if not payload:
+            # Empty results mean the model rejected the request; don't pin that answer
+            return
+        key = make_cache_key(kind, location, product, width, base_cost)
+        now = time.time()
+        pending = self._take_access()
+        conn = self.pool.acquire(write=True)
+        try:
+            c = conn.cursor()
+            # Eviction below orders by last_access, so bring it up to date first
+            self._write_access(c, pending)
+            c.execute('''INSERT OR REPLACE INTO ai_pricing_cache
+                         (key, kind, zip_code, product, width, base_cost, payload,
+                          created_at, last_access, hits)
+                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)''',
+                      (key, kind, str(location or "").strip(), product, width,
+                       round(float(base_cost or 0), 2), json.dumps(payload), now, now))
+            self._evict(c)
+            conn.commit()
+        except Exception as e:
+            print(f"Pricing cache write error: {e}")
+            self._restore_access(pending)
+        finally:
+            conn.close()
+
+    def _evict(self, c):
+        """Drop expired rows, then the least recently used ones beyond max_entries"""
+        c.execute("DELETE FROM ai_pricing_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        expired = max(c.rowcount, 0)
+        count = c.execute("SELECT COUNT(*) FROM ai_pricing_cache").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            c.execute('''DELETE FROM ai_pricing_cache WHERE key IN
+                         (SELECT key FROM ai_pricing_cache ORDER BY last_access ASC LIMIT ?)''',
+                      (overflow,))
+            expired += max(c.rowcount, 0)
+        if expired:
+            self._count("evictions", expired)
+
+    def invalidate(self, product: str, width: Optional[str] = None) -> int:
+        conn = self.pool.acquire(write=True)
+        try:
+            removed = invalidate_product(conn.cursor(), product, width)
+            conn.commit()
+            return removed
+        finally:
+            conn.close()
+
+    def clear(self) -> int:
+        conn = self.pool.acquire(write=True)
+        try:
+            c = conn.cursor()
+            c.execute("DELETE FROM ai_pricing_cache")
+            conn.commit()
+            return c.rowcount
+        finally:
+            conn.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        conn = self.pool.acquire()
+        try:
+            entries = conn.execute("SELECT COUNT(*) FROM ai_pricing_cache").fetchone()[0]
+        except Exception:
+            entries = 0
+        finally:
+            conn.close()
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": entries,
+                "ttl_seconds": self.ttl_seconds,
+                "max_entries": self.max_entries,
+            }
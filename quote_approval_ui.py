@@ -109,11 +109,10 @@ def edit_quote_dialog(db, quote):
 
 def _approve_quote(db, email_handler, quote):
     try:
-        conn = db.get_connection()
-        c = conn.cursor()
-        c.execute("UPDATE quotes SET status = 'approved' WHERE id = ?", (quote['id'],))
-        conn.commit()
-        conn.close()
+        # Goes through the writer so the analytics rollup moves with the status change
+        if not db.update_quote_status(quote['id'], 'approved'):
+            st.error(f"Could not approve quote #{quote['id']}")
+            return
         
         # Send email to customer (mocked for now if email_handler not fully set up for this)
         # In a real scenario, we would use email_handler.send_email
@@ -0,0 +1,111 @@
+"""
+Daily quote rollups for the analytics dashboard.
+
+quote_rollups_daily holds one row per day x user x status x product x width x category x
+ZIP x customer type with quote counts and totals. Database.create_quote, update_quote and
+update_quote_status keep it current by removing a quote's old contribution and adding
+the new one in the same transaction, so the dashboard reads a few aggregated rows
+instead of the full quote history.
+
+Quotes saved under a name before that customer existed are linked (and their rollup
+rows moved) by link_customer_quotes when the customer is created. Other customer or
+product edits are not propagated; run `python rebuild_rollups.py` to recompute
+everything from the quotes table.
+"""
+
+from typing import Iterable, Optional
+
+ROLLUP_DIMENSIONS = ['day', 'user_id', 'status', 'product', 'width', 'category', 'zip_code', 'customer_type']
+ROLLUP_METRICS = ['quote_count', 'total_quantity', 'total_price', 'sum_price_per_sqft', 'priced_count']
+
+# Dimension values and metrics of quotes; NULLs are mapped to placeholders so every
+# dimension can be part of the primary key
+_QUOTE_ROLLUP_SELECT = '''
+    SELECT date(q.created_at) AS day,
+           COALESCE(q.user_id, 0) AS user_id,
+           COALESCE(q.status, '') AS status,
+           COALESCE(CASE WHEN json_valid(q.product_specs)
+                         THEN json_extract(q.product_specs, '$.product') END, 'Unknown') AS product,
+           COALESCE(CASE WHEN json_valid(q.product_specs)
+                         THEN json_extract(q.product_specs, '$.width') END, 'Unknown') AS width,
+           COALESCE(p.category, 'Uncategorized') AS category,
+           COALESCE(cu.zip_code, q.location, '') AS zip_code,
+           COALESCE(cu.customer_type, 'Unknown') AS customer_type,
+           {count} AS quote_count,
+           {sum}(COALESCE(q.quantity, 0)) AS total_quantity,
+           {sum}(COALESCE(q.final_price, 0)) AS total_price,
+           {sum}(CASE WHEN q.quantity > 0 THEN q.final_price * 1.0 / q.quantity ELSE 0 END) AS sum_price_per_sqft,
+           {sum}(CASE WHEN q.quantity > 0 THEN 1 ELSE 0 END) AS priced_count
+    FROM quotes q
+    LEFT JOIN customers cu ON cu.id = q.customer_id
+    LEFT JOIN products p ON p.id = q.product_id
+'''
+
+
+def create_rollup_table(c):
+    c.execute(f'''CREATE TABLE IF NOT EXISTS quote_rollups_daily
+                 (day TEXT NOT NULL,
+                  user_id INTEGER NOT NULL,
+                  status TEXT NOT NULL,
+                  product TEXT NOT NULL,
+                  width TEXT NOT NULL,
+                  category TEXT NOT NULL,
+                  zip_code TEXT NOT NULL,
+                  customer_type TEXT NOT NULL,
+                  quote_count INTEGER NOT NULL DEFAULT 0,
+                  total_quantity REAL NOT NULL DEFAULT 0,
+                  total_price REAL NOT NULL DEFAULT 0,
+                  sum_price_per_sqft REAL NOT NULL DEFAULT 0,
+                  priced_count INTEGER NOT NULL DEFAULT 0,
+                  PRIMARY KEY ({', '.join(ROLLUP_DIMENSIONS)}))''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_quote_rollups_user ON quote_rollups_daily(user_id)")
+
+
+def apply_quote(c, quote_id: int, sign: int = 1) -> Optional[tuple]:
+    """
+    Add (sign=1) or remove (sign=-1) one quote's contribution using the caller's cursor,
+    so the rollup changes commit together with the quote write.
+    """
+    c.execute(_QUOTE_ROLLUP_SELECT.format(count='1', sum='') + " WHERE q.id = ?", (quote_id,))
+    row = c.fetchone()
+    if row is None:
+        return None
+    key = tuple(row[d] for d in ROLLUP_DIMENSIONS)
+    metrics = [sign * (row[m] or 0) for m in ROLLUP_METRICS]
+    c.execute(f'''INSERT INTO quote_rollups_daily ({', '.join(ROLLUP_DIMENSIONS + ROLLUP_METRICS)})
+                 VALUES ({', '.join('?' * (len(ROLLUP_DIMENSIONS) + len(ROLLUP_METRICS)))})
+                 ON CONFLICT({', '.join(ROLLUP_DIMENSIONS)}) DO UPDATE SET
+                 {', '.join(f"{m} = {m} + excluded.{m}" for m in ROLLUP_METRICS)}''',
+              key + tuple(metrics))
+    if sign < 0:
+        c.execute(f'''DELETE FROM quote_rollups_daily
+                     WHERE {' AND '.join(f"{d} = ?" for d in ROLLUP_DIMENSIONS)} AND quote_count <= 0''', key)
+    return key
+
+
+def link_customer_quotes(c, customer_id: str, names: Iterable[str]) -> int:
+    """
+    Point unlinked quotes saved under any of these names at customer_id, moving their
+    rollup contribution along with them. Needs a cursor whose rows support access by
+    column name. Returns the number of quotes linked.
+    """
+    names = [name for name in dict.fromkeys(names) if name]
+    if not names:
+        return 0
+    c.execute(f"SELECT id FROM quotes WHERE customer_id IS NULL AND customer_name IN ({', '.join('?' * len(names))})",
+              names)
+    quote_ids = [row[0] for row in c.fetchall()]
+    for quote_id in quote_ids:
+        apply_quote(c, quote_id, -1)
+        c.execute("UPDATE quotes SET customer_id = ? WHERE id = ?", (customer_id, quote_id))
+        apply_quote(c, quote_id, 1)
+    return len(quote_ids)
+
+
+def rebuild(c) -> int:
+    """Recompute every rollup row from the quotes table. Returns the number of rows written."""
+    c.execute("DELETE FROM quote_rollups_daily")
+    c.execute(f'''INSERT INTO quote_rollups_daily ({', '.join(ROLLUP_DIMENSIONS + ROLLUP_METRICS)})
+                 {_QUOTE_ROLLUP_SELECT.format(count='COUNT(*)', sum='SUM')}
+                 GROUP BY {', '.join(str(i + 1) for i in range(len(ROLLUP_DIMENSIONS)))}''')
+    return c.execute("SELECT COUNT(*) FROM quote_rollups_daily").fetchone()[0]
@@ -0,0 +1,10 @@
+from database import Database
+
+def rebuild_rollups():
+    """Recompute quote_rollups_daily from the quotes table (e.g. after editing customers or products)"""
+    db = Database()
+    rows = db.rebuild_quote_rollups()
+    print(f"✅ Rebuilt quote rollups: {rows} rows")
+
+if __name__ == "__main__":
+    rebuild_rollups()
@@ -1,17 +1,155 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, desc
+from sqlalchemy import Float, Integer, String, and_, column, func, literal_column, or_, desc, text, type_coerce
 from datetime import datetime
 from typing import List, Optional, Tuple
 from uuid import UUID
+import base64
+import json
+import re
+import sqlite3
+import threading
+import time
 
+import quote_rollups
 from models.customer import Customer
 from models.interaction import CustomerInteraction
 from schemas.customer import CustomerCreate, CustomerUpdate, CustomerInteractionCreate
 
+# Raw stored values of the keyset columns; comparing these text values directly keeps the
+# seek predicate index-friendly and exact regardless of how the timestamp was written
+_CREATED_AT_RAW = type_coerce(Customer.created_at, String)
+_ID_RAW = type_coerce(Customer.id, String)
+
+# Approximate totals for the customer list: {filter key: (count, computed_at)}
+_count_cache = {}
+_count_cache_lock = threading.Lock()
+
+
+# Relative importance of the customers_fts columns for bm25 ranking (same order as the index)
+_FTS_WEIGHTS = (2.0, 2.0, 3.0, 2.0, 2.0, 1.0, 1.0, 1.0, 1.0, 0.5, 0.5, 0.5)
+_SEARCH_TERM = re.compile(r'\w+', re.UNICODE)
+_MIN_DIGIT_SEARCH = 3
+
+
+def build_fts_query(search_query: str) -> Optional[str]:
+    """FTS5 MATCH expression: every word of the input as a quoted prefix term"""
+    terms = _SEARCH_TERM.findall(search_query or "")
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _digits_only(search_query: str) -> Optional[str]:
+    """Digits of a phone/ZIP style query (no letters), else None"""
+    if re.search(r'[^\W\d_]', search_query):
+        return None
+    digits = re.sub(r'\D', '', search_query)
+    return digits if len(digits) >= _MIN_DIGIT_SEARCH else None
+
+
+def encode_cursor(created_at: str, customer_id: str, rank: Optional[float] = None) -> str:
+    """Opaque page cursor for the (created_at, id) position of the last row on a page, plus its search rank"""
+    position = [created_at, customer_id] if rank is None else [created_at, customer_id, rank]
+    raw = json.dumps(position).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str, Optional[float]]:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if len(position) == 2:
+            position = position + [None]  # Unranked listing
+        created_at, customer_id, rank = position
+        return str(created_at), str(customer_id), None if rank is None else float(rank)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid customer page cursor") from e
+
+
+def invalidate_customer_counts():
+    with _count_cache_lock:
+        _count_cache.clear()
+
+
 class CustomerRepository:
+    COUNT_CACHE_TTL = 60  # seconds an approximate list total is reused
+    FTS_CHECK_TTL = 60  # seconds before checking again whether customers_fts exists
+
+    # Whether customers_fts exists, per database URL: {url: (found, checked_at)}
+    _fts_available = {}
+
     def __init__(self, db: Session):
         self.db = db
 
+    def _has_fts(self) -> bool:
+        url = str(self.db.get_bind().url)
+        now = time.monotonic()
+        cached = self._fts_available.get(url)
+        if cached and now - cached[1] < self.FTS_CHECK_TTL:
+            return cached[0]
+        found = self.db.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'customers_fts'"
+        )).first() is not None
+        self._fts_available[url] = (found, now)
+        return found
+
+    def _apply_search(self, query, search_query: str):
+        """
+        Restrict a customer query to search matches.
+        Returns (query, rank column or None); rank is bm25, lower is better.
+        """
+        digit_match = None
+        digits = _digits_only(search_query)
+        if digits:
+            # Phone numbers are stored with punctuation the tokenizer splits on, so match digits directly
+            phone_digits = Customer.phone
+            for ch in ('-', ' ', '(', ')', '.', '+'):
+                phone_digits = func.replace(phone_digits, ch, '')
+            digit_match = or_(
+                phone_digits.like(f"%{digits}%"),
+                Customer.zip_code.like(f"{digits}%")
+            )
+
+        fts_query = build_fts_query(search_query)
+        if fts_query and self._has_fts():
+            if digit_match is not None:
+                # Digits may also appear in notes, addresses etc.; phone/ZIP hits have no bm25
+                # rank, so combine both as a plain filter
+                fts_rowids = text(
+                    "SELECT rowid FROM customers_fts WHERE customers_fts MATCH :fts_query"
+                ).bindparams(fts_query=fts_query).columns(column('rowid', Integer))
+                return query.filter(or_(
+                    digit_match,
+                    literal_column('customers.rowid').in_(fts_rowids)
+                )), None
+            weights = ", ".join(str(w) for w in _FTS_WEIGHTS)
+            matches = text(
+                f"SELECT rowid AS fts_rowid, bm25(customers_fts, {weights}) AS fts_rank "
+                "FROM customers_fts WHERE customers_fts MATCH :fts_query"
+            ).bindparams(fts_query=fts_query).columns(
+                column('fts_rowid', Integer), column('fts_rank', Float)
+            ).subquery('fts')
+            query = query.join(matches, matches.c.fts_rowid == literal_column('customers.rowid'))
+            return query, matches.c.fts_rank
+
+        search = f"%{search_query}%"
+        return query.filter(
+            or_(
+                *([digit_match] if digit_match is not None else []),
+                Customer.first_name.ilike(search),
+                Customer.last_name.ilike(search),
+                Customer.full_name.ilike(search),
+                Customer.business_name.ilike(search),
+                Customer.email.ilike(search),
+                Customer.phone.ilike(search),
+                Customer.zip_code.ilike(search),
+                Customer.service.ilike(search),
+                Customer.role.ilike(search),
+                Customer.source.ilike(search),
+                Customer.status.ilike(search),
+                Customer.notes.ilike(search)
+            )
+        ), None
+
     def get_by_id(self, customer_id: UUID) -> Optional[Customer]:
         return self.db.query(Customer).filter(Customer.id == customer_id).first()
 
@@ -37,10 +175,25 @@ class CustomerRepository:
             user_id=user_id  # Associate with creating user
         )
         self.db.add(db_customer)
+        self.db.flush()
+        self._link_unlinked_quotes(db_customer)
         self.db.commit()
+        invalidate_customer_counts()
         self.db.refresh(db_customer)
         return db_customer
 
+    def _link_unlinked_quotes(self, customer: Customer):
+        """Attach quotes saved under this customer's name before it existed, in the same transaction"""
+        cursor = self.db.connection().connection.cursor()
+        cursor.row_factory = sqlite3.Row
+        try:
+            linked = quote_rollups.link_customer_quotes(
+                cursor, customer.id.hex, [customer.full_name, customer.business_name])
+        finally:
+            cursor.close()
+        if linked:
+            print(f"✓ Linked {linked} earlier quote(s) to customer {customer.full_name or customer.business_name}")
+
     def update(self, customer_id: UUID, customer_update: CustomerUpdate) -> Optional[Customer]:
         db_customer = self.get_by_id(customer_id)
         if not db_customer:
@@ -63,6 +216,7 @@ class CustomerRepository:
         db_customer.is_deleted = True
         db_customer.deleted_at = datetime.utcnow()
         self.db.commit()
+        invalidate_customer_counts()
         return True
 
     def restore(self, customer_id: UUID) -> bool:
@@ -74,6 +228,7 @@ class CustomerRepository:
         db_customer.is_deleted = False
         db_customer.deleted_at = None
         self.db.commit()
+        invalidate_customer_counts()
         return True
 
     def assign_to_user(self, customer_id: UUID, user_id: int) -> bool:
@@ -84,6 +239,7 @@ class CustomerRepository:
         
         db_customer.user_id = user_id
         self.db.commit()
+        invalidate_customer_counts()
         return True
 
     def remove_assignment(self, customer_id: UUID) -> bool:
@@ -94,6 +250,7 @@ class CustomerRepository:
         
         db_customer.user_id = None
         self.db.commit()
+        invalidate_customer_counts()
         return True
 
     def list_customers(
@@ -106,7 +263,20 @@ class CustomerRepository:
         is_admin: bool = False
     ) -> Tuple[List[Customer], int]:
         """List customers with user filtering. Admins see all, regular users see only their customers + shared."""
+        query, rank = self._filtered_query(search_query, include_deleted, user_id, is_admin)
+
+        total = query.count()
+        # Search results come best match first
+        order = [rank, desc(Customer.created_at)] if rank is not None else [desc(Customer.created_at)]
+        customers = query.order_by(*order).offset(skip).limit(limit).all()
+        
+        return customers, total
+
+    def _filtered_query(self, search_query: str = None, include_deleted: bool = False,
+                        user_id: int = None, is_admin: bool = False):
+        """Customer query for the list filters, plus the search rank column (None without full-text search)"""
         query = self.db.query(Customer)
+        rank = None
 
         if not include_deleted:
             query = query.filter(Customer.is_deleted == False)
@@ -121,29 +291,71 @@ class CustomerRepository:
                 )
             )
 
-        if search_query:
-            search = f"%{search_query}%"
-            query = query.filter(
-                or_(
-                    Customer.first_name.ilike(search),
-                    Customer.last_name.ilike(search),
-                    Customer.full_name.ilike(search),
-                    Customer.business_name.ilike(search),
-                    Customer.email.ilike(search),
-                    Customer.phone.ilike(search),
-                    Customer.zip_code.ilike(search),
-                    Customer.service.ilike(search),
-                    Customer.role.ilike(search),
-                    Customer.source.ilike(search),
-                    Customer.status.ilike(search),
-                    Customer.notes.ilike(search)
-                )
+        if search_query and search_query.strip():
+            query, rank = self._apply_search(query, search_query.strip())
+        return query, rank
+
+    def list_customers_page(
+        self,
+        limit: int = 100,
+        cursor: str = None,
+        search_query: str = None,
+        include_deleted: bool = False,
+        user_id: int = None,
+        is_admin: bool = False
+    ) -> Tuple[List[Customer], Optional[str]]:
+        """
+        Keyset-paginated customer list, newest first (full-text searches best match first).
+        Pass the returned cursor to get the next page; it is None on the last page.
+        Raises ValueError for a cursor that is invalid or from a differently ranked listing.
+        """
+        query, rank = self._filtered_query(search_query, include_deleted, user_id, is_admin)
+        if cursor:
+            created_at, customer_id, last_rank = decode_cursor(cursor)
+            if (rank is None) != (last_rank is None):
+                raise ValueError("Customer page cursor does not match the listing")
+            after = or_(
+                _CREATED_AT_RAW < created_at,
+                and_(_CREATED_AT_RAW == created_at, _ID_RAW < customer_id)
             )
+            if rank is not None:
+                after = or_(rank > last_rank, and_(rank == last_rank, after))
+            query = query.filter(after)
 
-        total = query.count()
-        customers = query.order_by(desc(Customer.created_at)).offset(skip).limit(limit).all()
-        
-        return customers, total
+        order = [desc(Customer.created_at), desc(Customer.id)]
+        if rank is not None:
+            query = query.add_columns(_CREATED_AT_RAW, _ID_RAW, rank)
+            order.insert(0, rank)
+        else:
+            query = query.add_columns(_CREATED_AT_RAW, _ID_RAW)
+        rows = query.order_by(*order).limit(limit + 1).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(last[1], last[2], last[3] if rank is not None else None)
+        return [row[0] for row in rows], next_cursor
+
+    def count_customers(
+        self,
+        search_query: str = None,
+        include_deleted: bool = False,
+        user_id: int = None,
+        is_admin: bool = False
+    ) -> int:
+        """Total for a customer list filter; cached for COUNT_CACHE_TTL seconds, so it may lag"""
+        key = (search_query or None, include_deleted, user_id if not is_admin else None, is_admin)
+        now = time.monotonic()
+        with _count_cache_lock:
+            cached = _count_cache.get(key)
+        if cached and now - cached[1] < self.COUNT_CACHE_TTL:
+            return cached[0]
+
+        total = self._filtered_query(search_query, include_deleted, user_id, is_admin)[0].count()
+        with _count_cache_lock:
+            _count_cache[key] = (total, now)
+        return total
 
     def add_interaction(self, interaction: CustomerInteractionCreate, user_id: int) -> CustomerInteraction:
         db_interaction = CustomerInteraction(
@@ -1,20 +1,23 @@
 import schedule
 import time
 import threading
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import pytz
 from typing import Optional
 
-from config import SCHEDULER_CONFIG, SAMPLE_PRODUCTS
+from config import SCHEDULER_CONFIG, SESSION_JANITOR_CONFIG, JOB_QUEUE_CONFIG, SAMPLE_PRODUCTS
 from database import Database
 from email_handler import EmailHandler
 from gemini_client import GeminiClient
+from job_queue import JobQueue, JobWorkerPool
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday']
 
 class SchedulerService:
     _instance = None
     _lock = threading.Lock()
     
-    def __new__(cls, db: Database, email_handler: EmailHandler, gemini_client: Optional[GeminiClient]):
+    def __new__(cls, db: Database, email_handler: Optional[EmailHandler], gemini_client: Optional[GeminiClient]):
         if not cls._instance:
             with cls._lock:
                 if not cls._instance:
@@ -24,15 +27,49 @@ class SchedulerService:
                     cls._instance.gemini_client = gemini_client
                     cls._instance.is_running = False
                     cls._instance.thread = None
+                    cls._instance.janitor_metrics = {
+                        "runs": 0,
+                        "total_purged": 0,
+                        "last_purged": 0,
+                        "last_pages_freed": 0,
+                        "last_run_at": None,
+                        "last_duration_ms": 0.0,
+                        "last_error": None,
+                    }
+                    cls._instance._janitor_lock = threading.Lock()
+                    cls._instance._vacuum_checked = False
+                    cls._instance.jobs = JobQueue(db.db_path, backoff_seconds=JOB_QUEUE_CONFIG["backoff_seconds"])
+                    cls._instance.workers = JobWorkerPool(
+                        cls._instance.jobs,
+                        {
+                            "weekly_update": cls._instance._run_weekly_update,
+                            "price_request": cls._instance._run_price_request,
+                            "daily_check": cls._instance._run_daily_check,
+                        },
+                        workers=JOB_QUEUE_CONFIG["workers"],
+                        poll_seconds=JOB_QUEUE_CONFIG["poll_seconds"],
+                        heartbeat_seconds=JOB_QUEUE_CONFIG["heartbeat_seconds"],
+                    )
+        # The scheduler starts before Gmail/Gemini may be available; pick them up once they are
+        if email_handler and not cls._instance.email_handler:
+            cls._instance.email_handler = email_handler
+        if gemini_client and not cls._instance.gemini_client:
+            cls._instance.gemini_client = gemini_client
         return cls._instance
 
     def start_scheduler(self):
-        """Start the scheduler in a background thread"""
+        """
+        Start the scheduler thread and the job workers.
+        The schedule only enqueues jobs; the workers run them, so a slow Gmail call never
+        delays other jobs and queued work survives a restart.
+        """
         if self.is_running:
             return
 
         self._setup_jobs()
         self.is_running = True
+        self.workers.start()
+        self.enqueue_missed_runs()
         self.thread = threading.Thread(target=self._run_continuously, daemon=True)
         self.thread.start()
         print("✅ Scheduler service started")
@@ -48,57 +85,152 @@ class SchedulerService:
         check_time = SCHEDULER_CONFIG["daily_check_time"]
         
         # Weekly Update (Monday)
-        schedule.every().monday.at(update_time).do(self.weekly_price_updates)
+        schedule.every().monday.at(update_time).do(self.enqueue_weekly_update)
         
         # Daily Check (Mon-Fri)
-        schedule.every().monday.at(check_time).do(self.daily_reply_check)
-        schedule.every().tuesday.at(check_time).do(self.daily_reply_check)
-        schedule.every().wednesday.at(check_time).do(self.daily_reply_check)
-        schedule.every().thursday.at(check_time).do(self.daily_reply_check)
-        schedule.every().friday.at(check_time).do(self.daily_reply_check)
+        for day in WEEKDAYS:
+            getattr(schedule.every(), day).at(check_time).do(self.enqueue_daily_check)
+        
+        # Job queue housekeeping
+        schedule.every(5).minutes.do(self._job_housekeeping)
         
-        print(f"📅 Jobs scheduled: Weekly update Mon {update_time}, Daily check Mon-Fri {check_time}")
+        # Session janitor
+        janitor_minutes = SESSION_JANITOR_CONFIG["interval_minutes"]
+        schedule.every(janitor_minutes).minutes.do(self.session_janitor)
+
+        print(f"📅 Jobs scheduled: Weekly update Mon {update_time}, Daily check Mon-Fri {check_time}, "
+              f"Session cleanup every {janitor_minutes} min")
 
     def _run_continuously(self):
         """Run the scheduler loop"""
+        # Sessions that expired while the app was down are purged right away
+        self.session_janitor()
         while self.is_running:
             schedule.run_pending()
             time.sleep(60)
 
-    def weekly_price_updates(self):
-        """Send price requests to all suppliers"""
+    # ------------------------------------------------------------------ job queue
+
+    @staticmethod
+    def _last_occurrence(now: datetime, days: list, at: str) -> datetime:
+        """Most recent scheduled time (local, like the schedule library) on one of `days` at HH:MM"""
+        hour, minute = (int(part) for part in at.split(':'))
+        for back in range(8):
+            candidate = (now - timedelta(days=back)).replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if candidate <= now and candidate.strftime('%A').lower() in days:
+                return candidate
+        return now
+
+    def _window_done(self, sync_type: str, window: datetime) -> bool:
+        """True if a successful run was logged after the window (sync_history stores UTC)"""
+        last = self.db.get_last_sync(sync_type)
+        if not last:
+            return False
+        window_utc = window.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        return last['timestamp'] >= window_utc
+
+    def enqueue_weekly_update(self, window: Optional[datetime] = None):
+        """Queue the weekly price request fan-out for its window (once per window)"""
+        window = window or self._last_occurrence(datetime.now(), ['monday'], SCHEDULER_CONFIG["weekly_update_time"])
+        key = window.strftime('%Y-%m-%d')
+        return self.jobs.enqueue("weekly_update", {"window": key}, dedupe_key=f"weekly_update:{key}",
+                                 max_attempts=JOB_QUEUE_CONFIG["max_attempts"])
+
+    def enqueue_daily_check(self, window: Optional[datetime] = None):
+        """Queue the reply check for its window (once per window)"""
+        window = window or self._last_occurrence(datetime.now(), WEEKDAYS, SCHEDULER_CONFIG["daily_check_time"])
+        key = window.strftime('%Y-%m-%d')
+        return self.jobs.enqueue("daily_check", {"window": key}, dedupe_key=f"daily_check:{key}",
+                                 max_attempts=JOB_QUEUE_CONFIG["max_attempts"])
+
+    def enqueue_missed_runs(self):
+        """
+        Catch up on the latest weekly and daily windows if they passed while the app was down.
+        Windows already queued are ignored by their dedupe key; windows that ran before the
+        job queue existed are recognized from sync_history.
+        """
+        now = datetime.now()
+        weekly = self._last_occurrence(now, ['monday'], SCHEDULER_CONFIG["weekly_update_time"])
+        daily = self._last_occurrence(now, WEEKDAYS, SCHEDULER_CONFIG["daily_check_time"])
+        try:
+            if not self._window_done("weekly_update", weekly) and self.enqueue_weekly_update(weekly):
+                print(f"⏪ Catching up weekly price update for {weekly:%a %Y-%m-%d %H:%M}")
+            if not self._window_done("daily_check", daily) and self.enqueue_daily_check(daily):
+                print(f"⏪ Catching up daily reply check for {daily:%a %Y-%m-%d %H:%M}")
+        except Exception as e:
+            print(f"Error queueing missed runs: {e}")
+
+    def _job_housekeeping(self):
+        try:
+            recovered = self.jobs.recover_stale(JOB_QUEUE_CONFIG["stale_after_seconds"])
+            if recovered:
+                print(f"♻ Re-queued {recovered} interrupted job(s)")
+            self.jobs.purge_finished(JOB_QUEUE_CONFIG["keep_finished_days"])
+        except Exception as e:
+            print(f"Job queue housekeeping failed: {e}")
+
+    def get_job_stats(self) -> dict:
+        """Queue counts by status plus this process's worker counters"""
+        return {**self.jobs.get_stats(), **{f"workers_{k}": v for k, v in self.workers.stats.items()}}
+
+    def _run_weekly_update(self, payload: dict):
+        self.weekly_price_updates(window=payload.get("window"))
+
+    def _run_price_request(self, payload: dict):
+        """Send one supplier's price request; raising lets the queue retry with backoff"""
+        if not self.email_handler:
+            raise RuntimeError("Gmail not configured")
+        result = self.email_handler.send_price_request(payload["email"], payload["products"])
+        if result.get('status') != 'success':
+            raise RuntimeError(result.get('error', 'Send failed'))
+        self.db.log_sync_event("price_request", "success", f"Sent to {payload['email']}",
+                               supplier_id=payload.get("supplier_id"))
+
+    def _run_daily_check(self, payload: dict):
+        self.daily_reply_check(raise_errors=True)
+
+    # ------------------------------------------------------------------ jobs
+
+    def weekly_price_updates(self, window: Optional[str] = None):
+        """Queue one price request job per supplier; the workers send them concurrently"""
         print("🔄 Starting scheduled weekly price updates...")
+        window = window or datetime.now().strftime('%Y-%m-%d')
         try:
+            if not self.email_handler:
+                self.db.log_sync_event("weekly_update", "warning", "Gmail not configured")
+                return
+
             suppliers = self.db.get_suppliers()
             if not suppliers:
                 self.db.log_sync_event("weekly_update", "skipped", "No suppliers found")
                 return
 
             products = [p["name"] for p in SAMPLE_PRODUCTS]
-            sent_count = 0
-            
-            for supplier in suppliers:
-                try:
-                    email = supplier.get('email')
-                    if email:
-                        self.email_handler.send_price_request(email, products)
-                        sent_count += 1
-                except Exception as e:
-                    print(f"Error sending to {supplier.get('name')}: {e}")
-            
-            msg = f"Sent requests to {sent_count}/{len(suppliers)} suppliers"
+            jobs = [
+                ("price_request",
+                 {"supplier_id": supplier.get('id'), "email": supplier['email'], "products": products},
+                 f"price_request:{window}:{supplier.get('id') or supplier['email']}")
+                for supplier in suppliers if supplier.get('email')
+            ]
+            queued = sum(1 for job_id in self.jobs.enqueue_many(jobs, max_attempts=JOB_QUEUE_CONFIG["max_attempts"])
+                         if job_id)
+
+            msg = f"Queued requests to {queued}/{len(suppliers)} suppliers"
             self.db.log_sync_event("weekly_update", "success", msg)
-            print(f"✅ Weekly update completed: {msg}")
-            
+            print(f"✅ Weekly update queued: {msg}")
         except Exception as e:
             error_msg = str(e)
             self.db.log_sync_event("weekly_update", "error", error_msg)
             print(f"❌ Weekly update failed: {error_msg}")
+            raise
 
-    def daily_reply_check(self):
+    def daily_reply_check(self, raise_errors: bool = False):
         """Check for email replies and update prices"""
         print("🔄 Starting scheduled daily reply check...")
         try:
+            if not self.email_handler:
+                self.db.log_sync_event("daily_check", "warning", "Gmail not configured")
+                return
             if not self.gemini_client:
                 self.db.log_sync_event("daily_check", "warning", "Gemini client not initialized")
                 return
@@ -118,3 +250,50 @@ class SchedulerService:
             error_msg = str(e)
             self.db.log_sync_event("daily_check", "error", error_msg)
             print(f"❌ Daily check failed: {error_msg}")
+            if raise_errors:
+                raise
+
+    def session_janitor(self):
+        """Purge expired sessions in batches and return freed pages to the filesystem"""
+        if not self._janitor_lock.acquire(blocking=False):
+            return  # A run is already in progress
+        started = time.perf_counter()
+        try:
+            if not self._vacuum_checked and SESSION_JANITOR_CONFIG["convert_auto_vacuum"]:
+                self._vacuum_checked = True
+                self.db.enable_incremental_vacuum()
+
+            purged = self.db.purge_expired_sessions(
+                batch_size=SESSION_JANITOR_CONFIG["batch_size"],
+                max_batches=SESSION_JANITOR_CONFIG["max_batches"],
+                pause_seconds=SESSION_JANITOR_CONFIG["batch_pause_seconds"],
+            )
+            pages_freed = self.db.incremental_vacuum(SESSION_JANITOR_CONFIG["vacuum_pages"]) if purged else 0
+
+            duration_ms = (time.perf_counter() - started) * 1000
+            self.janitor_metrics.update({
+                "runs": self.janitor_metrics["runs"] + 1,
+                "total_purged": self.janitor_metrics["total_purged"] + purged,
+                "last_purged": purged,
+                "last_pages_freed": pages_freed,
+                "last_run_at": datetime.now().isoformat(),
+                "last_duration_ms": round(duration_ms, 1),
+                "last_error": None,
+            })
+            # Only runs that did something are logged, so sync_history is not filled with no-ops
+            if purged:
+                msg = f"Purged {purged} expired sessions, freed {pages_freed} pages in {duration_ms:.0f} ms"
+                self.db.log_sync_event("session_cleanup", "success", msg)
+                print(f"🧹 {msg}")
+        except Exception as e:
+            error_msg = str(e)
+            self.janitor_metrics["last_error"] = error_msg
+            self.janitor_metrics["last_run_at"] = datetime.now().isoformat()
+            self.db.log_sync_event("session_cleanup", "error", error_msg)
+            print(f"❌ Session cleanup failed: {error_msg}")
+        finally:
+            self._janitor_lock.release()
+
+    def get_janitor_metrics(self) -> dict:
+        """Counters from the session janitor (runs, sessions purged, last run time and duration)"""
+        return dict(self.janitor_metrics)
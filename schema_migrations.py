@@ -0,0 +1,485 @@
+"""
+Versioned schema migrations for the SQLite database.
+
+Each migration is registered with a version number and applied once, in order.
+Applied versions are recorded in the schema_version table, so startup only needs
+to read the current version and run whatever is still pending.
+
+The same registry is applied by the Alembic revision in
+migrations/versions/003_core_schema.py, so `alembic upgrade head` and app startup
+converge on the same schema.
+"""
+
+import sqlite3
+from typing import Callable, List, NamedTuple
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    upgrade: Callable[[sqlite3.Cursor], None]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str):
+    """Register a migration step. Versions must be unique and increasing."""
+    def decorator(fn):
+        if MIGRATIONS and version <= MIGRATIONS[-1].version:
+            raise ValueError(f"Migration {version} ({name}) registered out of order")
+        MIGRATIONS.append(Migration(version, name, fn))
+        return fn
+    return decorator
+
+
+def _column_names(c, table: str) -> set:
+    return {row[1] for row in c.execute(f"PRAGMA table_info({table})").fetchall()}
+
+
+def _add_column_if_missing(c, table: str, column: str, definition: str) -> bool:
+    """Add a column unless it already exists. Returns True if it was added."""
+    if column in _column_names(c, table):
+        return False
+    c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    print(f"✓ Added {column} column to {table} table")
+    return True
+
+
+def get_schema_version(conn) -> int:
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_version
+                    (version INTEGER PRIMARY KEY,
+                     name TEXT NOT NULL,
+                     applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    row = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()
+    return row[0]
+
+
+def apply_migrations(conn) -> int:
+    """
+    Apply all pending migrations on the given connection.
+    Each step runs in its own transaction together with its schema_version row.
+    Returns the number of migrations applied.
+    """
+    current = get_schema_version(conn)
+    pending = [m for m in MIGRATIONS if m.version > current]
+    if not pending:
+        return 0
+
+    applied = 0
+    for step in pending:
+        # When called from Alembic the connection may already be inside its transaction
+        owns_transaction = not conn.in_transaction
+        if owns_transaction:
+            conn.execute("BEGIN")
+        try:
+            step.upgrade(conn.cursor())
+            conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                         (step.version, step.name))
+            if owns_transaction:
+                conn.commit()
+        except Exception:
+            if owns_transaction:
+                conn.rollback()
+            print(f"❌ Schema migration {step.version} ({step.name}) failed")
+            raise
+        print(f"✓ Applied schema migration {step.version}: {step.name}")
+        applied += 1
+    return applied
+
+
+# ===================== MIGRATIONS =====================
+
+@migration(1, "baseline")
+def _baseline(c):
+    """Core tables plus the column additions earlier releases applied ad hoc"""
+    # Users table - optimized for authentication
+    c.execute('''CREATE TABLE IF NOT EXISTS users
+                (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 username TEXT NOT NULL UNIQUE COLLATE NOCASE,
+                 email TEXT NOT NULL UNIQUE COLLATE NOCASE,
+                 password_hash TEXT NOT NULL,
+                 full_name TEXT,
+                 is_active INTEGER DEFAULT 1,
+                 is_admin INTEGER DEFAULT 0,
+                 role TEXT DEFAULT 'user',
+                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                 last_login TIMESTAMP)''')
+
+    # Sessions table - optimized for session management
+    c.execute('''CREATE TABLE IF NOT EXISTS sessions
+                (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 user_id INTEGER NOT NULL,
+                 session_token TEXT NOT NULL UNIQUE,
+                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                 expires_at TIMESTAMP NOT NULL,
+                 last_activity TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                 ip_address TEXT,
+                 user_agent TEXT,
+                 remember_me INTEGER DEFAULT 0,
+                 is_active INTEGER DEFAULT 1,
+                 FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE)''')
+
+    # Create indexes for performance
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_sessions_token ON sessions(session_token)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions(expires_at)''')
+
+    # Customers table
+    c.execute('''CREATE TABLE IF NOT EXISTS customers
+                (id CHAR(32) PRIMARY KEY,
+                 first_name VARCHAR(100),
+                 last_name VARCHAR(100),
+                 full_name VARCHAR(255) NOT NULL,
+                 email VARCHAR(255) NOT NULL,
+                 phone VARCHAR(50),
+                 location VARCHAR(255),
+                 notes TEXT,
+                 is_deleted BOOLEAN DEFAULT 0,
+                 deleted_at DATETIME,
+                 created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                 updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                 user_id INTEGER,
+                 business_name TEXT,
+                 zip_code TEXT,
+                 customer_type TEXT DEFAULT 'contractor',
+                 service TEXT,
+                 role TEXT,
+                 source TEXT DEFAULT 'Admin',
+                 status TEXT DEFAULT 'New',
+                 FOREIGN KEY(user_id) REFERENCES users(id))''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS products
+                (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 name TEXT NOT NULL,
+                 width TEXT NOT NULL,
+                 description TEXT,
+                 category TEXT DEFAULT 'Hardwood',
+                 cost_price REAL DEFAULT 0.0,
+                 standard_price REAL DEFAULT 0.0,
+                 min_qty_discount INTEGER,
+                 discount_percentage REAL,
+                 discount_type TEXT,
+                 promotion_name TEXT,
+                 promotion_start_date TIMESTAMP,
+                 promotion_end_date TIMESTAMP,
+                 volume_discounts TEXT,
+                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+    # Suppliers table
+    c.execute('''CREATE TABLE IF NOT EXISTS suppliers
+                (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 name TEXT NOT NULL UNIQUE,
+                 email TEXT NOT NULL UNIQUE,
+                 phone TEXT,
+                 address TEXT,
+                 zip_code TEXT,
+                 additional_info TEXT,
+                 is_active INTEGER DEFAULT 1,
+                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS price_requests
+                (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 supplier_id INTEGER,
+                 status TEXT DEFAULT 'pending',
+                 sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                 response_data TEXT,
+                 FOREIGN KEY(supplier_id) REFERENCES suppliers(id))''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS quotes
+                (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 customer_name TEXT NOT NULL,
+                 location TEXT NOT NULL,
+                 product_specs TEXT NOT NULL,
+                 quantity INTEGER,
+                 final_price REAL,
+                 user_id INTEGER,
+                 status TEXT DEFAULT 'pending_admin_approval',
+                 rejection_reason TEXT,
+                 ai_retail_price REAL,
+                 ai_dealer_price REAL,
+                 ai_zip_code TEXT,
+                 ai_generated_at TIMESTAMP,
+                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                 FOREIGN KEY(user_id) REFERENCES users(id))''')
+
+    # Columns added after the first release - only missing on databases created before them
+    _add_column_if_missing(c, "users", "is_admin", "INTEGER DEFAULT 0")
+    if _add_column_if_missing(c, "users", "role", "TEXT DEFAULT 'user'"):
+        # Backfill role based on is_admin
+        c.execute("UPDATE users SET role = 'admin' WHERE is_admin = 1")
+        print("✓ Backfilled role column based on is_admin status")
+
+    _add_column_if_missing(c, "quotes", "user_id", "INTEGER REFERENCES users(id)")
+    if _add_column_if_missing(c, "quotes", "status", "TEXT DEFAULT 'pending_admin_approval'"):
+        # Backfill status for existing quotes to 'approved' (assuming old quotes are valid)
+        c.execute("UPDATE quotes SET status = 'approved' WHERE status = 'pending_admin_approval'")
+        print("✓ Backfilled status column for existing quotes")
+    _add_column_if_missing(c, "quotes", "ai_retail_price", "REAL")
+    _add_column_if_missing(c, "quotes", "ai_dealer_price", "REAL")
+    _add_column_if_missing(c, "quotes", "ai_zip_code", "TEXT")
+    _add_column_if_missing(c, "quotes", "ai_generated_at", "TIMESTAMP")
+    _add_column_if_missing(c, "quotes", "rejection_reason", "TEXT")
+
+    _add_column_if_missing(c, "customers", "business_name", "TEXT DEFAULT 'N/A'")
+    if _add_column_if_missing(c, "customers", "zip_code", "TEXT"):
+        # Migrate location to zip_code (naive migration)
+        c.execute("UPDATE customers SET zip_code = location WHERE location IS NOT NULL")
+        print("✓ Migrated location to zip_code")
+    _add_column_if_missing(c, "customers", "customer_type", "TEXT DEFAULT 'contractor'")
+    _add_column_if_missing(c, "customers", "user_id", "INTEGER REFERENCES users(id)")
+    _add_column_if_missing(c, "customers", "first_name", "VARCHAR(100)")
+    _add_column_if_missing(c, "customers", "last_name", "VARCHAR(100)")
+    _add_column_if_missing(c, "customers", "service", "TEXT")
+    _add_column_if_missing(c, "customers", "role", "TEXT")
+    _add_column_if_missing(c, "customers", "source", "TEXT DEFAULT 'Admin'")
+    _add_column_if_missing(c, "customers", "status", "TEXT DEFAULT 'New'")
+
+    # Ensure customer email is unique
+    try:
+        c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_customers_email ON customers(email)")
+    except sqlite3.Error as e:
+        print(f"Note: Could not create unique index on customers email: {e}")
+
+    # Customer interactions
+    c.execute('''CREATE TABLE IF NOT EXISTS customer_interactions
+            (id INTEGER PRIMARY KEY AUTOINCREMENT,
+             customer_id TEXT NOT NULL,
+             user_id INTEGER,
+             status TEXT NOT NULL,
+             notes TEXT,
+             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+             FOREIGN KEY (customer_id) REFERENCES customers(id),
+             FOREIGN KEY (user_id) REFERENCES users(id))''')
+
+    # Index for quote user_id filtering
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_quotes_user_id ON quotes(user_id)''')
+
+    _add_column_if_missing(c, "suppliers", "is_active", "INTEGER DEFAULT 1")
+    for col in ['phone', 'address', 'zip_code', 'additional_info']:
+        _add_column_if_missing(c, "suppliers", col, "TEXT")
+
+    _add_column_if_missing(c, "products", "supplier_id", "INTEGER REFERENCES suppliers(id)")
+
+    # Sync History table for automated tasks
+    c.execute('''CREATE TABLE IF NOT EXISTS sync_history
+                (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                 sync_type TEXT NOT NULL,
+                 supplier_id INTEGER,
+                 status TEXT NOT NULL,
+                 message TEXT,
+                 timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                 FOREIGN KEY(supplier_id) REFERENCES suppliers(id))''')
+
+
+@migration(2, "ai_pricing_cache")
+def _ai_pricing_cache(c):
+    """Persistent cache for AI market analysis and quote responses (see pricing_cache.py)"""
+    c.execute('''CREATE TABLE IF NOT EXISTS ai_pricing_cache
+                (key TEXT PRIMARY KEY,
+                 kind TEXT NOT NULL,
+                 zip_code TEXT,
+                 product TEXT NOT NULL,
+                 width TEXT,
+                 base_cost REAL,
+                 payload TEXT NOT NULL,
+                 created_at REAL NOT NULL,
+                 last_access REAL NOT NULL,
+                 hits INTEGER DEFAULT 0)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_ai_pricing_cache_product
+                 ON ai_pricing_cache(product, width)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_ai_pricing_cache_last_access
+                 ON ai_pricing_cache(last_access)''')
+
+
+@migration(3, "sync_state")
+def _sync_state(c):
+    """Key/value checkpoints for incremental syncs (e.g. the last processed Gmail historyId)"""
+    c.execute('''CREATE TABLE IF NOT EXISTS sync_state
+                (key TEXT PRIMARY KEY,
+                 value TEXT,
+                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+
+@migration(4, "supplier_email_nocase_index")
+def _supplier_email_nocase_index(c):
+    """Case-insensitive lookup of suppliers by sender address during reply processing"""
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_suppliers_email_nocase
+                 ON suppliers(email COLLATE NOCASE)''')
+
+
+@migration(5, "products_name_width_unique")
+def _products_name_width_unique(c):
+    """
+    One row per (name, width) so bulk imports can upsert; keeps the newest duplicate.
+    Older duplicates are copied to products_duplicates_backup (with the id they were
+    merged into) and anything pointing at them is repointed to the kept row.
+    """
+    c.execute('''CREATE TEMP TABLE product_id_merges AS
+                 SELECT p.id AS old_id, k.kept_id
+                 FROM products p
+                 JOIN (SELECT name, width, MAX(id) AS kept_id FROM products GROUP BY name, width) k
+                   ON p.name = k.name AND p.width = k.width
+                 WHERE p.id != k.kept_id''')
+    duplicates = c.execute("SELECT COUNT(*) FROM product_id_merges").fetchone()[0]
+    if duplicates:
+        c.execute('''CREATE TABLE products_duplicates_backup AS
+                     SELECT p.*, m.kept_id AS merged_into_id, CURRENT_TIMESTAMP AS backed_up_at
+                     FROM products p JOIN product_id_merges m ON p.id = m.old_id''')
+        # quotes.product_id is normally added (and backfilled against the kept rows) by
+        # migration 7; repoint it here in case the column already exists
+        if "product_id" in _column_names(c, "quotes"):
+            c.execute('''UPDATE quotes SET product_id =
+                            (SELECT kept_id FROM product_id_merges WHERE old_id = quotes.product_id)
+                         WHERE product_id IN (SELECT old_id FROM product_id_merges)''')
+        c.execute("DELETE FROM products WHERE id IN (SELECT old_id FROM product_id_merges)")
+        print(f"✓ Merged {duplicates} duplicate product rows (originals kept in products_duplicates_backup)")
+    c.execute("DROP TABLE product_id_merges")
+    c.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_products_name_width
+                 ON products(name, width)''')
+
+
+@migration(6, "products_volume_discount_tiers")
+def _products_volume_discount_tiers(c):
+    """Pre-parsed volume discount tiers (JSON, see volume_discounts.py) stored next to the free text"""
+    from volume_discounts import normalize_tiers
+
+    _add_column_if_missing(c, "products", "volume_discount_tiers", "TEXT")
+    rows = c.execute('''SELECT id, volume_discounts FROM products
+                        WHERE volume_discounts IS NOT NULL AND volume_discounts != ''
+                          AND volume_discount_tiers IS NULL''').fetchall()
+    updates = [(normalize_tiers(row[1]), row[0]) for row in rows]
+    c.executemany("UPDATE products SET volume_discount_tiers = ? WHERE id = ?",
+                  [u for u in updates if u[0]])
+
+
+@migration(7, "quotes_customer_product_keys")
+def _quotes_customer_product_keys(c):
+    """Indexed customer/product keys on quotes, backfilled from the name and product_specs text"""
+    _add_column_if_missing(c, "quotes", "customer_id", "TEXT REFERENCES customers(id)")
+    _add_column_if_missing(c, "quotes", "product_id", "INTEGER REFERENCES products(id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_quotes_customer_id ON quotes(customer_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_quotes_product_id ON quotes(product_id)")
+    # Quotes for customers that were not on file yet still match by name
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_quotes_unlinked_customer_name
+                 ON quotes(customer_name) WHERE customer_id IS NULL''')
+
+    c.execute('''UPDATE quotes SET product_id =
+                    (SELECT p.id FROM products p
+                     WHERE p.name = json_extract(quotes.product_specs, '$.product')
+                       AND p.width = json_extract(quotes.product_specs, '$.width'))
+                 WHERE product_id IS NULL AND json_valid(product_specs)''')
+
+    c.execute("CREATE INDEX IF NOT EXISTS idx_customers_business_name ON customers(business_name)")
+    _link_quotes_by_customer_name(c)
+
+
+def _link_quotes_by_customer_name(c) -> int:
+    """Set customer_id on unlinked quotes whose name matches a customer. Returns the count."""
+    linked = 0
+    # Full-name matches take precedence over business-name matches
+    for column in ("full_name", "business_name"):
+        c.execute(f'''UPDATE quotes SET customer_id =
+                        (SELECT cu.id FROM customers cu WHERE cu.{column} = quotes.customer_name
+                         ORDER BY COALESCE(cu.is_deleted, 0) LIMIT 1)
+                     WHERE customer_id IS NULL AND EXISTS
+                        (SELECT 1 FROM customers cu WHERE cu.{column} = quotes.customer_name)''')
+        linked += max(c.rowcount, 0)
+    return linked
+
+
+@migration(8, "quote_rollups_daily")
+def _quote_rollups_daily(c):
+    """Aggregated quote analytics maintained on quote writes (see quote_rollups.py)"""
+    import quote_rollups
+
+    quote_rollups.create_rollup_table(c)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_quotes_created_at ON quotes(created_at)")
+    rows = quote_rollups.rebuild(c)
+    if rows:
+        print(f"✓ Built {rows} quote rollup rows")
+
+
+@migration(9, "customers_listing_indexes")
+def _customers_listing_indexes(c):
+    """Keyset pagination of the customer list on (created_at, id), for all users and per user"""
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_customers_listing
+                 ON customers(is_deleted, created_at, id)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_customers_user_listing
+                 ON customers(user_id, is_deleted, created_at, id)''')
+
+
+# Searchable customer fields indexed by customers_fts (see CustomerRepository search)
+CUSTOMER_FTS_COLUMNS = ['first_name', 'last_name', 'full_name', 'business_name', 'email', 'phone',
+                        'zip_code', 'service', 'role', 'source', 'status', 'notes']
+
+
+@migration(10, "customers_fts")
+def _customers_fts(c):
+    """FTS5 index over the searchable customer fields, kept in sync by triggers"""
+    cols = ', '.join(CUSTOMER_FTS_COLUMNS)
+    new_cols = ', '.join(f"new.{col}" for col in CUSTOMER_FTS_COLUMNS)
+    old_cols = ', '.join(f"old.{col}" for col in CUSTOMER_FTS_COLUMNS)
+    try:
+        c.execute(f'''CREATE VIRTUAL TABLE IF NOT EXISTS customers_fts
+                      USING fts5({cols}, content='customers', content_rowid='rowid',
+                                 tokenize='unicode61 remove_diacritics 2')''')
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5: customer search keeps using LIKE
+        print(f"⚠ FTS5 unavailable, customer search will not be indexed: {e}")
+        return
+
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS customers_fts_insert AFTER INSERT ON customers BEGIN
+                      INSERT INTO customers_fts(rowid, {cols}) VALUES (new.rowid, {new_cols});
+                  END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS customers_fts_delete AFTER DELETE ON customers BEGIN
+                      INSERT INTO customers_fts(customers_fts, rowid, {cols}) VALUES ('delete', old.rowid, {old_cols});
+                  END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS customers_fts_update AFTER UPDATE OF {cols} ON customers BEGIN
+                      INSERT INTO customers_fts(customers_fts, rowid, {cols}) VALUES ('delete', old.rowid, {old_cols});
+                      INSERT INTO customers_fts(rowid, {cols}) VALUES (new.rowid, {new_cols});
+                  END''')
+    c.execute("INSERT INTO customers_fts(customers_fts) VALUES ('rebuild')")
+
+
+@migration(11, "jobs")
+def _jobs(c):
+    """Durable job queue for the scheduler (see job_queue.py)"""
+    c.execute('''CREATE TABLE IF NOT EXISTS jobs
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  job_type TEXT NOT NULL,
+                  payload TEXT,
+                  status TEXT NOT NULL DEFAULT 'pending',
+                  attempts INTEGER NOT NULL DEFAULT 0,
+                  max_attempts INTEGER NOT NULL DEFAULT 5,
+                  next_run_at TIMESTAMP NOT NULL,
+                  dedupe_key TEXT,
+                  locked_by TEXT,
+                  locked_at TIMESTAMP,
+                  last_error TEXT,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  finished_at TIMESTAMP)''')
+    # Claim order: due pending jobs, oldest first
+    c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_next_run ON jobs(status, next_run_at)")
+    # One job per scheduled window/supplier, so re-enqueueing after a restart is a no-op
+    c.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedupe_key
+                 ON jobs(dedupe_key) WHERE dedupe_key IS NOT NULL''')
+
+
+@migration(12, "quotes_link_late_customers")
+def _quotes_link_late_customers(c):
+    """Link quotes saved before their customer was added (new customers link them on create)"""
+    import quote_rollups
+
+    linked = _link_quotes_by_customer_name(c)
+    if linked:
+        quote_rollups.rebuild(c)
+        print(f"✓ Linked {linked} quotes to customers added after them")
+
+
+@migration(13, "jobs_heartbeat")
+def _jobs_heartbeat(c):
+    """Heartbeat column so stale recovery can tell long-running jobs from dead ones"""
+    _add_column_if_missing(c, "jobs", "heartbeat_at", "TIMESTAMP")
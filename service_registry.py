@@ -0,0 +1,99 @@
+"""
+Process-wide registry for expensive shared services (database, AI client, Gmail).
+
+Streamlit re-executes app.py on every interaction, but imported modules stay loaded,
+so services held here are constructed once per process instead of once per rerun.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class ServiceRegistry:
+    """
+    Lazily constructs named services on first use and keeps them for the life of the process.
+    - register(): declare a factory (idempotent, so it is safe to call on every rerun)
+    - get(): return the instance, building it on first use; failures are cached and re-raised
+    - invalidate(): drop an instance (or cached failure) so the next get() rebuilds it
+    - warm_up(): build services ahead of time, optionally on a background thread
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._errors: Dict[str, Exception] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any], replace: bool = False):
+        with self._lock:
+            if name in self._factories and not replace:
+                return
+            self._factories[name] = factory
+            self._locks.setdefault(name, threading.Lock())
+        if replace:
+            self.invalidate(name)
+
+    def is_registered(self, name: str) -> bool:
+        return name in self._factories
+
+    def is_ready(self, name: str) -> bool:
+        """True once the service has been built successfully"""
+        return name in self._instances
+
+    def get(self, name: str) -> Any:
+        if name in self._instances:
+            return self._instances[name]
+        if name not in self._factories:
+            raise KeyError(f"Service '{name}' is not registered")
+
+        # Per-service lock: concurrent callers wait for a single construction
+        with self._locks[name]:
+            if name in self._instances:
+                return self._instances[name]
+            if name in self._errors:
+                raise self._errors[name]
+            try:
+                instance = self._factories[name]()
+            except Exception as e:
+                self._errors[name] = e
+                raise
+            self._instances[name] = instance
+            return instance
+
+    def invalidate(self, name: Optional[str] = None):
+        """Forget one service (or all of them) so it is rebuilt on next use"""
+        names = [name] if name else list(self._factories)
+        for n in names:
+            lock = self._locks.get(n)
+            if lock is None:
+                continue
+            with lock:
+                self._instances.pop(n, None)
+                self._errors.pop(n, None)
+
+    def warm_up(self, names: Optional[Iterable[str]] = None,
+                background: bool = True) -> Optional[threading.Thread]:
+        """Build services before they are needed; errors are cached for the next get()"""
+        targets = [n for n in (names if names is not None else list(self._factories))
+                   if n not in self._instances and n not in self._errors]
+        if not targets:
+            return None
+
+        def _build():
+            for n in targets:
+                try:
+                    self.get(n)
+                except Exception as e:
+                    print(f"Service warm-up failed for {n}: {e}")
+
+        if not background:
+            _build()
+            return None
+        thread = threading.Thread(target=_build, name="service-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+
+# Shared instance used by the app and background services
+services = ServiceRegistry()
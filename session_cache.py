@@ -0,0 +1,211 @@
+"""
+In-process cache for session validation.
+
+Streamlit validates the session token on every rerun. Valid sessions are cached for a
+short TTL so a rerun costs a dict lookup instead of a sessions/users join, and the
+last_activity updates that used to be written on every validation are collected by an
+ActivityFlusher and written in one batch every few seconds.
+
+Validation also resolves the user's role in the same query, and UserCache keeps role
+lookups per user_id so pages never query users for permission checks.
+
+Logout, user deactivation and role changes drop the affected entries immediately;
+changes made by other processes are picked up once the TTL runs out.
+"""
+
+import atexit
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from connection_pool import get_pool
+
+
+class ActivityFlusher:
+    """Batches sessions.last_activity updates and writes them from a daemon thread"""
+
+    DEFAULT_INTERVAL = 30  # seconds
+
+    def __init__(self, db_path: str, interval: float = DEFAULT_INTERVAL):
+        self.pool = get_pool(db_path)
+        self.interval = interval
+        self._pending: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def touch(self, session_id: int):
+        """Record activity now; only the latest timestamp per session is written"""
+        # Same format and timezone as CURRENT_TIMESTAMP
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+        with self._lock:
+            self._pending[session_id] = stamp
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="session-activity-flusher", daemon=True)
+                self._thread.start()
+
+    def discard(self, session_id: int):
+        with self._lock:
+            self._pending.pop(session_id, None)
+
+    def flush(self) -> int:
+        """Write pending updates in one transaction. Returns the number of sessions updated."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        conn = self.pool.acquire(write=True)
+        try:
+            conn.executemany("UPDATE sessions SET last_activity = ? WHERE id = ?",
+                             [(stamp, session_id) for session_id, stamp in pending.items()])
+            conn.commit()
+            return len(pending)
+        except Exception as e:
+            print(f"Error flushing session activity: {e}")
+            # Keep the updates for the next run unless newer ones arrived meanwhile
+            with self._lock:
+                for session_id, stamp in pending.items():
+                    self._pending.setdefault(session_id, stamp)
+            return 0
+        finally:
+            conn.close()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+
+class SessionCache:
+    """
+    token -> validated session info, for at most ttl_seconds and never past the session's expiry.
+    - get()/put(): cached validation results
+    - invalidate(token) / invalidate_user(user_id): drop entries on logout, deactivation or role change
+    - touch(): queue a last_activity update for the flusher
+    """
+
+    DEFAULT_TTL_SECONDS = 60
+
+    def __init__(self, db_path: str, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 flush_interval: float = ActivityFlusher.DEFAULT_INTERVAL):
+        self.ttl_seconds = ttl_seconds
+        self.activity = ActivityFlusher(db_path, flush_interval)
+        self._entries: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(token)
+        if entry is None:
+            return None
+        info, session_id, expires_at, cached_at = entry
+        if time.monotonic() - cached_at > self.ttl_seconds or datetime.now() > expires_at:
+            # Stale or expired: the caller re-validates against the database
+            with self._lock:
+                if self._entries.get(token) is entry:
+                    del self._entries[token]
+            return None
+        return info
+
+    def put(self, token: str, info: Dict[str, Any], session_id: int, expires_at: datetime):
+        with self._lock:
+            self._entries[token] = (info, session_id, expires_at, time.monotonic())
+
+    def touch(self, token: str):
+        with self._lock:
+            entry = self._entries.get(token)
+        if entry is not None:
+            self.activity.touch(entry[1])
+
+    def invalidate(self, token: str):
+        with self._lock:
+            entry = self._entries.pop(token, None)
+        if entry is not None:
+            self.activity.discard(entry[1])
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            tokens = [t for t, entry in self._entries.items() if entry[0].get('user_id') == user_id]
+            for token in tokens:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def role_flags(role: Optional[str], is_admin_flag) -> Dict[str, Any]:
+    """role/is_admin/is_super_admin for a users row; the legacy is_admin flag also grants admin"""
+    return {
+        "role": role or 'user',
+        "is_admin": role in ('admin', 'super_admin') or bool(is_admin_flag),
+        "is_super_admin": role == 'super_admin',
+    }
+
+
+class UserCache:
+    """user_id -> role flags (see role_flags), for at most ttl_seconds"""
+
+    DEFAULT_TTL_SECONDS = 60
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None or time.monotonic() - entry[1] > self.ttl_seconds:
+            return None
+        return entry[0]
+
+    def put(self, user_id: int, flags: Dict[str, Any]):
+        with self._lock:
+            self._entries[user_id] = (flags, time.monotonic())
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_caches: Dict[str, SessionCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_session_cache(db_path: str) -> SessionCache:
+    """Process-wide session cache for a database file"""
+    key = os.path.abspath(db_path)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = SessionCache(db_path)
+        return _caches[key]
+
+
+_user_caches: Dict[str, UserCache] = {}
+
+
+def get_user_cache(db_path: str) -> UserCache:
+    """Process-wide user role cache for a database file"""
+    key = os.path.abspath(db_path)
+    with _caches_lock:
+        if key not in _user_caches:
+            _user_caches[key] = UserCache()
+        return _user_caches[key]
+
+
+@atexit.register
+def _flush_all():
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.activity.stop()
@@ -75,7 +75,7 @@ def view_supplier_inventory(db, supplier_id, supplier_name):
     st.subheader(f"Products from {supplier_name}")
     
     # Get products from this supplier
-    products = db.get_products_by_supplier(supplier_id)
+    products = db.get_catalog().for_supplier(supplier_id)
     
     if not products:
         st.info(f"No products found from {supplier_name}")
@@ -154,11 +154,8 @@ def render_supplier_page(db, email_handler, gemini):
     st.title("📧 Supplier Management")
     
     # Check if user is admin
-    from database import Database
-    from config import DATABASE_PATH
-    db_instance = Database(DATABASE_PATH)
     user_id = st.session_state.get('user_id')
-    is_admin = db_instance.is_user_admin(user_id) if user_id else False
+    is_admin = st.session_state.get('is_admin', False)
     
     # Tabs for better organization - add Bulk Import for admins
     if is_admin:
@@ -349,7 +346,7 @@ def render_supplier_page(db, email_handler, gemini):
         
         st.divider()
         st.subheader("Current Price List")
-        current_products = db.get_products()
+        current_products = db.get_catalog().products
         if current_products:
             df = pd.DataFrame(current_products)
             
@@ -390,29 +387,23 @@ def render_supplier_page(db, email_handler, gemini):
                 if uploaded_file:
                     st.info(f"📄 File: {uploaded_file.name} ({uploaded_file.size} bytes)")
                     
-                    # Parse file
-                    from file_parser import parse_csv_file, parse_excel_file, prepare_product_dict
+                    # Validate the whole file chunk by chunk, then preview only the first rows
+                    from file_parser import validate_file, read_preview, import_products_from_file
                     
-                    df = None
-                    errors = []
-                    
-                    if uploaded_file.name.endswith('.csv'):
-                        df, errors = parse_csv_file(uploaded_file)
-                    else:
-                        df, errors = parse_excel_file(uploaded_file)
+                    row_count, errors = validate_file(uploaded_file)
                     
                     if errors:
                         st.error("❌ Validation Errors:")
                         for error in errors:
                             st.write(f"- {error}")
                     
-                    if df is not None and not errors:
+                    if row_count and not errors:
                         st.success("✅ File validated successfully!")
                         
                         # Preview data
                         with st.expander("📊 Preview Data", expanded=True):
-                            st.dataframe(df.head(10), use_container_width=True)
-                            st.caption(f"Showing first 10 of {len(df)} rows")
+                            st.dataframe(read_preview(uploaded_file, nrows=10), use_container_width=True)
+                            st.caption(f"Showing first 10 of {row_count} rows")
                         
                         # Supplier selection (optional)
                         suppliers = db.get_suppliers()
@@ -427,32 +418,43 @@ def render_supplier_page(db, email_handler, gemini):
                         
                         # Import button
                         if st.button("🚀 Import Products", type="primary", use_container_width=True):
-                            with st.spinner("Importing products..."):
-                                # Convert DataFrame to list of dicts
-                                products_data = [prepare_product_dict(row) for _, row in df.iterrows()]
-                                
-                                # Import
-                                results = db.bulk_import_products(
-                                    products_data,
-                                    supplier_id=supplier_id,
-                                    user_id=user_id
-                                )
-                                
-                                # Display results
+                            progress = st.progress(0.0, text="Importing products...")
+                            
+                            def on_progress(rows_done: int):
+                                progress.progress(min(rows_done / row_count, 1.0),
+                                                  text=f"Imported {rows_done:,} of {row_count:,} rows")
+                            
+                            results = import_products_from_file(
+                                uploaded_file, db,
+                                supplier_id=supplier_id,
+                                user_id=user_id,
+                                on_progress=on_progress
+                            )
+                            progress.empty()
+                            
+                            # Display results
+                            if results['partial']:
+                                st.warning(f"⚠️ Import stopped at row {results['stopped_at_row']} - "
+                                           "earlier rows were saved, the rest were not imported")
+                            elif results['stopped_at_row']:
+                                st.error("❌ Import failed - no products were saved")
+                            else:
                                 st.success("✅ Import Complete!")
-                                
-                                col_a, col_b, col_c = st.columns(3)
-                                col_a.metric("✅ Inserted", results['inserted'])
-                                col_b.metric("🔄 Updated", results['updated'])
-                                col_c.metric("⚠️ Skipped", results['skipped'])
-                                
-                                if results['errors']:
-                                    with st.expander(f"❌ Errors ({len(results['errors'])})", expanded=False):
-                                        for error in results['errors']:
-                                            st.write(f"Row {error.get('row', '?')}: {error.get('product', 'Unknown')} - {error.get('error', 'Unknown error')}")
-                                
-                                # Clear cache to refresh product list
-                                clear_database_cache()
+                            
+                            col_a, col_b, col_c = st.columns(3)
+                            col_a.metric("✅ Inserted", results['inserted'])
+                            col_b.metric("🔄 Updated", results['updated'])
+                            col_c.metric("⚠️ Skipped", results['skipped'])
+                            
+                            if results['errors']:
+                                with st.expander(f"❌ Errors ({len(results['errors'])})", expanded=False):
+                                    for error in results['errors']:
+                                        st.write(f"Row {error.get('row', '?')}: {error.get('product', 'Unknown')} - {error.get('error', 'Unknown error')}")
+                            
+                            # Clear cache to refresh product list
+                            clear_database_cache()
+                            # Rerunning clears the report, so only do it when nothing needs reading
+                            if not results['stopped_at_row'] and not results['errors']:
                                 time.sleep(1)
                                 st.rerun()
             
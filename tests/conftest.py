@@ -0,0 +1,40 @@
+import os
+import sys
+
+import pytest
+
+# Modules live at the repository root, like the app itself imports them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connection_pool import close_pool  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "crm.db")
+    yield path
+    close_pool(path)
+
+
+@pytest.fixture
+def db(db_path):
+    """A migrated Database on a fresh file"""
+    from database import Database
+    return Database(db_path)
+
+
+@pytest.fixture
+def customer_repo(db):
+    """CustomerRepository on its own session against the test database"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from repositories.customer_repository import CustomerRepository
+
+    engine = create_engine(f"sqlite:///{db.db_path}")
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield CustomerRepository(session)
+    finally:
+        session.close()
+        engine.dispose()
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+# app.py imports the Gemini and Gmail clients at module level
+for module in ("google.generativeai", "googleapiclient", "google_auth_httplib2", "google_auth_oauthlib"):
+    pytest.importorskip(module)
+
+from sqlalchemy import create_engine  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import models.base  # noqa: E402
+from database import Database  # noqa: E402
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def test_sidebar_renders_sync_section_for_admins(tmp_path, monkeypatch):
+    # app.py opens data/crm.db relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    # The SQLAlchemy engine resolved its path when models.base was first imported
+    monkeypatch.setattr(models.base, "engine", create_engine(f"sqlite:///{tmp_path / 'data' / 'crm.db'}"))
+    db = Database(os.path.join("data", "crm.db"))
+    user_id = db.register_user("admin", "admin@example.com", "unused")["user_id"]
+    db.update_user_role(user_id, "admin")
+    db.create_session(user_id, "admin-token")
+
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.session_state["authenticated"] = True
+    at.session_state["session_token"] = "admin-token"
+    at.session_state["user_id"] = user_id
+    at.session_state["username"] = "admin"
+    at.session_state["email"] = "admin@example.com"
+    at.session_state["full_name"] = "Admin"
+    at.session_state["remember_me"] = False
+    at.run()
+
+    assert "Auto-Sync Status" in [header.value for header in at.sidebar.subheader]
+    captions = [caption.value for caption in at.sidebar.caption]
+    assert "Sync Status: Unavailable" not in captions
+    assert "Last Check: Never" in captions
+    assert "🔄 Force Sync Now" in [button.label for button in at.sidebar.button]
@@ -0,0 +1,131 @@
+import threading
+import time
+
+import pytest
+
+from batch_pricing import BatchPricer, LineItem, RateLimiter
+from catalog import CatalogSnapshot
+
+
+def _catalog():
+    return CatalogSnapshot(1, [
+        {"name": "Red Oak", "width": '5"', "standard_price": 4.0, "cost_price": 3.0},
+        {"name": "White Oak", "width": '7"', "standard_price": 6.0, "cost_price": 5.0},
+        {"name": "Maple", "width": '3"', "standard_price": 0, "cost_price": 0},
+    ])
+
+
+class FakeGemini:
+    """price_quote stand-in that records calls and how many ran at once"""
+
+    initialized = True
+
+    def __init__(self, delay=0.02, fail_zip=None, empty_zip=None):
+        self.delay = delay
+        self.fail_zip = fail_zip
+        self.empty_zip = empty_zip
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def price_quote(self, base_cost, product_name, width, location, timeout=None, rate_limiter=None):
+        if rate_limiter:
+            rate_limiter.acquire(timeout=timeout)
+        with self._lock:
+            self.calls.append((product_name, width, location, base_cost))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if location == self.fail_zip:
+                raise RuntimeError("model overloaded")
+            if location == self.empty_zip:
+                return {}
+            return {"selling_price": round(base_cost * 1.5, 2), "margin": 50.0, "confidence": 0.9,
+                    "verified_location": f"ZIP {location}"}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def test_rate_limiter_allows_a_burst_then_refills():
+    limiter = RateLimiter(rate=20, burst=3)
+    assert all(limiter.acquire(timeout=0) for _ in range(3))
+    assert not limiter.acquire(timeout=0)
+    started = time.monotonic()
+    assert limiter.acquire(timeout=1)
+    assert 0.02 < time.monotonic() - started < 0.5
+
+
+def test_rate_limiter_is_shared_across_threads():
+    limiter = RateLimiter(rate=50, burst=2)
+    acquired = []
+    threads = [threading.Thread(target=lambda: acquired.append(limiter.acquire(timeout=2))) for _ in range(10)]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert acquired == [True] * 10
+    assert time.monotonic() - started >= (10 - 2) / 50 * 0.9
+
+
+def test_batch_prices_concurrently_in_input_order(db):
+    gemini = FakeGemini(delay=0.05)
+    pricer = BatchPricer(db, gemini, max_workers=3, requests_per_second=1000, burst=10)
+    items = [LineItem("Red Oak", '5"', str(10000 + i), 100) for i in range(6)]
+    progress = []
+
+    results = pricer.price(items, _catalog(), on_progress=lambda done, total: progress.append((done, total)))
+
+    assert [r["zip_code"] for r in results] == [item.zip_code for item in items]
+    assert all(r["source"] == "ai" and r["selling_price"] == 6.0 and r["total"] == 600.0 for r in results)
+    assert 1 < gemini.max_in_flight <= 3
+    assert progress[0] == (0, 6) and progress[-1] == (6, 6)
+
+
+def test_identical_requests_are_priced_once(db):
+    gemini = FakeGemini()
+    pricer = BatchPricer(db, gemini, requests_per_second=1000)
+    items = [LineItem("Red Oak", '5"', "10001", 100), LineItem("Red Oak", '5"', " 10001 ", 250),
+             LineItem("White Oak", '7"', "10001", 100)]
+
+    results = pricer.price(items, _catalog())
+    assert len(gemini.calls) == 2
+    assert [r["total"] for r in results] == [600.0, 1500.0, 900.0]
+
+
+def test_unpriceable_items_fall_back_or_report_errors(db):
+    gemini = FakeGemini(fail_zip="20002", empty_zip="30003")
+    pricer = BatchPricer(db, gemini, requests_per_second=1000)
+    items = [
+        LineItem("Walnut", '5"', "10001", 10),
+        LineItem("Maple", '3"', "10001", 10),
+        LineItem("Red Oak", '5"', "", 10),
+        LineItem("Red Oak", '5"', "20002", 10),
+        LineItem("Red Oak", '5"', "30003", 10),
+    ]
+
+    results = pricer.price(items, _catalog())
+    assert [r["error"] for r in results] == [
+        "Product not found", "Invalid price data", "ZIP code required", "model overloaded", "No AI pricing available"]
+    assert [r["source"] for r in results] == ["unavailable", "unavailable", "standard", "standard", "standard"]
+    assert results[3]["selling_price"] == round(4.0 * 1.3, 2)
+    assert len(gemini.calls) == 2
+
+
+def test_slow_requests_time_out_with_standard_pricing(db):
+    gemini = FakeGemini(delay=1.0)
+    pricer = BatchPricer(db, gemini, max_workers=2, requests_per_second=1000, timeout_seconds=0.05)
+    started = time.monotonic()
+    results = pricer.price([LineItem("Red Oak", '5"', "10001", 10)], _catalog())
+
+    assert time.monotonic() - started < 0.5
+    assert (results[0]["error"], results[0]["source"]) == ("Timed out", "standard")
+
+
+def test_batches_are_capped(db):
+    pricer = BatchPricer(db, FakeGemini(), max_items=2)
+    with pytest.raises(ValueError):
+        pricer.price([LineItem("Red Oak", '5"', "10001", 1)] * 3, _catalog())
@@ -0,0 +1,41 @@
+from catalog import catalog_version, get_catalog
+
+
+def test_snapshot_indexes_products(db):
+    supplier_id = db.add_supplier("Acme Floors", "sales@acme.test")
+    db.add_product("Red Oak", "5", cost_price=4.0)
+    db.add_product("Red Oak", "3", cost_price=3.5)
+    db.add_product("White Oak", '7"', cost_price=6.0)
+    db.update_product_price("White Oak", 6.5, width='7"', supplier_id=supplier_id)
+
+    catalog = get_catalog(db)
+    assert len(catalog) == 3
+    assert catalog.names == ["Red Oak", "White Oak"]
+    assert catalog.widths("Red Oak") == ['3"', '5"']
+    assert catalog.get("Red Oak", '5"')["cost_price"] == 4.0
+    assert catalog.get("Red Oak")["width"] == '3"'
+    assert catalog.get("Maple") is None
+    assert [p["name"] for p in catalog.for_supplier(supplier_id)] == ["White Oak"]
+
+
+def test_snapshot_is_shared_until_a_product_write(db):
+    db.add_product("Red Oak", "5", cost_price=4.0)
+    catalog = get_catalog(db)
+    assert db.get_catalog() is catalog
+
+    version = catalog_version(db.db_path)
+    db.update_product_price("Red Oak", 4.25, width='5"')
+    assert catalog_version(db.db_path) == version + 1
+
+    refreshed = get_catalog(db)
+    assert refreshed is not catalog
+    assert refreshed.get("Red Oak", '5"')["cost_price"] == 4.25
+    # The old snapshot is left untouched for callers still holding it
+    assert catalog.get("Red Oak", '5"')["cost_price"] == 4.0
+
+    db.add_product("Maple", "3", cost_price=5.0)
+    assert get_catalog(db).widths("Maple") == ['3"']
+
+
+def test_empty_catalog_is_falsy(db):
+    assert not get_catalog(db)
@@ -0,0 +1,75 @@
+import threading
+
+from connection_pool import ConnectionPool, get_pool
+
+
+def _execute(pool, sql, params=(), write=False):
+    conn = pool.acquire(write=write)
+    try:
+        rows = conn.execute(sql, params).fetchall()
+        if write:
+            conn.commit()
+        return rows
+    finally:
+        conn.close()
+
+
+def test_readers_are_reused_and_bounded(db_path):
+    pool = ConnectionPool(db_path, pool_size=2)
+    leases = [pool.acquire() for _ in range(3)]
+    assert pool.get_stats()["readers_in_use"] == 3
+    for lease in leases:
+        lease.close()
+
+    stats = pool.get_stats()
+    assert stats["readers_in_use"] == 0
+    assert stats["idle"] == 2  # The third connection was closed, not pooled
+
+    pool.acquire().close()
+    assert pool.get_stats()["reused"] == 1
+    pool.close_all()
+
+
+def test_writer_is_shared_and_serialized(db_path):
+    pool = ConnectionPool(db_path)
+    _execute(pool, "CREATE TABLE t (n INTEGER)", write=True)
+
+    order = []
+    writer = pool.acquire(write=True)
+
+    def other_writer():
+        _execute(pool, "INSERT INTO t VALUES (2)", write=True)
+        order.append("second")
+
+    thread = threading.Thread(target=other_writer, daemon=True)
+    thread.start()
+    try:
+        thread.join(0.2)
+        assert order == []  # Blocked until the first lease is released
+        writer.execute("INSERT INTO t VALUES (1)")
+        writer.commit()
+        order.append("first")
+    finally:
+        writer.close()
+    thread.join(5)
+
+    assert order == ["first", "second"]
+    assert [row[0] for row in _execute(pool, "SELECT n FROM t ORDER BY rowid")] == [1, 2]
+    pool.close_all()
+
+
+def test_uncommitted_writes_are_rolled_back_on_release(db_path):
+    pool = ConnectionPool(db_path)
+    _execute(pool, "CREATE TABLE t (n INTEGER)", write=True)
+    conn = pool.acquire(write=True)
+    conn.execute("INSERT INTO t VALUES (1)")
+    conn.close()
+
+    assert _execute(pool, "SELECT COUNT(*) FROM t")[0][0] == 0
+    assert _execute(pool, "PRAGMA journal_mode")[0][0] == "wal"
+    pool.close_all()
+
+
+def test_get_pool_is_per_file(db_path, tmp_path):
+    assert get_pool(db_path) is get_pool(db_path)
+    assert get_pool(db_path) is not get_pool(str(tmp_path / "other.db"))
@@ -0,0 +1,55 @@
+import pytest
+
+from repositories.customer_repository import decode_cursor, encode_cursor
+from schemas.customer import CustomerCreate
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2024-05-01 10:00:00.000000", "ab12")
+    assert decode_cursor(cursor) == ("2024-05-01 10:00:00.000000", "ab12", None)
+    ranked = encode_cursor("2024-05-01 10:00:00.000000", "ab12", -1.25)
+    assert decode_cursor(ranked) == ("2024-05-01 10:00:00.000000", "ab12", -1.25)
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "bm90IGpzb24=", "WzFd"])
+def test_invalid_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def _add_customer(customer_repo, i, user_id=None):
+    return customer_repo.create(CustomerCreate(
+        first_name="Customer", last_name=str(i), full_name=f"Customer {i}",
+        email=f"customer{i}@example.com", phone=f"555-010{i}", zip_code="90210",
+    ), user_id=user_id)
+
+
+def test_keyset_pages_cover_every_customer_once(customer_repo):
+    created = [_add_customer(customer_repo, i) for i in range(7)]
+    # Give some rows the same timestamp so a page boundary falls inside a created_at tie
+    for customer in created[2:6]:
+        customer.created_at = created[2].created_at
+    customer_repo.db.commit()
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        page, cursor = customer_repo.list_customers_page(limit=3, cursor=cursor)
+        seen.extend(c.id for c in page)
+        pages += 1
+        if cursor is None:
+            break
+    assert pages == 3
+    assert sorted(seen) == sorted(c.id for c in created)
+    assert len(set(seen)) == len(seen)
+    assert customer_repo.count_customers() == 7
+
+
+def test_keyset_pages_apply_user_filter(customer_repo):
+    _add_customer(customer_repo, 1, user_id=1)
+    _add_customer(customer_repo, 2, user_id=2)
+    _add_customer(customer_repo, 3)
+
+    page, cursor = customer_repo.list_customers_page(limit=10, user_id=1)
+    assert cursor is None
+    assert sorted(c.full_name for c in page) == ["Customer 1", "Customer 3"]
+    assert customer_repo.count_customers(user_id=1) == 2
@@ -0,0 +1,94 @@
+import pytest
+from sqlalchemy import text
+
+from repositories.customer_repository import CustomerRepository, build_fts_query
+from schemas.customer import CustomerCreate, CustomerUpdate
+
+
+def _add(repo, full_name, phone="555-0100", zip_code="10001", notes=None):
+    first, _, last = full_name.partition(" ")
+    return repo.create(CustomerCreate(
+        first_name=first, last_name=last or first, full_name=full_name,
+        email=f"{first.lower()}.{(last or first).lower()}@example.com",
+        phone=phone, zip_code=zip_code, notes=notes,
+    ))
+
+
+def _names(customers):
+    return [c.full_name for c in customers]
+
+
+def _all_pages(repo, search_query, limit):
+    customers, cursor = repo.list_customers_page(limit=limit, search_query=search_query)
+    while cursor:
+        page, cursor = repo.list_customers_page(limit=limit, cursor=cursor, search_query=search_query)
+        customers += page
+    return customers
+
+
+def test_build_fts_query():
+    assert build_fts_query('smi "jo') == '"smi"* "jo"*'
+    assert build_fts_query("  --  ") is None
+
+
+def test_search_pages_are_ranked_best_match_first(customer_repo):
+    _add(customer_repo, "Alice Smith")
+    # Newer, but "smith" only appears in the low-weight notes
+    _add(customer_repo, "Bob Jones", notes="Referred by Smithson")
+
+    ranked, total = customer_repo.list_customers(search_query="smi")
+    assert (_names(ranked), total) == (["Alice Smith", "Bob Jones"], 2)
+    page, cursor = customer_repo.list_customers_page(limit=10, search_query="smi")
+    assert (_names(page), cursor) == (["Alice Smith", "Bob Jones"], None)
+    assert _names(_all_pages(customer_repo, "smi", limit=1)) == ["Alice Smith", "Bob Jones"]
+
+
+def test_cursor_from_another_listing_is_rejected(customer_repo):
+    _add(customer_repo, "Alice Smith")
+    _add(customer_repo, "Alan Smithers")
+    _, unranked = customer_repo.list_customers_page(limit=1)
+    with pytest.raises(ValueError):
+        customer_repo.list_customers_page(limit=1, cursor=unranked, search_query="smi")
+
+
+def test_search_matches_word_prefixes(customer_repo):
+    _add(customer_repo, "Alice Smith")
+    _add(customer_repo, "Malice Brown")
+    assert _names(customer_repo.list_customers_page(search_query="ali smi")[0]) == ["Alice Smith"]
+    assert _names(customer_repo.list_customers_page(search_query="ALICE")[0]) == ["Alice Smith"]
+
+
+def test_index_follows_updates_and_deletes(customer_repo):
+    customer = _add(customer_repo, "Alice Smith")
+    customer_repo.update(customer.id, CustomerUpdate(
+        full_name="Alice Walker", last_name="Walker", email="alice.walker@example.com"))
+    assert _names(customer_repo.list_customers_page(search_query="walker")[0]) == ["Alice Walker"]
+    assert customer_repo.list_customers_page(search_query="smith")[0] == []
+
+    customer_repo.db.execute(text("DELETE FROM customers"))
+    customer_repo.db.commit()
+    assert customer_repo.db.execute(
+        text("SELECT COUNT(*) FROM customers_fts WHERE customers_fts MATCH 'alice'")).scalar() == 0
+
+
+def test_digit_queries_match_phone_zip_and_text(customer_repo):
+    _add(customer_repo, "Alice Smith", phone="(555) 010-4477", zip_code="90210")
+    _add(customer_repo, "Bob Jones", phone="555-0199", notes="PO 778899")
+
+    def search(query):
+        return sorted(_names(customer_repo.list_customers_page(search_query=query)[0]))
+
+    # Phone digits match regardless of punctuation, ZIPs by prefix, other digits through the index
+    assert search("5550104477") == ["Alice Smith"]
+    assert search("555 01") == ["Alice Smith", "Bob Jones"]
+    assert search("902") == ["Alice Smith"]
+    assert search("778899") == ["Bob Jones"]
+
+
+def test_like_fallback_without_the_index(customer_repo, monkeypatch):
+    monkeypatch.setattr(CustomerRepository, "_has_fts", lambda self: False)
+    _add(customer_repo, "Alice Smith", phone="(555) 010-4477")
+    _add(customer_repo, "Bob Jones")
+
+    assert _names(customer_repo.list_customers_page(search_query="mith")[0]) == ["Alice Smith"]
+    assert _names(customer_repo.list_customers_page(search_query="5550104477")[0]) == ["Alice Smith"]
@@ -0,0 +1,230 @@
+import base64
+
+import pytest
+
+# email_handler imports the Gmail client libraries at module level
+for module in ("googleapiclient", "google_auth_httplib2", "google_auth_oauthlib", "httplib2"):
+    pytest.importorskip(module)
+
+from email_handler import EmailHandler  # noqa: E402
+from gmail_service import GmailService, StaleHistoryError  # noqa: E402
+
+
+def _reply(message_id, price):
+    return {"id": message_id, "thread_id": f"t-{message_id}", "subject": "Re: Price Update Request",
+            "sender": "Acme <sales@acme.test>", "body": f'Red Oak 5" is now ${price}/sqft', "date": "0"}
+
+
+class FakeGmail:
+    """GmailService stand-in: messages by id, a history response and ids that fail to fetch"""
+
+    def __init__(self, messages, history=None, unavailable=()):
+        self.messages = {m["id"]: m for m in messages}
+        self.history = history  # (message ids, latest history id); None means the checkpoint is stale
+        self.unavailable = set(unavailable)
+        self.fetched = []
+
+    def get_profile(self):
+        return {"emailAddress": "me@primeline.test", "historyId": "100"}
+
+    def list_history(self, start_history_id):
+        if self.history is None:
+            raise StaleHistoryError(start_history_id)
+        return self.history
+
+    def get_messages(self, message_ids, exclude_senders=None, subject_contains=None, failed_ids=None):
+        self.fetched.extend(message_ids)
+        messages = []
+        for message_id in message_ids:
+            if message_id in self.unavailable:
+                failed_ids.append(message_id)
+            elif message_id in self.messages:
+                messages.append(self.messages[message_id])
+        return messages
+
+    def check_inbox(self, query=None, max_results=10, exclude_senders=None, failed_ids=None):
+        return self.get_messages(list(self.messages), failed_ids=failed_ids)
+
+    def mark_as_read(self, message_id):
+        pass
+
+    def archive_message(self, message_id):
+        pass
+
+
+@pytest.fixture
+def handler(db):
+    db.add_product("Red Oak", "5", cost_price=4.0)
+    handler = EmailHandler.__new__(EmailHandler)
+    handler.db = db
+    handler.sent_request_thread_ids = set()
+    return handler
+
+
+def _run(handler, gmail):
+    handler.gmail = gmail
+    return handler.check_replies_and_save()
+
+
+def test_incremental_sync_advances_checkpoint(handler, db):
+    db.set_sync_state(EmailHandler.HISTORY_CHECKPOINT_KEY, "50")
+    gmail = FakeGmail([_reply("m1", 4.5)], history=(["m1"], "120"))
+
+    results = _run(handler, gmail)
+    assert [r["status"] for r in results] == ["processed"]
+    assert db.get_product("Red Oak", '5"')["standard_price"] == 4.5
+    assert db.get_sync_state(EmailHandler.HISTORY_CHECKPOINT_KEY) == "120"
+
+
+def test_unfetched_replies_are_retried_by_id(handler, db):
+    db.set_sync_state(EmailHandler.HISTORY_CHECKPOINT_KEY, "50")
+    _run(handler, FakeGmail([_reply("m1", 4.5), _reply("m2", 4.75)], history=(["m1", "m2"], "120"),
+                            unavailable=["m2"]))
+    assert db.get_sync_state(EmailHandler.HISTORY_CHECKPOINT_KEY) == "120"
+    assert handler._load_retry_ids() == {"m2": 1}
+
+    # m2 is no longer in the history window, but is fetched again by id
+    gmail = FakeGmail([_reply("m2", 4.75)], history=([], "130"))
+    _run(handler, gmail)
+    assert gmail.fetched == ["m2"]
+    assert db.get_product("Red Oak", '5"')["standard_price"] == 4.75
+    assert handler._load_retry_ids() == {}
+
+
+def test_retries_stop_after_max_attempts(handler, db, monkeypatch):
+    monkeypatch.setattr(EmailHandler, "MAX_REPLY_ATTEMPTS", 2)
+    db.set_sync_state(EmailHandler.HISTORY_CHECKPOINT_KEY, "50")
+    _run(handler, FakeGmail([], history=(["m1"], "120"), unavailable=["m1"]))
+    assert handler._load_retry_ids() == {"m1": 1}
+    _run(handler, FakeGmail([], history=([], "130"), unavailable=["m1"]))
+    assert handler._load_retry_ids() == {}
+
+
+def test_stale_checkpoint_falls_back_to_a_scan(handler, db):
+    db.set_sync_state(EmailHandler.HISTORY_CHECKPOINT_KEY, "50")
+    db.set_sync_state(EmailHandler.RETRY_MESSAGES_KEY, '{"m9": 1}')
+    gmail = FakeGmail([_reply("m1", 4.5)], history=None, unavailable=["m9"])
+
+    _run(handler, gmail)
+    assert db.get_product("Red Oak", '5"')["standard_price"] == 4.5
+    # Resumes from the history position read before the scan
+    assert db.get_sync_state(EmailHandler.HISTORY_CHECKPOINT_KEY) == "100"
+    # Earlier failures are still fetched by id and kept for retry
+    assert "m9" in gmail.fetched
+    assert handler._load_retry_ids() == {"m9": 2}
+
+
+class FakeBatch:
+    def __init__(self, callback, responses):
+        self.callback = callback
+        self.responses = responses
+        self.request_ids = []
+
+    def add(self, request, request_id):
+        self.request_ids.append(request_id)
+
+    def execute(self, http=None):
+        for request_id in self.request_ids:
+            response = self.responses.get(request_id)
+            self.callback(request_id, response, None if response else RuntimeError("404 Not Found"))
+
+
+class FakeListRequest:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self, http=None):
+        return self.result
+
+
+class FakeService:
+    """Just enough of the Gmail API client for messages().list and batched messages().get calls"""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.batches = []
+        self.formats = []
+
+    def list(self, userId, q=None, maxResults=None):
+        return FakeListRequest({"messages": [{"id": message_id} for message_id in self.responses][:maxResults]})
+
+    def new_batch_http_request(self, callback):
+        self.batches.append(FakeBatch(callback, self.responses))
+        return self.batches[-1]
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def get(self, userId, id, **kwargs):
+        self.formats.append(kwargs.get("format"))
+        return id
+
+
+def test_batch_get_reports_failed_fetches(monkeypatch):
+    service = GmailService.__new__(GmailService)
+    service.service = FakeService({"a": {"id": "a"}, "c": {"id": "c"}})
+    service._http = lambda: None
+    monkeypatch.setattr(GmailService, "BATCH_SIZE", 2)
+
+    failed = []
+    fetched = service._batch_get(["a", "b", "c"], failed, format="full")
+    assert sorted(fetched) == ["a", "c"]
+    assert failed == ["b"]
+    assert len(service.service.batches) == 2
+
+
+def _gmail_message(message_id, sender, subject, body):
+    data = base64.urlsafe_b64encode(body.encode()).decode()
+    return {"id": message_id, "threadId": f"t-{message_id}", "internalDate": "0",
+            "payload": {"headers": [{"name": "From", "value": sender}, {"name": "Subject", "value": subject}],
+                        "mimeType": "multipart/alternative",
+                        "parts": [{"mimeType": "text/plain", "body": {"data": data}}]}}
+
+
+def test_check_inbox_filters_on_headers_before_fetching_bodies(monkeypatch):
+    service = GmailService.__new__(GmailService)
+    service.service = FakeService({
+        "a": _gmail_message("a", "Acme <sales@acme.test>", "Re: Price Update Request", "Red Oak $4.50"),
+        "b": _gmail_message("b", "Me <ME@primeline.test>", "Price Update Request", "outgoing"),
+        "c": _gmail_message("c", "Beta <info@beta.test>", "Re: Price Update Request", "Maple $3.10"),
+    })
+    service._http = lambda: None
+    monkeypatch.setattr(GmailService, "BATCH_SIZE", 2)
+
+    messages = service.check_inbox("subject:price", max_results=10, exclude_senders=["me@primeline.test"])
+    assert [(m["id"], m["body"]) for m in messages] == [("a", "Red Oak $4.50"), ("c", "Maple $3.10")]
+    # Two metadata batches for three ids, then one full batch for the two kept messages
+    assert service.service.formats == ["metadata"] * 3 + ["full"] * 2
+    assert [b.request_ids for b in service.service.batches] == [["a", "b"], ["c"], ["a", "c"]]
+
+
+def test_reply_senders_are_resolved_once_per_run(handler, db, monkeypatch):
+    supplier_id = db.add_supplier("Acme Floors", "sales@acme.test")
+    lookups = []
+    lookup = db.get_supplier_by_email
+    monkeypatch.setattr(db, "get_supplier_by_email", lambda email: lookups.append(email) or lookup(email))
+
+    supplier_ids = {}
+    assert handler._supplier_id_for_sender("Acme <Sales@Acme.test>", supplier_ids) == supplier_id
+    assert handler._supplier_id_for_sender("sales@acme.test", supplier_ids) == supplier_id
+    assert handler._supplier_id_for_sender("Nobody <nobody@elsewhere.test>", supplier_ids) is None
+    assert lookups == ["sales@acme.test", "nobody@elsewhere.test"]
+
+
+def test_verify_uses_returned_rows_without_a_re_read(handler, db, monkeypatch):
+    rows = db.update_product_price("Red Oak", 4.5, '5"')
+    monkeypatch.setattr(db, "get_product", lambda *args: pytest.fail("rows were passed, no re-read expected"))
+
+    assert handler.verify_database_update("Red Oak", 4.5, '5"', rows=rows)
+    assert not handler.verify_database_update("Red Oak", 4.75, '5"', rows=rows)
+    assert not handler.verify_database_update("Red Oak", 4.5, '7"', rows=rows)
+    assert not handler.verify_database_update("Red Oak", 4.5, '5"', rows=[])
+
+
+def test_verify_reads_the_product_when_no_rows_are_given(handler, db):
+    db.update_product_price("Red Oak", 4.5, '5"')
+    assert handler.verify_database_update("Red Oak", 4.5, '5"')
+    assert not handler.verify_database_update("Walnut", 4.5, '5"')
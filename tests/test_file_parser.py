@@ -0,0 +1,107 @@
+import io
+
+import pandas as pd
+from openpyxl import Workbook
+
+from file_parser import (import_products_from_file, iter_csv_chunks, iter_excel_chunks, normalize_product_frame,
+                         normalize_widths, validate_file)
+
+HEADER = "name,width,standard_price,cost_price\n"
+
+
+def _upload(content, name="products.csv"):
+    upload = io.BytesIO(content.encode("utf-8") if isinstance(content, str) else content)
+    upload.name = name
+    return upload
+
+
+def test_normalize_widths():
+    raw = ["5", "5.0", "7 in", "3 inch", "6.5”", "4''", ' 2" ', "wide"]
+    assert normalize_widths(pd.Series(raw)).tolist() == ['5"', '5"', '7"', '3"', '6.5"', '4"', '2"', "wide"]
+
+
+def test_normalize_product_frame_splits_records_and_bad_rows():
+    df = pd.DataFrame({
+        "name": [" Red Oak ", "", "Maple", "Birch"],
+        "width": ["5", '3"', "wide", "4"],
+        "standard_price": ["4.5", "3", "5", "-1"],
+        "min_qty_discount": ["500", None, None, None],
+    }, index=[10, 11, 12, 13])
+
+    records, errors = normalize_product_frame(df)
+    assert records == [{"name": "Red Oak", "width": '5"', "standard_price": 4.5, "min_qty_discount": 500}]
+    assert errors == [
+        {"row": 12, "product": "Unknown", "error": "Missing name"},
+        {"row": 13, "product": "Maple", "error": 'Invalid width format (should be like: 5", 7")'},
+        {"row": 14, "product": "Birch", "error": "Price must be a number greater than 0"},
+    ]
+    assert normalize_product_frame(df.drop(columns="width"))[1] == [
+        {"error": "Missing required columns: width"}]
+
+
+def test_csv_chunks_keep_file_positions_across_blank_lines():
+    content = HEADER + "A,5,1\nB,5,1\n\nC,5,1\nD,5,1\nE,5,1\n"
+    chunks = list(iter_csv_chunks(_upload(content), chunksize=2))
+    assert [chunk.index.tolist() for chunk in chunks] == [[0, 1], [3], [4, 5]]
+    assert [name for chunk in chunks for name in chunk["name"]] == list("ABCDE")
+
+
+def test_xlsx_chunks_pad_short_rows_and_skip_blank_ones():
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Name", "Width", "Standard_Price", "Category"])
+    sheet.append(["Red Oak", "5", 4.5, "Solid"])
+    sheet.append([None, None, None, None])
+    sheet.append(["Maple", "3", 5.0])
+    upload = io.BytesIO()
+    workbook.save(upload)
+    upload.name = "products.xlsx"
+
+    [chunk] = list(iter_excel_chunks(upload))
+    assert chunk.index.tolist() == [0, 2]
+    assert chunk["category"].tolist()[0] == "Solid"
+    assert pd.isna(chunk["category"].tolist()[1])
+
+
+def test_import_numbers_bad_rows_by_file_position(db):
+    content = HEADER + "Red Oak,5,4.5,3\nMaple,wide,5,4\n\nBirch,4,,2\nAsh,6,6,5\n"
+    upload = _upload(content)
+    assert validate_file(upload, chunksize=2)[0] == 4
+
+    results = import_products_from_file(upload, db, chunksize=2)
+    assert (results["inserted"], results["skipped"], results["partial"]) == (2, 2, False)
+    assert [(error["row"], error["product"]) for error in results["errors"]] == [(2, "Maple"), (4, "Birch")]
+    assert db.get_product("Ash", '6"')["cost_price"] == 5.0
+
+
+def _reject_boom(db):
+    conn = db.get_connection(write=True)
+    try:
+        conn.execute('''CREATE TRIGGER reject_boom BEFORE INSERT ON products WHEN NEW.name = 'Boom'
+                        BEGIN SELECT RAISE(ABORT, 'boom'); END''')
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_failed_chunk_stops_a_partial_import(db):
+    _reject_boom(db)
+    content = HEADER + "Red Oak,5,4.5,3\nMaple,3,5,4\nBoom,5,1,1\nAsh,6,6,5\nBirch,4,2,1\n"
+    progress = []
+    results = import_products_from_file(_upload(content), db, chunksize=2, on_progress=progress.append)
+
+    assert (results["partial"], results["stopped_at_row"]) == (True, 3)
+    assert (results["inserted"], results["skipped"]) == (2, 2)
+    assert progress == [2]
+    assert results["errors"][-1]["row"] == 3
+    # The chunk holding the bad row is rolled back as a whole and later chunks are not read
+    assert db.get_product("Ash", '6"') is None
+    assert db.get_product("Birch", '4"') is None
+    assert db.get_product("Maple", '3"') is not None
+
+
+def test_failed_first_chunk_saves_nothing(db):
+    _reject_boom(db)
+    results = import_products_from_file(_upload(HEADER + "Boom,5,1,1\nAsh,6,6,5\n"), db, chunksize=2)
+    assert (results["partial"], results["stopped_at_row"], results["inserted"]) == (False, 1, 0)
+    assert results["errors"][-1]["error"] == "Import stopped here; nothing was saved"
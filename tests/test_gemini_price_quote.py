@@ -0,0 +1,126 @@
+import json
+
+import pytest
+
+# gemini_client imports the Gemini SDK at module level
+pytest.importorskip("google.generativeai")
+
+from gemini_client import GeminiClient  # noqa: E402
+from pricing_cache import PricingCache  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """generate_content stand-in that returns canned responses and records its calls"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls.append(kwargs)
+        return FakeResponse(self.responses.pop(0))
+
+
+class FakeLimiter:
+    def __init__(self, allow=True):
+        self.allow = allow
+        self.timeouts = []
+
+    def acquire(self, timeout=None):
+        self.timeouts.append(timeout)
+        return self.allow
+
+
+def _response(drop=(), **overrides):
+    result = {
+        "verified_location": "Austin, TX",
+        "location_confirmed": True,
+        "recommended_price_range": {"low": 5.0, "high": 7.0, "optimal": 6.0},
+        "market_factors": ["new construction"],
+        "demand_indicator": "high",
+        "analysis_summary": "Pricing analysis for 78701",
+        "selling_price": 6.1,
+        "margin": 35.5,
+        "confidence": 0.9,
+    }
+    result.update(overrides)
+    for key in drop:
+        del result[key]
+    return "```json\n" + json.dumps(result) + "\n```"
+
+
+def _client(model, cache=None):
+    client = GeminiClient.__new__(GeminiClient)
+    client.api_key, client.cache, client.init_error = "AI-test", cache, None
+    client.model, client.initialized = model, True
+    return client
+
+
+def test_price_quote_returns_pricing_and_market_fields():
+    model = FakeModel(_response())
+    quote = _client(model).price_quote(4.5, "Red Oak", '5"', "78701", timeout=20)
+
+    assert quote["selling_price"] == 6.1
+    assert quote["confidence"] == 0.9
+    assert quote["suggested_dealer_price"] == round(4.5 * 1.4, 2)  # Defaulted when missing
+    assert quote["verified_location"] == "Austin, TX"
+    assert quote["demand_indicator"] == "high"
+    assert model.calls == [{"request_options": {"timeout": 20}}]
+
+
+@pytest.mark.parametrize("response", [
+    "not json at all",
+    _response(drop=["verified_location"]),
+    _response(location_confirmed=False),
+    _response(recommended_price_range={"low": 7.0, "high": 5.0, "optimal": 6.0}),
+    _response(recommended_price_range={"low": 5.0, "high": 7.0}),
+    _response(selling_price=4.0),  # Below base cost
+    _response(selling_price="n/a"),
+    _response(confidence=1.5),
+])
+def test_price_quote_rejects_invalid_responses(response):
+    assert _client(FakeModel(response)).price_quote(4.5, "Red Oak", '5"', "78701") == {}
+
+
+def test_price_quote_is_cached_per_request(db):
+    cache = PricingCache(db.db_path)
+    model = FakeModel(_response(), _response(selling_price=6.5))
+    client = _client(model, cache)
+
+    first = client.price_quote(4.5, "Red Oak", '5"', "78701")
+    assert client.price_quote(4.5, "Red Oak", '5"', "78701") == first
+    assert len(model.calls) == 1
+    assert client.price_quote(4.5, "Red Oak", '7"', "78701")["selling_price"] == 6.5
+
+
+def test_invalid_responses_are_not_cached(db):
+    cache = PricingCache(db.db_path)
+    model = FakeModel(_response(location_confirmed=False), _response())
+    client = _client(model, cache)
+
+    assert client.price_quote(4.5, "Red Oak", '5"', "78701") == {}
+    assert client.price_quote(4.5, "Red Oak", '5"', "78701")["selling_price"] == 6.1
+    assert len(model.calls) == 2
+
+
+def test_rate_limiter_gates_model_calls_but_not_cache_hits(db):
+    model = FakeModel(_response())
+    client = _client(model, PricingCache(db.db_path))
+
+    assert client.price_quote(4.5, "Red Oak", '5"', "78701", rate_limiter=FakeLimiter(allow=False), timeout=3) == {}
+    assert model.calls == []
+    limiter = FakeLimiter()
+    client.price_quote(4.5, "Red Oak", '5"', "78701", rate_limiter=limiter, timeout=3)
+    client.price_quote(4.5, "Red Oak", '5"', "78701", rate_limiter=limiter, timeout=3)
+    assert limiter.timeouts == [3]
+
+
+def test_price_quote_without_a_model_returns_empty():
+    client = _client(None)
+    client.initialized = False
+    assert client.price_quote(4.5, "Red Oak", '5"', "78701") == {}
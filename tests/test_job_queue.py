@@ -0,0 +1,115 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from job_queue import DONE, FAILED, PENDING, RUNNING, JobQueue, JobWorkerPool
+
+
+@pytest.fixture
+def queue(db):
+    return JobQueue(db.db_path, backoff_seconds=0)
+
+
+def _job_row(queue, job_id):
+    conn = queue.pool.acquire()
+    try:
+        return dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+    finally:
+        conn.close()
+
+
+def test_enqueue_dedupes_and_claims_in_order(queue):
+    first = queue.enqueue("email", {"to": "a@example.com"}, dedupe_key="weekly:1")
+    assert queue.enqueue("email", {"to": "b@example.com"}, dedupe_key="weekly:1") is None
+    second, duplicate = queue.enqueue_many([("sync", None, None), ("email", {}, "weekly:1")])
+    assert duplicate is None
+    queue.enqueue("later", run_at=datetime.now(timezone.utc) + timedelta(hours=1))
+
+    job = queue.claim("w1")
+    assert (job.id, job.job_type, job.payload, job.attempts, job.worker_id) == \
+        (first, "email", {"to": "a@example.com"}, 1, "w1")
+    assert queue.claim("w2").id == second
+    assert queue.claim("w3") is None
+    assert not queue.has_due_jobs()
+    assert queue.get_stats() == {PENDING: 1, RUNNING: 2, DONE: 0, FAILED: 0}
+
+    assert queue.complete(job)
+    assert _job_row(queue, first)["status"] == DONE
+
+
+def test_failures_retry_until_attempts_run_out(queue):
+    job_id = queue.enqueue("sync", max_attempts=2)
+
+    job = queue.claim("w1")
+    assert queue.fail(job, "timeout") is True
+    row = _job_row(queue, job_id)
+    assert (row["status"], row["last_error"], row["locked_by"]) == (PENDING, "timeout", None)
+
+    job = queue.claim("w1")
+    assert job.attempts == 2
+    assert queue.fail(job, "timeout again") is False
+    assert _job_row(queue, job_id)["status"] == FAILED
+
+
+def test_backoff_doubles_and_is_capped(db):
+    queue = JobQueue(db.db_path, backoff_seconds=10, max_backoff_seconds=60)
+    assert 8 <= queue.backoff(1) <= 12
+    assert 16 <= queue.backoff(2) <= 24
+    assert queue.backoff(10) <= 72
+
+
+def _age_heartbeat(queue, job_id, seconds):
+    stamp = (datetime.now(timezone.utc) - timedelta(seconds=seconds)).strftime('%Y-%m-%d %H:%M:%S')
+    conn = queue.pool.acquire(write=True)
+    try:
+        conn.execute("UPDATE jobs SET heartbeat_at = ?, locked_at = ? WHERE id = ?", (stamp, stamp, job_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_heartbeat_keeps_running_jobs_from_recovery(queue):
+    job_id = queue.enqueue("sync")
+    job = queue.claim("w1")
+    _age_heartbeat(queue, job_id, 600)
+
+    assert queue.heartbeat(["w1", "w2"]) == 1
+    assert queue.recover_stale(300) == 0
+    assert queue.complete(job)
+
+
+def test_recovered_jobs_are_fenced_from_their_old_worker(queue):
+    job_id = queue.enqueue("sync")
+    stale = queue.claim("w1")
+    _age_heartbeat(queue, job_id, 600)
+    assert queue.recover_stale(300) == 1
+    assert _job_row(queue, job_id)["status"] == PENDING
+
+    retry = queue.claim("w2")
+    assert retry.attempts == 2
+    # The first worker finishing late must not touch the new attempt
+    assert queue.complete(stale) is False
+    assert queue.fail(stale, "late") is None
+    assert _job_row(queue, job_id)["locked_by"] == "w2"
+    assert queue.complete(retry)
+
+
+def test_worker_pool_runs_jobs(queue):
+    seen = []
+    workers = JobWorkerPool(queue, {"count": lambda payload: seen.append(payload["n"])},
+                            workers=2, poll_seconds=0.05)
+    workers.start()
+    try:
+        queue.enqueue_many([("count", {"n": n}, None) for n in range(3)])
+        unhandled = queue.enqueue("unknown")
+        deadline = time.monotonic() + 5
+        while workers.stats["completed"] + workers.stats["failed"] < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        workers.stop()
+
+    assert sorted(seen) == [0, 1, 2]
+    assert (workers.stats["completed"], workers.stats["failed"]) == (3, 1)
+    # Jobs without a handler are not retried
+    assert _job_row(queue, unhandled)["status"] == FAILED
@@ -0,0 +1,61 @@
+import hashlib
+import threading
+
+import pytest
+
+from password_hasher import ALGORITHM, LEGACY_ITERATIONS, HasherBusy, PasswordHasher, parse_hash
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(iterations=1000, workers=1)
+    yield hasher
+    hasher._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def test_hash_encodes_parameters_and_verifies(hasher):
+    stored = hasher.hash("s3cret")
+    parsed = parse_hash(stored)
+    assert (parsed.algorithm, parsed.iterations) == (ALGORITHM, 1000)
+    assert stored != hasher.hash("s3cret")  # fresh salt every time
+    assert hasher.verify("s3cret", stored)
+    assert not hasher.verify("wrong", stored)
+
+
+def test_legacy_hashes_verify_and_need_rehash(hasher):
+    salt = "ab" * 16
+    legacy = f"{salt}${hashlib.pbkdf2_hmac('sha256', b's3cret', salt.encode(), LEGACY_ITERATIONS).hex()}"
+    assert parse_hash(legacy).iterations == LEGACY_ITERATIONS
+    assert PasswordHasher.verify_now("s3cret", legacy)
+    assert hasher.needs_rehash(legacy)
+
+
+def test_needs_rehash_on_changed_iterations(hasher):
+    assert not hasher.needs_rehash(hasher.hash_now("s3cret"))
+    assert PasswordHasher(iterations=2000).needs_rehash(hasher.hash_now("s3cret"))
+    assert hasher.needs_rehash("garbage")
+
+
+def test_unknown_formats_do_not_verify():
+    assert parse_hash("a$b$c") is None
+    assert parse_hash(None) is None
+    assert not PasswordHasher.verify_now("s3cret", "not-a-hash")
+
+
+def test_busy_pool_raises_hasher_busy(hasher):
+    release = threading.Event()
+    hasher._executor.submit(release.wait, 5)
+    hasher.timeout_seconds = 0.05
+    try:
+        with pytest.raises(HasherBusy):
+            hasher.verify("s3cret", hasher.hash_now("s3cret"))
+    finally:
+        release.set()
+
+
+def test_rehash_async_passes_new_hash(hasher):
+    done = threading.Event()
+    result = []
+    hasher.rehash_async("s3cret", lambda stored: (result.append(stored), done.set()))
+    assert done.wait(5)
+    assert PasswordHasher.verify_now("s3cret", result[0])
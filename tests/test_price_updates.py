@@ -0,0 +1,23 @@
+def test_update_returns_the_updated_row(db):
+    supplier_id = db.add_supplier("Acme Floors", "sales@acme.test")
+    db.add_product("Red Oak", "5", cost_price=4.0)
+    db.add_product("Red Oak", "7", cost_price=5.0)
+    other_width = db.get_product("Red Oak", '7"')
+
+    rows = db.update_product_price("Red Oak", 4.5, '5"', discount_percentage=10, min_qty=500,
+                                   promotion_name="Spring", supplier_id=supplier_id)
+    assert [(r["name"], r["width"], r["standard_price"], r["supplier_id"]) for r in rows] == \
+        [("Red Oak", '5"', 4.5, supplier_id)]
+    assert rows[0]["discount_percentage"] == 10
+    assert db.get_product("Red Oak", '7"')["standard_price"] == other_width["standard_price"]
+
+
+def test_update_without_width_changes_nothing(db):
+    db.add_product("Red Oak", "5", cost_price=4.0)
+    db.add_product("Red Oak", "7", cost_price=5.0)
+    assert db.update_product_price("Red Oak", 9.99) == []
+    assert [db.get_product("Red Oak", w)["cost_price"] for w in ('5"', '7"')] == [4.0, 5.0]
+
+
+def test_update_of_unknown_product_returns_no_rows(db):
+    assert db.update_product_price("Walnut", 4.5, '5"') == []
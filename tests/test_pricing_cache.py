@@ -0,0 +1,100 @@
+import time
+
+from pricing_cache import PricingCache, make_cache_key
+
+
+def test_cache_key_normalizes_request():
+    assert make_cache_key("quote", " 12345 ", "Red Oak", '5"', 4.5) == \
+        make_cache_key("quote", "12345", "red oak ", '5"', 4.499)
+    assert make_cache_key("quote", "12345", "Red Oak", '5"', 4.5) != \
+        make_cache_key("market", "12345", "Red Oak", '5"', 4.5)
+
+
+def test_put_get_and_stats(db):
+    cache = PricingCache(db.db_path)
+    assert cache.get("quote", "12345", "Red Oak", '5"', 4.5) is None
+    cache.put("quote", "12345", "Red Oak", '5"', 4.5, {"selling_price": 6.1})
+    assert cache.get("quote", "12345", "Red Oak", '5"', 4.5) == {"selling_price": 6.1}
+
+    stats = cache.get_stats()
+    assert stats["entries"] == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_empty_payloads_are_not_cached(db):
+    cache = PricingCache(db.db_path)
+    cache.put("quote", "12345", "Red Oak", '5"', 4.5, {})
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_expired_entries_miss(db):
+    cache = PricingCache(db.db_path, ttl_seconds=60)
+    cache.put("quote", "12345", "Red Oak", '5"', 4.5, {"selling_price": 6.1})
+    cache.ttl_seconds = -1
+    assert cache.get("quote", "12345", "Red Oak", '5"', 4.5) is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(db):
+    cache = PricingCache(db.db_path, max_entries=2, flush_interval=3600)
+    for zip_code in ("11111", "22222"):
+        cache.put("quote", zip_code, "Red Oak", '5"', 4.5, {"zip": zip_code})
+        time.sleep(0.01)
+    cache.get("quote", "11111", "Red Oak", '5"', 4.5)  # Now more recent than 22222, only held in memory
+    cache.put("quote", "33333", "Red Oak", '5"', 4.5, {"zip": "33333"})
+
+    assert cache.get("quote", "22222", "Red Oak", '5"', 4.5) is None
+    assert cache.get("quote", "11111", "Red Oak", '5"', 4.5) == {"zip": "11111"}
+    assert cache.evictions == 1
+
+
+def test_price_changes_invalidate_cached_pricing(db):
+    db.add_product("Red Oak", '5"', "Oak", "Hardwood", 3.5, 4.5, None, None, None, None, None, None, None)
+    cache = PricingCache(db.db_path)
+    cache.put("quote", "12345", "Red Oak", '5"', 4.5, {"selling_price": 6.1})
+    cache.put("quote", "12345", "Red Oak", '7"', 4.5, {"selling_price": 6.4})
+
+    assert db.update_product_price("Red Oak", 4.75, '5"')
+    assert cache.get("quote", "12345", "Red Oak", '5"', 4.5) is None
+    assert cache.get("quote", "12345", "Red Oak", '7"', 4.5) == {"selling_price": 6.4}
+
+
+def _access_row(cache, zip_code):
+    key = make_cache_key("quote", zip_code, "Red Oak", '5"', 4.5)
+    conn = cache.pool.acquire()
+    try:
+        return conn.execute("SELECT last_access, hits FROM ai_pricing_cache WHERE key = ?", (key,)).fetchone()
+    finally:
+        conn.close()
+
+
+def test_hits_are_written_in_one_batch(db):
+    cache = PricingCache(db.db_path, flush_interval=3600)
+    cache.put("quote", "12345", "Red Oak", '5"', 4.5, {"selling_price": 6.1})
+    stored_access = _access_row(cache, "12345")["last_access"]
+    time.sleep(0.01)
+    for _ in range(3):
+        assert cache.get("quote", "12345", "Red Oak", '5"', 4.5) == {"selling_price": 6.1}
+
+    assert _access_row(cache, "12345")["hits"] == 0  # Nothing written on the read path
+    assert cache.flush_access() == 1
+    row = _access_row(cache, "12345")
+    assert row["hits"] == 3
+    assert row["last_access"] > stored_access
+    assert cache.flush_access() == 0
+
+
+def test_failed_flush_keeps_pending_hits(db, monkeypatch):
+    cache = PricingCache(db.db_path, flush_interval=3600)
+    cache.put("quote", "12345", "Red Oak", '5"', 4.5, {"selling_price": 6.1})
+    cache.get("quote", "12345", "Red Oak", '5"', 4.5)
+
+    def fail(c, pending):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(cache, "_write_access", fail)
+    assert cache.flush_access() == 0
+    monkeypatch.undo()
+    cache.get("quote", "12345", "Red Oak", '5"', 4.5)
+    assert cache.flush_access() == 1
+    assert _access_row(cache, "12345")["hits"] == 2
@@ -0,0 +1,63 @@
+import json
+import uuid
+
+from schemas.customer import CustomerCreate
+
+RED_OAK = json.dumps({"product": "Red Oak", "width": '5"'})
+
+
+def _add_customer(db, customer_id, full_name, business_name=None, is_deleted=0):
+    conn = db.get_connection(write=True)
+    try:
+        conn.execute("""INSERT INTO customers (id, full_name, business_name, email, is_deleted)
+                        VALUES (?, ?, ?, ?, ?)""",
+                     (customer_id, full_name, business_name, f"{customer_id}@example.test", is_deleted))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _keys(db, quote_id):
+    conn = db.get_connection()
+    try:
+        row = conn.execute("SELECT customer_id, product_id FROM quotes WHERE id = ?", (quote_id,)).fetchone()
+        return row["customer_id"], row["product_id"]
+    finally:
+        conn.close()
+
+
+def test_create_quote_resolves_customer_and_product(db):
+    db.add_product("Red Oak", "5", cost_price=4.0)
+    product_id = db.get_product("Red Oak", '5"')["id"]
+    _add_customer(db, "old", "Jane Doe", is_deleted=1)
+    _add_customer(db, "jane", "Jane Doe")
+    _add_customer(db, "acme", "Bob Builder", business_name="Acme Floors")
+
+    assert _keys(db, db.create_quote("Jane Doe", "90210", RED_OAK, 100, 500.0)) == ("jane", product_id)
+    assert _keys(db, db.create_quote("Acme Floors", "90210", RED_OAK, 100, 500.0)) == ("acme", product_id)
+    assert _keys(db, db.create_quote("Walk-in", "90210", "not json", 100, 500.0)) == (None, None)
+
+
+def test_create_quote_keeps_ids_passed_by_the_caller(db):
+    customer_id = uuid.uuid4()
+    quote_id = db.create_quote("Jane Doe", "90210", RED_OAK, 100, 500.0, customer_id=customer_id, product_id=7)
+    assert _keys(db, quote_id) == (customer_id.hex, 7)
+
+
+def test_update_quote_relinks_the_product(db):
+    db.add_product("Red Oak", "5", cost_price=4.0)
+    db.add_product("Maple", "3", cost_price=3.0)
+    quote_id = db.create_quote("Jane Doe", "90210", RED_OAK, 100, 500.0)
+
+    db.update_quote(quote_id, 450.0, product_specs=json.dumps({"product": "Maple", "width": '3"'}))
+    assert _keys(db, quote_id)[1] == db.get_product("Maple", '3"')["id"]
+
+
+def test_new_customers_pick_up_their_earlier_quotes(db, customer_repo):
+    earlier = db.create_quote("Jane Doe", "90210", RED_OAK, 100, 500.0)
+    other = db.create_quote("Someone Else", "90210", RED_OAK, 100, 500.0)
+
+    customer = customer_repo.create(CustomerCreate(first_name="Jane", last_name="Doe", full_name="Jane Doe",
+                                                   email="jane@example.com", phone="555-0100", zip_code="90210"))
+    assert _keys(db, earlier)[0] == customer.id.hex
+    assert _keys(db, other)[0] is None
@@ -0,0 +1,75 @@
+import json
+
+import quote_rollups
+
+SPECS = json.dumps({"product": "Red Oak", "width": '5"'})
+
+
+def _rollups(db):
+    """Rollup rows keyed by their dimensions, metrics only"""
+    return {
+        tuple(row[d] for d in quote_rollups.ROLLUP_DIMENSIONS): tuple(row[m] for m in quote_rollups.ROLLUP_METRICS)
+        for row in db.get_quote_rollups()
+    }
+
+
+def test_quotes_are_rolled_up_by_dimension(db):
+    db.add_product("Red Oak", "5", category="Hardwood – Solid", cost_price=4.0)
+    db.create_quote("Jane Doe", "90210", SPECS, 1000, 5000.0, user_id=1)
+    db.create_quote("Jane Doe", "90210", SPECS, 500, 3000.0, user_id=1)
+
+    [row] = db.get_quote_rollups()
+    assert (row["product"], row["width"], row["category"], row["zip_code"], row["status"]) == \
+        ("Red Oak", '5"', "Hardwood – Solid", "90210", "pending_admin_approval")
+    assert row["quote_count"] == 2
+    assert row["total_quantity"] == 1500
+    assert row["total_price"] == 8000.0
+    assert row["sum_price_per_sqft"] == 5.0 + 6.0
+
+
+def test_status_and_quote_edits_move_the_contribution(db):
+    first = db.create_quote("Jane Doe", "90210", SPECS, 1000, 5000.0, user_id=1)
+    db.create_quote("Jane Doe", "90210", SPECS, 500, 3000.0, user_id=1)
+
+    db.update_quote_status(first, "approved")
+    by_status = {row["status"]: row["quote_count"] for row in db.get_quote_rollups()}
+    assert by_status == {"pending_admin_approval": 1, "approved": 1}
+
+    db.update_quote(first, 4500.0, quantity=900, location="10001")
+    [approved] = [row for row in db.get_quote_rollups() if row["status"] == "approved"]
+    assert (approved["zip_code"], approved["total_quantity"], approved["total_price"]) == ("10001", 900, 4500.0)
+
+    # Rows whose last quote moved away are removed rather than left at zero
+    db.update_quote_status(first, "rejected", reason="Too expensive")
+    assert {row["status"] for row in db.get_quote_rollups()} == {"pending_admin_approval", "rejected"}
+
+
+def test_incremental_rollups_match_a_rebuild(db):
+    db.add_product("Red Oak", "5", cost_price=4.0)
+    quote_ids = [db.create_quote(f"Customer {i}", str(90210 + i % 2), SPECS, 100 * (i + 1), 450.0 * (i + 1),
+                                 user_id=i % 3) for i in range(6)]
+    db.create_quote("No Specs", "10001", "not json", 0, 0.0)
+    db.update_quote_status(quote_ids[0], "approved")
+    db.update_quote(quote_ids[1], 999.0, product_specs=json.dumps({"product": "Maple", "width": '3"'}))
+
+    incremental = _rollups(db)
+    db.rebuild_quote_rollups()
+    assert _rollups(db) == incremental
+
+
+def test_link_customer_quotes_moves_rollups_to_the_customer(db):
+    db.create_quote("Jane Doe", "", SPECS, 1000, 5000.0)
+    assert {row["customer_type"] for row in db.get_quote_rollups()} == {"Unknown"}
+
+    conn = db.get_connection(write=True)
+    try:
+        c = conn.cursor()
+        c.execute("""INSERT INTO customers (id, full_name, email, zip_code, customer_type)
+                     VALUES ('c1', 'Jane Doe', 'jane@example.test', '90210', 'contractor')""")
+        assert quote_rollups.link_customer_quotes(c, "c1", ["Jane Doe", None]) == 1
+        conn.commit()
+    finally:
+        conn.close()
+
+    [row] = db.get_quote_rollups()
+    assert (row["zip_code"], row["customer_type"], row["quote_count"]) == ("90210", "contractor", 1)
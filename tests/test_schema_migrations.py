@@ -0,0 +1,114 @@
+import sqlite3
+
+import pytest
+
+from schema_migrations import MIGRATIONS, apply_migrations, get_schema_version
+
+
+def _connect(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _apply_up_to(conn, version):
+    get_schema_version(conn)
+    for step in MIGRATIONS:
+        if step.version > version:
+            break
+        conn.execute("BEGIN")
+        step.upgrade(conn.cursor())
+        conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (step.version, step.name))
+        conn.commit()
+
+
+def test_versions_are_unique_and_increasing():
+    versions = [step.version for step in MIGRATIONS]
+    assert versions == sorted(set(versions))
+
+
+def test_fresh_database_is_migrated_once(db_path):
+    conn = _connect(db_path)
+    try:
+        assert apply_migrations(conn) == len(MIGRATIONS)
+        assert get_schema_version(conn) == MIGRATIONS[-1].version
+        assert apply_migrations(conn) == 0
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert {"users", "products", "quotes", "quote_rollups_daily", "jobs"} <= tables
+    finally:
+        conn.close()
+
+
+def test_failed_migration_is_rolled_back(db_path, monkeypatch):
+    conn = _connect(db_path)
+    try:
+        _apply_up_to(conn, MIGRATIONS[-2].version)
+
+        def broken(c):
+            c.execute("CREATE TABLE half_done (id INTEGER)")
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr("schema_migrations.MIGRATIONS", MIGRATIONS[:-1] + [MIGRATIONS[-1]._replace(upgrade=broken)])
+        with pytest.raises(RuntimeError):
+            apply_migrations(conn)
+        assert get_schema_version(conn) == MIGRATIONS[-2].version
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+    finally:
+        conn.close()
+
+
+def test_duplicate_products_are_backed_up_and_quotes_repointed(db_path):
+    conn = _connect(db_path)
+    try:
+        _apply_up_to(conn, 4)
+        conn.execute("ALTER TABLE quotes ADD COLUMN product_id INTEGER")
+        for _ in range(3):
+            conn.execute("INSERT INTO products (name, width) VALUES ('Oak', '5\"')")
+        conn.execute("INSERT INTO products (name, width) VALUES ('Oak', '7\"')")
+        conn.execute('''INSERT INTO quotes (customer_name, location, product_specs, product_id)
+                        VALUES ('Acme', '12345', '{}', 1)''')
+        conn.commit()
+
+        apply_migrations(conn)
+
+        assert [tuple(row) for row in conn.execute("SELECT id, width FROM products ORDER BY id")] == \
+            [(3, '5"'), (4, '7"')]
+        assert [tuple(row) for row in conn.execute(
+            "SELECT id, merged_into_id FROM products_duplicates_backup ORDER BY id")] == [(1, 3), (2, 3)]
+        assert conn.execute("SELECT product_id FROM quotes").fetchone()[0] == 3
+    finally:
+        conn.close()
+
+
+def test_quote_keys_are_backfilled_from_names_and_specs(db_path):
+    conn = _connect(db_path)
+    try:
+        _apply_up_to(conn, 6)
+        conn.execute("INSERT INTO products (id, name, width) VALUES (1, 'Red Oak', '5\"')")
+        conn.executemany("INSERT INTO customers (id, full_name, business_name, email, is_deleted) VALUES (?, ?, ?, ?, ?)", [
+            ("old", "Jane Doe", None, "old@example.com", 1),
+            ("jane", "Jane Doe", None, "jane@example.com", 0),
+            ("bob", "Bob Builder", "Acme Floors", "bob@example.com", 0),
+            ("acme", "Acme Floors", None, "acme@example.com", 0),
+            ("carol", "Carol King", "King Flooring", "carol@example.com", 0),
+        ])
+        conn.executemany("INSERT INTO quotes (customer_name, location, product_specs) VALUES (?, '90210', ?)", [
+            ("Jane Doe", '{"product": "Red Oak", "width": "5\\""}'),
+            ("Acme Floors", '{"product": "Red Oak", "width": "7\\""}'),
+            ("Bob Builder", "not json"),
+            ("King Flooring", '{"product": "Red Oak", "width": "5\\""}'),
+            ("Walk-in", '{"product": "Maple"}'),
+        ])
+        conn.commit()
+
+        apply_migrations(conn)
+
+        assert [tuple(row) for row in conn.execute("SELECT customer_id, product_id FROM quotes ORDER BY id")] == [
+            ("jane", 1),     # Active customer preferred over a deleted one with the same name
+            ("acme", None),  # Full-name match wins over a business-name match; no 7" product
+            ("bob", None),
+            ("carol", 1),    # Business-name fallback
+            (None, None),
+        ]
+    finally:
+        conn.close()
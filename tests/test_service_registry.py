@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from service_registry import ServiceRegistry
+
+
+def test_services_are_built_once():
+    registry = ServiceRegistry()
+    calls = []
+    registry.register("db", lambda: calls.append(1) or object())
+    registry.register("db", lambda: pytest.fail("re-registering must not replace the factory"))
+
+    assert not registry.is_ready("db")
+    assert registry.get("db") is registry.get("db")
+    assert calls == [1]
+    assert registry.is_ready("db")
+    with pytest.raises(KeyError):
+        registry.get("missing")
+
+
+def test_concurrent_callers_share_one_construction():
+    registry = ServiceRegistry()
+    calls = []
+
+    def slow_factory():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    registry.register("gemini", slow_factory)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("gemini"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls == [1]
+    assert len({id(r) for r in results}) == 1
+
+
+def test_failures_are_cached_until_invalidated():
+    registry = ServiceRegistry()
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("API unreachable")
+        return "client"
+
+    registry.register("gemini", flaky)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            registry.get("gemini")
+    assert len(attempts) == 1  # Reruns do not hammer a failing backend
+
+    registry.invalidate("gemini")  # What the Retry button does
+    assert registry.get("gemini") == "client"
+    assert len(attempts) == 2
+
+
+def test_invalidate_rebuilds_one_or_all_services():
+    registry = ServiceRegistry()
+    registry.register("a", object)
+    registry.register("b", object)
+    a, b = registry.get("a"), registry.get("b")
+
+    registry.invalidate("a")
+    assert registry.get("a") is not a
+    assert registry.get("b") is b
+    registry.invalidate()
+    assert registry.get("b") is not b
+    registry.invalidate("unknown")  # Unregistered names are ignored
+
+
+def test_replace_swaps_the_factory_and_drops_the_instance():
+    registry = ServiceRegistry()
+    registry.register("pricer", lambda: "without model")
+    assert registry.get("pricer") == "without model"
+    registry.register("pricer", lambda: "with model", replace=True)
+    assert registry.get("pricer") == "with model"
+
+
+def test_warm_up_caches_errors_for_the_next_get():
+    registry = ServiceRegistry()
+    registry.register("ok", lambda: "ready")
+    registry.register("broken", lambda: 1 / 0)
+
+    thread = registry.warm_up()
+    thread.join()
+    assert registry.is_ready("ok")
+    with pytest.raises(ZeroDivisionError):
+        registry.get("broken")
+    assert registry.warm_up() is None  # Everything already built or failed
@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+
+from session_cache import ActivityFlusher, SessionCache, UserCache, role_flags
+
+LATER = datetime.now() + timedelta(hours=1)
+
+
+def test_session_cache_ttl_and_expiry(db_path):
+    cache = SessionCache(db_path, ttl_seconds=60, flush_interval=3600)
+    cache.put("fresh", {"user_id": 1}, session_id=1, expires_at=LATER)
+    cache.put("expired", {"user_id": 1}, session_id=2, expires_at=datetime.now() - timedelta(seconds=1))
+    assert cache.get("fresh") == {"user_id": 1}
+    assert cache.get("expired") is None
+    assert cache.get("unknown") is None
+
+    cache.ttl_seconds = -1
+    assert cache.get("fresh") is None
+
+
+def test_session_cache_invalidation(db_path):
+    cache = SessionCache(db_path, flush_interval=3600)
+    cache.put("a", {"user_id": 1}, session_id=1, expires_at=LATER)
+    cache.put("b", {"user_id": 1}, session_id=2, expires_at=LATER)
+    cache.put("c", {"user_id": 2}, session_id=3, expires_at=LATER)
+
+    cache.invalidate_user(1)
+    assert (cache.get("a"), cache.get("b")) == (None, None)
+    cache.invalidate("c")
+    assert cache.get("c") is None
+
+
+def test_role_flags():
+    assert role_flags(None, 0) == {"role": "user", "is_admin": False, "is_super_admin": False}
+    assert role_flags("user", 1)["is_admin"] is True
+    assert role_flags("admin", 0) == {"role": "admin", "is_admin": True, "is_super_admin": False}
+    assert role_flags("super_admin", 0)["is_super_admin"] is True
+
+
+def test_user_cache_ttl():
+    cache = UserCache(ttl_seconds=60)
+    cache.put(1, role_flags("admin", 1))
+    assert cache.get(1)["is_admin"] is True
+    cache.invalidate(1)
+    assert cache.get(1) is None
+
+    cache.put(2, role_flags("user", 0))
+    cache.ttl_seconds = -1
+    assert cache.get(2) is None
+
+
+def _session_activity(db, session_id):
+    conn = db.get_connection()
+    try:
+        return conn.execute("SELECT last_activity FROM sessions WHERE id = ?", (session_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _add_session(db, token):
+    user_id = db.register_user("jane", "jane@example.com", "hash")["user_id"]
+    db.create_session(user_id, token)
+    conn = db.get_connection()
+    try:
+        session_id = conn.execute("SELECT id FROM sessions WHERE session_token = ?", (token,)).fetchone()[0]
+    finally:
+        conn.close()
+    return user_id, session_id
+
+
+def test_activity_flusher_batches_updates(db):
+    _, session_id = _add_session(db, "token")
+    conn = db.get_connection(write=True)
+    try:
+        conn.execute("UPDATE sessions SET last_activity = NULL WHERE id = ?", (session_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+    flusher = ActivityFlusher(db.db_path, interval=3600)
+    flusher.touch(session_id)
+    flusher.touch(session_id)
+    assert _session_activity(db, session_id) is None
+    assert flusher.flush() == 1
+    assert _session_activity(db, session_id) is not None
+    assert flusher.flush() == 0
+
+
+def test_validate_session_uses_the_cache_until_invalidated(db):
+    user_id, _ = _add_session(db, "token")
+    first = db.validate_session("token")
+    assert first["valid"] and first["role"] == "user"
+
+    # Served from the cache, so a direct change is not seen yet
+    conn = db.get_connection(write=True)
+    try:
+        conn.execute("UPDATE users SET full_name = 'Jane Doe' WHERE id = ?", (user_id,))
+        conn.commit()
+    finally:
+        conn.close()
+    assert db.validate_session("token")["full_name"] is None
+
+    # Role changes go through Database and drop the user's cached sessions
+    db.update_user_role(user_id, "admin")
+    second = db.validate_session("token")
+    assert (second["full_name"], second["is_admin"]) == ("Jane Doe", True)
+    assert db.get_user_role(user_id)["role"] == "admin"
+
+    db.invalidate_session("token")
+    assert db.validate_session("token")["valid"] is False
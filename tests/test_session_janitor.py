@@ -0,0 +1,150 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import Database
+
+
+def _add_sessions(db, count, expired=True):
+    expires_at = datetime.now() + timedelta(hours=-1 if expired else 1)
+    conn = db.get_connection(write=True)
+    try:
+        start = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        conn.executemany(
+            "INSERT INTO sessions (user_id, session_token, expires_at, user_agent) VALUES (1, ?, ?, ?)",
+            [(f"token-{start + i}", expires_at, "x" * 500) for i in range(count)],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _count(db, sql):
+    conn = db.get_connection()
+    try:
+        return conn.execute(sql).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_purge_deletes_only_expired_sessions_in_batches(db):
+    _add_sessions(db, 25)
+    _add_sessions(db, 3, expired=False)
+    assert db.purge_expired_sessions(batch_size=10) == 25
+    assert _count(db, "SELECT COUNT(*) FROM sessions") == 3
+
+
+def test_purge_stops_after_max_batches(db):
+    _add_sessions(db, 25)
+    assert db.purge_expired_sessions(batch_size=10, max_batches=2) == 20
+    assert db.purge_expired_sessions(batch_size=10) == 5
+
+
+def test_incremental_vacuum_returns_free_pages(db):
+    assert _count(db, "PRAGMA auto_vacuum") == 2  # New files start in incremental mode
+    _add_sessions(db, 2000)
+    db.purge_expired_sessions()
+    free_pages = _count(db, "PRAGMA freelist_count")
+    assert free_pages > 0
+    assert db.incremental_vacuum(max_pages=free_pages) == free_pages
+    assert _count(db, "PRAGMA freelist_count") == 0
+
+
+@pytest.fixture
+def legacy_db_path(db_path):
+    """A database file created before auto_vacuum=INCREMENTAL was the default"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA auto_vacuum = NONE")
+    conn.execute("CREATE TABLE legacy (id INTEGER)")
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def _search(db, term):
+    conn = db.get_connection()
+    try:
+        return [row[0] for row in conn.execute(
+            "SELECT c.full_name FROM customers_fts JOIN customers c ON c.rowid = customers_fts.rowid "
+            "WHERE customers_fts MATCH ?", (term,))]
+    finally:
+        conn.close()
+
+
+def _auto_vacuum(path):
+    # A fresh connection: pooled readers keep the header they last read
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_enable_incremental_vacuum_converts_and_rebuilds_search(legacy_db_path):
+    db = Database(legacy_db_path)
+    assert _auto_vacuum(legacy_db_path) == 0
+    conn = db.get_connection(write=True)
+    try:
+        for i, name in enumerate(("Alice Smith", "Bob Jones", "Carol Smithers")):
+            conn.execute("INSERT INTO customers (id, full_name, email) VALUES (?, ?, ?)",
+                         (f"{i:032d}", name, f"customer{i}@example.com"))
+        conn.execute("DELETE FROM customers WHERE full_name = 'Alice Smith'")
+        # Stand in for an index whose rowids no longer line up with customers
+        conn.execute("INSERT INTO customers_fts(customers_fts) VALUES ('delete-all')")
+        conn.commit()
+    finally:
+        conn.close()
+    assert _search(db, "smith*") == []
+
+    assert db.enable_incremental_vacuum()
+    assert _auto_vacuum(legacy_db_path) == 2
+    assert _search(db, "smith*") == ["Carol Smithers"]
+    assert db.enable_incremental_vacuum()  # Already converted: no second VACUUM
+
+
+@pytest.fixture
+def scheduler_for(monkeypatch):
+    """SchedulerService factory without Gmail/Gemini, with the singleton reset per test"""
+    # scheduler_service imports the Gmail and Gemini clients at module level
+    for module in ("googleapiclient", "google_auth_httplib2", "google_auth_oauthlib", "httplib2",
+                   "google.generativeai"):
+        pytest.importorskip(module)
+    from scheduler_service import SchedulerService
+
+    monkeypatch.setattr(SchedulerService, "_instance", None)
+    return lambda db: SchedulerService(db, None, None)
+
+
+def test_janitor_purges_and_records_metrics(db, scheduler_for):
+    scheduler = scheduler_for(db)
+    _add_sessions(db, 30)
+    scheduler.session_janitor()
+
+    metrics = scheduler.get_janitor_metrics()
+    assert (metrics["runs"], metrics["last_purged"], metrics["last_error"]) == (1, 30, None)
+    assert _count(db, "SELECT COUNT(*) FROM sync_history WHERE sync_type = 'session_cleanup'") == 1
+    scheduler.session_janitor()  # Nothing to purge: counted, not logged
+    assert scheduler.get_janitor_metrics()["runs"] == 2
+    assert _count(db, "SELECT COUNT(*) FROM sync_history WHERE sync_type = 'session_cleanup'") == 1
+
+
+def test_janitor_leaves_auto_vacuum_conversion_to_an_explicit_step(legacy_db_path, scheduler_for):
+    db = Database(legacy_db_path)
+    scheduler_for(db).session_janitor()
+    assert _auto_vacuum(legacy_db_path) == 0
+
+
+def test_janitor_converts_once_when_configured(legacy_db_path, scheduler_for, monkeypatch):
+    from config import SESSION_JANITOR_CONFIG
+
+    monkeypatch.setitem(SESSION_JANITOR_CONFIG, "convert_auto_vacuum", True)
+    db = Database(legacy_db_path)
+    calls = []
+    convert = db.enable_incremental_vacuum
+    monkeypatch.setattr(db, "enable_incremental_vacuum", lambda: calls.append(1) or convert())
+    scheduler = scheduler_for(db)
+    scheduler.session_janitor()
+    scheduler.session_janitor()
+    assert calls == [1]
+    assert _auto_vacuum(legacy_db_path) == 2
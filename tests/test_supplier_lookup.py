@@ -0,0 +1,15 @@
+def test_supplier_lookup_ignores_case_and_whitespace(db):
+    supplier_id = db.add_supplier("Acme Floors", "Sales@Acme.test")
+    assert db.get_supplier_by_email(" sales@ACME.test ")["id"] == supplier_id
+    assert db.get_supplier_by_email("other@acme.test") is None
+    assert db.get_supplier_by_email("") is None
+
+
+def test_supplier_lookup_uses_the_nocase_index(db):
+    conn = db.get_connection()
+    try:
+        plan = " ".join(row[-1] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM suppliers WHERE email = ? COLLATE NOCASE", ("x",)))
+    finally:
+        conn.close()
+    assert "idx_suppliers_email_nocase" in plan
@@ -0,0 +1,48 @@
+import pytest
+
+from volume_discounts import compile_tiers, normalize_tiers, parse_tiers, product_discount
+
+TEXT = "500-999 sqft: 5% off, 1000-1499 sqft: 7% off, 1500+ sqft: 10% off"
+
+
+@pytest.mark.parametrize("quantity, expected", [
+    (0, 0.0), (499, 0.0), (500, 5.0), (999, 5.0), (1000, 7.0), (1500, 10.0), (10 ** 6, 10.0),
+])
+def test_discount_for_quantity(quantity, expected):
+    assert parse_tiers(TEXT).discount_for(quantity) == expected
+
+
+def test_input_forms_compile_to_the_same_table():
+    expected = parse_tiers("500-999 sqft: 5% off, 1500+ sqft: 10% off").tiers
+    assert compile_tiers({"500-999": 5.0, "1500-inf": 10.0}).tiers == expected
+    assert compile_tiers("500-999 sqft: 5%\n1,500 sqft: 10%").tiers == expected
+    assert compile_tiers('[[500, 999, 5], [1500, null, 10]]').tiers == expected
+
+
+@pytest.mark.parametrize("text, stored", [
+    ("5% discount for 500+ sqft", "[[500, null, 5]]"),
+    ("10% off orders over 1000 sqft", "[[1000, null, 10]]"),
+    ("3% off 200-499 sqft, 6% off 500+ sqft", "[[200, 499, 3], [500, null, 6]]"),
+])
+def test_percentage_before_quantity(text, stored):
+    assert normalize_tiers(text) == stored
+
+
+def test_overlapping_tiers_use_the_best_discount():
+    tiers = parse_tiers("100+: 3%, 200-300: 8%")
+    assert [tiers.discount_for(q) for q in (150, 250, 300, 301)] == [3.0, 8.0, 8.0, 3.0]
+
+
+def test_normalized_storage_round_trips():
+    stored = normalize_tiers(TEXT)
+    assert stored == "[[500, 999, 5], [1000, 1499, 7], [1500, null, 10]]"
+    assert compile_tiers(stored).format() == TEXT
+    assert normalize_tiers("no discounts") is None
+    assert normalize_tiers(None) is None
+
+
+def test_product_discount_prefers_pre_parsed_tiers():
+    product = {"volume_discounts": "100+ sqft: 1% off", "volume_discount_tiers": "[[100, null, 4]]"}
+    assert product_discount(product, 200) == 4.0
+    assert product_discount({"volume_discounts": "100+ sqft: 1% off"}, 200) == 1.0
+    assert product_discount({}, 200) == 0.0
@@ -0,0 +1,75 @@
+from collections import namedtuple
+
+import zip_index
+from zip_index import ZipIndex, write_zip_index
+
+Location = namedtuple("Location", "postal_code place_name state_name state_code county_name latitude longitude")
+
+LOCATIONS = [
+    Location("90210", "Beverly Hills", "California", "CA", "Los Angeles", 34.0901, -118.4065),
+    Location("10001", "New York", "New York", "NY", "New York", 40.7484, -73.9967),
+    Location("00501", "Holtsville", "New York", "NY", "Suffolk", 40.8154, -73.0451),
+    Location("99999", float("nan"), float("nan"), float("nan"), float("nan"), float("nan"), float("nan")),
+    Location("1234", "Too Short", "Nowhere", "NW", None, 0.0, 0.0),
+]
+
+
+def test_lookup_finds_written_zip_codes(tmp_path):
+    path = str(tmp_path / "zips.bin")
+    assert write_zip_index(path, LOCATIONS) == 3
+
+    index = ZipIndex(path)
+    assert index.lookup("90210") == {
+        "zip_code": "90210", "city": "Beverly Hills", "state": "California", "state_code": "CA",
+        "county": "Los Angeles", "latitude": 34.0901, "longitude": -118.4065,
+    }
+    assert index.lookup("00501")["city"] == "Holtsville"
+    assert index.lookup("10001")["state_code"] == "NY"
+
+
+def test_unknown_and_malformed_zip_codes_return_none(tmp_path):
+    path = str(tmp_path / "zips.bin")
+    write_zip_index(path, LOCATIONS)
+
+    index = ZipIndex(path)
+    for zip_code in ("99999", "01234", "12345", "1234", "abcde", "", None):
+        assert index.lookup(zip_code) is None
+
+
+class FakeNominatim:
+    def __init__(self, locations):
+        self.locations = {location.postal_code: location for location in locations}
+        self.queries = []
+
+    def query_postal_code(self, zip_code):
+        self.queries.append(zip_code)
+        return self.locations.get(zip_code, LOCATIONS[3])
+
+
+def test_missing_index_falls_back_to_pgeocode(tmp_path, monkeypatch):
+    nominatim = FakeNominatim(LOCATIONS)
+    monkeypatch.setattr(zip_index, "_pgeocode_nominatim", lambda: nominatim)
+    path = str(tmp_path / "zips.bin")
+    index = ZipIndex(path)
+
+    assert index.lookup("90210") == {
+        "zip_code": "90210", "city": "Beverly Hills", "state": "California", "state_code": "CA",
+        "county": "Los Angeles", "latitude": 34.0901, "longitude": -118.4065,
+    }
+    assert index.lookup("99999") is None
+
+    # The file is only looked for again after RETRY_AFTER_SECONDS
+    write_zip_index(path, LOCATIONS)
+    index.lookup("10001")
+    assert nominatim.queries == ["90210", "99999", "10001"]
+    index.RETRY_AFTER_SECONDS = 0
+    assert index.lookup("00501")["city"] == "Holtsville"
+    assert len(nominatim.queries) == 3
+
+
+def test_lookup_is_none_without_index_or_pgeocode(tmp_path, monkeypatch):
+    def unavailable():
+        raise OSError("no network")
+
+    monkeypatch.setattr(zip_index, "_pgeocode_nominatim", unavailable)
+    assert ZipIndex(str(tmp_path / "zips.bin")).lookup("90210") is None
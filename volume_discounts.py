@@ -0,0 +1,177 @@
+"""
+Volume discount tiers.
+
+Supplier tiers arrive as free text ("500-999 sqft: 5% off, 1500+ sqft: 10% off"),
+as one tier per line in email replies, or as the older JSON dict form
+({"500-999": 5.0, "1500-inf": 10.0}). All of them parse into one VolumeDiscountTiers
+table, which is stored alongside the product as JSON when volume_discounts is written.
+
+At quote time the table is a step function over quantity: sorted breakpoints and the
+best applicable percentage from each breakpoint on, looked up with a binary search.
+"""
+
+import json
+import math
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+# (min_qty, max_qty or None for open-ended, discount percent)
+Tier = Tuple[float, Optional[float], float]
+
+_PCT = re.compile(r'(\d+(?:\.\d+)?)\s*%')
+_RANGE = re.compile(r'(\d+(?:\.\d+)?)\s*(?:-|–|to)\s*(\d+(?:\.\d+)?)', re.IGNORECASE)
+_PLUS = re.compile(r'(\d+(?:\.\d+)?)\s*\+')
+# Single quantity with a unit, e.g. "1500 sqft: 10%" - applies from that quantity up
+_OPEN = re.compile(r'(\d+(?:\.\d+)?)\s*(?:sq\.?\s*ft|sqft|square\s+feet)', re.IGNORECASE)
+_THOUSANDS = re.compile(r'(?<=\d),(?=\d{3}(?!\d))')
+_SEPARATORS = re.compile(r'[,;\n]')
+
+CACHE_SIZE = 2048
+
+
+def _number(value: float):
+    return int(value) if float(value).is_integer() else value
+
+
+def _tier_from_text(segment: str) -> Optional[Tier]:
+    pct_match = _PCT.search(segment)
+    if not pct_match:
+        return None
+    pct = float(pct_match.group(1))
+    # Quantities may come before or after the percentage ("500-999 sqft: 5%", "5% off 1000+ sqft")
+    quantity_text = f"{segment[:pct_match.start()]} {segment[pct_match.end():]}"
+
+    range_match = _RANGE.search(quantity_text)
+    if range_match:
+        return (float(range_match.group(1)), float(range_match.group(2)), pct)
+    plus_match = _PLUS.search(quantity_text) or _OPEN.search(quantity_text)
+    if plus_match:
+        return (float(plus_match.group(1)), None, pct)
+    return None
+
+
+def _tiers_from_json(data) -> List[Tier]:
+    tiers = []
+    if isinstance(data, dict):
+        # Legacy email format: {"500-999": 5.0, "1500-inf": 10.0}
+        for key, pct in data.items():
+            low, _, high = str(key).partition('-')
+            try:
+                tiers.append((float(low), None if high in ('', 'inf', 'None') else float(high), float(pct)))
+            except (TypeError, ValueError):
+                continue
+    elif isinstance(data, list):
+        for entry in data:
+            try:
+                low, high, pct = entry
+                tiers.append((float(low), None if high is None else float(high), float(pct)))
+            except (TypeError, ValueError):
+                continue
+    return tiers
+
+
+class VolumeDiscountTiers:
+    """
+    Compiled, immutable tier table.
+    - tiers: the normalized (min, max, pct) tiers, sorted by min quantity
+    - discount_for(quantity): best percentage for a quantity via binary search
+    """
+
+    __slots__ = ('tiers', '_keys', '_pcts')
+
+    def __init__(self, tiers: List[Tier]):
+        self.tiers = tuple(sorted(
+            (t for t in tiers if t[2] > 0 and (t[1] is None or t[1] >= t[0])),
+            key=lambda t: (t[0], math.inf if t[1] is None else t[1], t[2])
+        ))
+
+        # Breakpoints are (quantity, side): side 0 starts a segment at the quantity itself,
+        # side 1 starts it just above (range maximums are inclusive)
+        points = sorted({(low, 0) for low, _, _ in self.tiers} |
+                        {(high, 1) for _, high, _ in self.tiers if high is not None})
+        keys, pcts = [], []
+        for qty, side in points:
+            best = 0.0
+            for low, high, pct in self.tiers:
+                if low <= qty and (high is None or qty < high or (side == 0 and qty == high)):
+                    best = max(best, pct)
+            if pcts and pcts[-1] == best:
+                continue
+            keys.append((qty, side))
+            pcts.append(best)
+        self._keys = tuple(keys)
+        self._pcts = tuple(pcts)
+
+    def __bool__(self):
+        return bool(self.tiers)
+
+    def discount_for(self, quantity: float) -> float:
+        if not quantity or not self._keys:
+            return 0.0
+        idx = bisect_right(self._keys, (float(quantity), 0)) - 1
+        return self._pcts[idx] if idx >= 0 else 0.0
+
+    def to_json(self) -> Optional[str]:
+        """Normalized storage form, or None when there are no tiers"""
+        if not self.tiers:
+            return None
+        return json.dumps([[_number(low), None if high is None else _number(high), _number(pct)]
+                           for low, high, pct in self.tiers])
+
+    def format(self) -> str:
+        """Canonical display string, e.g. "500-999 sqft: 5% off, 1500+ sqft: 10% off" """
+        parts = []
+        for low, high, pct in self.tiers:
+            qty = f"{_number(low)}+" if high is None else f"{_number(low)}-{_number(high)}"
+            parts.append(f"{qty} sqft: {_number(pct)}% off")
+        return ", ".join(parts)
+
+
+EMPTY = VolumeDiscountTiers([])
+
+
+def parse_tiers(text: str) -> VolumeDiscountTiers:
+    """Parse tiers from text without caching (for one-off input such as an email body)"""
+    stripped = str(text or "").strip()
+    if stripped[:1] in ('{', '['):
+        try:
+            return VolumeDiscountTiers(_tiers_from_json(json.loads(stripped)))
+        except ValueError:
+            pass
+    tiers = []
+    for segment in _SEPARATORS.split(_THOUSANDS.sub('', stripped)):
+        tier = _tier_from_text(segment)
+        if tier:
+            tiers.append(tier)
+    return VolumeDiscountTiers(tiers)
+
+
+_compile_text = lru_cache(maxsize=CACHE_SIZE)(parse_tiers)
+
+
+def compile_tiers(value) -> VolumeDiscountTiers:
+    """
+    Tier table for a stored or supplied value: free text, a JSON string, or a dict/list.
+    Strings are parsed once per process (LRU cached), so repeated quotes only pay the lookup.
+    """
+    if not value:
+        return EMPTY
+    if isinstance(value, (dict, list)):
+        return VolumeDiscountTiers(_tiers_from_json(value))
+    try:
+        return _compile_text(str(value))
+    except Exception as e:
+        print(f"Error parsing volume discounts: {e}")
+        return EMPTY
+
+
+def normalize_tiers(value) -> Optional[str]:
+    """JSON for the volume_discount_tiers column (None if the value has no usable tiers)"""
+    return compile_tiers(value).to_json()
+
+
+def product_discount(product: dict, quantity: float) -> float:
+    """Volume discount percentage for a product row, preferring its pre-parsed tiers"""
+    return compile_tiers(product.get('volume_discount_tiers') or product.get('volume_discounts')).discount_for(quantity)
@@ -0,0 +1,229 @@
+"""
+Offline US ZIP code index.
+
+A compact binary file (sorted fixed-size records plus a string table) that is
+memory-mapped on first lookup and searched with a binary search, so ZIP validation
+needs neither pandas nor network access at runtime.
+
+The file is generated from pgeocode's US dataset at deploy time with
+`python build_zip_index.py` (see that script); lookups only ever read it and never
+download anything. Without the file, lookups fall back to querying pgeocode directly
+(which downloads its dataset on first use), so valid ZIPs are never reported as unknown
+just because the index was not built.
+"""
+
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+DEFAULT_INDEX_PATH = os.path.join("data", "zip_index_us.bin")
+
+MAGIC = b"ZIPX"
+FORMAT_VERSION = 1
+# magic, version, record count, string table offset
+HEADER = struct.Struct("<4sHII")
+# zip, latitude, longitude, state code, then string table offsets for place, state and county
+RECORD = struct.Struct("<Iff2sIII")
+NO_STRING = 0xFFFFFFFF
+
+
+def _text(value) -> Optional[str]:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _number(value) -> float:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+    return value
+
+
+def _location(zip_code: str, place, state, state_code, county, latitude, longitude) -> Dict[str, Any]:
+    return {
+        "zip_code": zip_code,
+        "city": place,
+        "state": state,
+        "state_code": state_code,
+        "county": county,
+        "latitude": None if math.isnan(latitude) else round(latitude, 4),
+        "longitude": None if math.isnan(longitude) else round(longitude, 4)
+    }
+
+
+def _pgeocode_nominatim():
+    import pgeocode
+    return pgeocode.Nominatim('us')
+
+
+def write_zip_index(path: str, locations: Iterable) -> int:
+    """
+    Write the binary index from location rows with pgeocode's fields (postal_code, place_name,
+    state_name, state_code, county_name, latitude, longitude). Returns the number of ZIPs indexed.
+    """
+    strings = bytearray()
+    string_offsets: Dict[str, int] = {}
+
+    def intern(value) -> int:
+        value = _text(value)
+        if value is None:
+            return NO_STRING
+        if value not in string_offsets:
+            string_offsets[value] = len(strings)
+            strings.extend(value.encode("utf-8") + b"\0")
+        return string_offsets[value]
+
+    records = []
+    for row in locations:
+        postal_code = _text(row.postal_code)
+        if not postal_code or not postal_code.isdigit() or len(postal_code) != 5:
+            continue
+        if _text(row.place_name) is None:
+            # pgeocode reports these as unknown ZIPs, so leave them out
+            continue
+        state_code = (_text(row.state_code) or "").encode("ascii", "ignore")[:2]
+        records.append((
+            int(postal_code),
+            _number(row.latitude),
+            _number(row.longitude),
+            state_code.ljust(2, b"\0"),
+            intern(row.place_name),
+            intern(row.state_name),
+            intern(row.county_name),
+        ))
+    records.sort(key=lambda r: r[0])
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(records), HEADER.size + RECORD.size * len(records)))
+        for record in records:
+            f.write(RECORD.pack(*record))
+        f.write(bytes(strings))
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+class ZipIndex:
+    """
+    Read-only lookups against the binary ZIP index.
+    The file is mapped lazily on first use and shared by all threads; while it is missing,
+    lookups go through pgeocode instead.
+    """
+
+    RETRY_AFTER_SECONDS = 300  # Wait before looking for a missing/unreadable file again
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._map = None
+        self._count = 0
+        self._strings_offset = 0
+        self._failed_at = None
+        self._fallback = None
+        self._fallback_failed_at = None
+
+    def _ready(self) -> bool:
+        if self._map is not None:
+            return True
+        return self._failed_at is not None and time.monotonic() - self._failed_at < self.RETRY_AFTER_SECONDS
+
+    def _open(self):
+        if self._ready():
+            return
+        with self._lock:
+            if self._ready():
+                return
+            try:
+                if not os.path.exists(self.path):
+                    raise FileNotFoundError(f"{self.path} not found, run `python build_zip_index.py`")
+                with open(self.path, "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, version, count, strings_offset = HEADER.unpack_from(mapped, 0)
+                if magic != MAGIC or version != FORMAT_VERSION:
+                    mapped.close()
+                    raise ValueError(f"{self.path} is not a version {FORMAT_VERSION} ZIP index")
+                self._count = count
+                self._strings_offset = strings_offset
+                self._map = mapped
+                self._failed_at = None
+            except Exception as e:
+                self._failed_at = time.monotonic()
+                print(f"ZIP index unavailable: {e}")
+
+    def _lookup_pgeocode(self, zip_code: str) -> Optional[Dict[str, Any]]:
+        """Fallback lookup for when the index file is unavailable"""
+        if self._fallback is None:
+            with self._lock:
+                failed_at = self._fallback_failed_at
+                if failed_at is not None and time.monotonic() - failed_at < self.RETRY_AFTER_SECONDS:
+                    return None
+                if self._fallback is None:
+                    try:
+                        self._fallback = _pgeocode_nominatim()
+                        print("ZIP index missing, validating ZIP codes with pgeocode")
+                    except Exception as e:
+                        self._fallback_failed_at = time.monotonic()
+                        print(f"pgeocode unavailable: {e}")
+                        return None
+        row = self._fallback.query_postal_code(zip_code)
+        if row is None or _text(row.place_name) is None:
+            return None
+        return _location(zip_code, _text(row.place_name), _text(row.state_name), _text(row.state_code),
+                         _text(row.county_name), _number(row.latitude), _number(row.longitude))
+
+    def _string(self, offset: int) -> Optional[str]:
+        if offset == NO_STRING:
+            return None
+        start = self._strings_offset + offset
+        end = self._map.find(b"\0", start)
+        return self._map[start:end].decode("utf-8")
+
+    def lookup(self, zip_code: str) -> Optional[Dict[str, Any]]:
+        """Location details for a 5-digit ZIP code, or None if it is unknown"""
+        if not zip_code or len(zip_code) != 5 or not zip_code.isdigit():
+            return None
+        self._open()
+        if self._map is None:
+            return self._lookup_pgeocode(zip_code)
+
+        target = int(zip_code)
+        lo, hi = 0, self._count - 1
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            offset = HEADER.size + mid * RECORD.size
+            code = struct.unpack_from("<I", self._map, offset)[0]
+            if code < target:
+                lo = mid + 1
+            elif code > target:
+                hi = mid - 1
+            else:
+                _, lat, lon, state_code, place, state, county = RECORD.unpack_from(self._map, offset)
+                return _location(zip_code, self._string(place), self._string(state),
+                                 state_code.rstrip(b"\0").decode("ascii") or None,
+                                 self._string(county), lat, lon)
+        return None
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def get_zip_index() -> ZipIndex:
+    """Process-wide index instance (nothing is read until the first lookup)"""
+    global _default_index
+    if _default_index is None:
+        with _default_lock:
+            if _default_index is None:
+                _default_index = ZipIndex()
+    return _default_index
+